@@ -1,384 +1,374 @@
-import random
-import pandas as pd
+import argparse
+import time
 import os
 import sys
 from PyQt6.QtWidgets import (QApplication, QLabel, QPushButton, QFrame, QLineEdit, 
-                            QMessageBox, QWidget, QVBoxLayout, QHBoxLayout, QGridLayout)
-from PyQt6.QtGui import QFont, QPixmap
-from PyQt6.QtCore import Qt, QTimer
-
-# Deck configurations
-deck_sequences = {
-    'deck_a': [100, 100, -50, 100, -200, 100, -100, 100, -150, -250] * 3,  # -25/card
-    'deck_b': [100, 100, 100, 100, 100, 100, 100, 100, 100, -1150] * 3,    # -25/card
-    'deck_c': [50, 50, 50, 25, -25, 50, 0, 50, 25, -25] * 3,                # +25/card
-    'deck_d': [50, 50, 50, 50, 50, 50, 50, 50, 50, -200] * 3,             # +25/card
-}
+                            QMessageBox, QWidget, QVBoxLayout, QHBoxLayout, QGridLayout, QStackedWidget)
+from PyQt6.QtGui import QPixmap, QImage, QKeySequence
+from PyQt6.QtCore import Qt, QTimer, QObject, QEvent
+
+from decks import decks
+from assets import cached_asset
+from engine import IGTEngine, FrontEnd, valid_participant_id
+from config import default_config, load_config
+from persian import persian_number
+from profiler import Profiler, engine_phases, profile_path
+from latency import LatencyAudit, latency_path
 
 # Initialize variables
-net_worth = 2000
-previous_net_worth = net_worth
-current_position = 0  # Arrow starts at Deck A
-decks = ['deck_a', 'deck_b', 'deck_c', 'deck_d']
-trial_data = []  # Stores trial data for Excel output
+output_dir = "Iowa_Gambling_Task_pyqt/output"
+image_dir = "/home/parinaz/igt/Iowa_Gambling_Task_tkinter/images"
+export_excel = True  # Also write Participant_{id}.xlsx at the end (trial_log.py can convert later)
+output_format = 'xlsx'  # End-of-session file: 'xlsx', or typed 'parquet' / 'arrow' (needs pyarrow)
 timeout_duration = 4000  # Milliseconds to timeout
+timer_precision = 'spin'  # 'coarse', 'precise' (Qt PreciseTimer) or 'spin' (PreciseTimer, then busy-wait the last 2 ms)
 total_trials = 120
-current_trial = 0
 practice_trials = 10  # Number of practice trials
-# Initialize deck instances for drawing (shuffled copies)
-deck_instances = {deck: list(seq) for deck, seq in deck_sequences.items()}
-for deck in deck_instances.values():
-    random.shuffle(deck)
-
-# Function to convert numbers to Persian numerals
-def persian_number(number):
-    persian_digits = {
-        '0': '۰', '1': '۱', '2': '۲', '3': '۳', '4': '۴',
-        '5': '۵', '6': '۶', '7': '۷', '8': '۸', '9': '۹'
-    }
-    if isinstance(number, int) or isinstance(number, float):
-        number_str = str(abs(number))
-        persian_num = ''.join(persian_digits[digit] for digit in number_str)
-        if number < 0:
-            return f"-{persian_num}"
-        return persian_num
-    return number
-
-# Function to log data to Excel
-def log_data(participant_id, participant_name, trial_type, trial_number, presented_deck, choice, outcome, net_worth):
-    trial_data.append({
-        'Participant ID': participant_id,
-        'Participant Name': participant_name,
-        'Trial Type': trial_type,
-        'Trial Number': trial_number,
-        'Presented Deck': presented_deck,
-        'Choice': choice,
-        'Outcome': persian_number(outcome) if outcome != 0 else "0",
-        'Net Worth': persian_number(net_worth),
-    })
-
-# Function to save data to Excel
-def save_data(participant_id):
+exhaustion_policy = 'reshuffle'  # When a deck runs out: 'reshuffle', 'wrap' or 'stop' (end the session)
+
+# One stylesheet for the whole application, parsed once. Widgets pick their rules
+# by object name or by their "tone" property, so no screen or trial calls setStyleSheet
+# (Qt does not pass fonts from parent to child once a stylesheet is set, so the font is in it too)
+tones = ('black', 'blue', 'red', 'green', 'purple', 'orange')
+font_family = "B Koodak"
+font_size_pt = 20
+app_stylesheet = "\n".join(
+    ["#igt, #igt QWidget { background-color: #f0f0f0; }",
+     f'#igt QLabel, #igt QLineEdit, #igt QPushButton {{ font-family: "{font_family}"; font-size: {font_size_pt}pt; }}',
+     "#igt #start_button { background-color: green; color: white; }"]
+    + [f'QLabel[tone="{tone}"] {{ color: {tone}; }}' for tone in tones])
+
+# Fixed screens: (text, tone) per line
+register_lines = (
+    ("ثبت اطلاعات", "blue"),
+    ("نام و شناسه خود را وارد کنید:", None),
+)
+welcome_lines = (
+    ("در این بازی هدف شما این است که تا حد ممکن پول برنده شوید!", "blue"),
+    ("برای هر دور یک فلش زرد رنگ بالای یکی از چهار دسته کارت نشان داده خواهد شد", None),
+    ("به واسطه آن، میتوانید بین بازی کردن یا رد کردن آن کارت تصمیم بگیرید.", None),
+    ("اگر بازی کنید؛ ممکن است سکه برنده شوید و یا از دست بدهید", None),
+    ("(و یا نه سکه ببرید و نه از دست بدهید)", None),
+    ("اگر رد شوید؛ نه سکه می‌برید و نه چیزی از دست خواهید داد.", None),
+    ("برخی از دسته کارت ها سودآور تر از بقیه خواهند بود.", None),
+    ("توجه کنید که در هر نوبت فقط 4 ثانیه زمان دارید تا تصمیم بگیرید", "red"),
+    ("با 2000 سکه شروع خواهید کرد.", None),
+    ("برای ادامه کلید space را فشار دهید.", "green"),
+)
+practice_lines = (
+    ("پیش از آغاز بازی اصلی، به بازی تمرینی خواهید پرداخت", "blue"),
+    ("این مرحله در چند تکرار انجام خواهد شد و فقط جهت آشنایی شما", None),
+    ("با ساختار و نحوه انجام بازی است.", None),
+    ("لذا نتایج این مرحله ثبت نخواهد شد", None),
+    ("برای ادامه کلید space را فشار دهید.", "green"),
+)
+transition_lines = (
+    ("پایان مرحله تمرینی", "blue"),
+    ("اکنون به بازی اصلی میپردازید.", None),
+    ("در این مرحله پاسخ های شما ثبت خواهد شد و در پایان", None),
+    ("نتیجه نهایی خود را مشاهده خواهید کرد.", None),
+    ("موفق باشید.", None),
+    ("برای ادامه کلید space را فشار دهید.", "green"),
+)
+# Static screens built during idle time after startup (see prerender_pages)
+static_pages = (('welcome', welcome_lines), ('practice', practice_lines), ('transition', transition_lines))
+end_message = "پایان بازی\n\nپژوهشگران:\n\n Parinaz Khosravani\nparinaz.khosravaani@gmail.com \n\n Farzad Soleimani\nfarzadsoleimani7593@gmail.com"
+
+# Last line of the end screen: how to leave, or with --kiosk how to hand over to the next participant
+end_exit_line = ("برای خروج، لطفاً پنجره را با ماوس ببندید", "red")
+end_kiosk_line = ("برای شرکت‌کننده بعدی کلید space را فشار دهید", "green")
+
+# The participant ID names the output files (see engine.valid_participant_id)
+invalid_id_text = "شناسه فقط می‌تواند شامل حروف، ارقام، _ و - باشد (حداکثر ۶۴ نویسه)."
+
+# Status of the background save on the end screen
+save_status_texts = {
+    'saved': ("اطلاعات ذخیره شد", "green"),
+    'fallback': ("اطلاعات به صورت خام ذخیره شد", "orange"),
+    'failed': ("خطا در ذخیره اطلاعات! لطفاً به آزمایشگر اطلاع دهید", "red"),
+}
+
+# Function to scale an image (keeping its aspect ratio) into the asset cache
+def render_scaled(source, size, dest):
+    image = QImage(source)
+    if image.isNull() or not image.scaled(*size, Qt.AspectRatioMode.KeepAspectRatio).save(dest, 'PNG'):
+        raise OSError(f"Could not scale image {source}")
+
+# Function to load a scaled image, decoding the pre-scaled cached copy
+def load_pixmap(name, size):
+    source = os.path.join(image_dir, f"{name}.png")
     try:
-        output_dir = "Iowa_Gambling_Task_pyqt/output"
-        if not os.path.exists(output_dir):
-            os.makedirs(output_dir)
-        df = pd.DataFrame(trial_data)
-        output_file = os.path.join(output_dir, f"Participant_{participant_id}.xlsx")
-        df.to_excel(output_file, index=False, engine='openpyxl')
-        print(f"Data saved to {output_file}")
-    except Exception as e:
-        print(f"Error saving data: {e}")
-
-# Function to simulate deck outcome by drawing from sequences
-def simulate_outcome(deck):
-    if deck_instances[deck]:  # Check if deck has cards left
-        return deck_instances[deck].pop(0)  # Draw and remove the first card
-    return 0  # Fallback if deck is empty (shouldn't happen with 120 trials)
+        return QPixmap(cached_asset(source, size, 'keepaspect', render_scaled))
+    except OSError as e:
+        print(f"Error caching image: {e}")
+        return QPixmap(source).scaled(*size, Qt.AspectRatioMode.KeepAspectRatio)
+
+# Front-end methods timed with --profile, by phase (keyPressEvent is called
+# from C++, so input is timed through the engine's respond/continue_trial)
+frontend_phases = {
+    'load_assets': 'assets',
+    'enter_phase': 'render',
+    'build_trial_screen': 'render',
+    'move_arrow': 'render',
+    'present_trial': 'render',
+    'update_ui': 'render',
+    'show_page': 'render',
+    'show_outcome': 'feedback',
+    'wait_for_continue': 'feedback',
+    'show_transition': 'render',
+    'show_end': 'render',
+}
+
+# Event filter of --audit-latency: paints the window's pending update itself, so the
+# audit gets the time the paint (and the flush to the screen) completed
+class PaintProbe(QObject):
+    def __init__(self, window, audit):
+        super().__init__(window)
+        self.window = window
+        self.audit = audit
+
+    def eventFilter(self, obj, event):
+        if event.type() != QEvent.Type.UpdateRequest or obj not in (self.window, self.window.windowHandle()):
+            return False
+        obj.event(event)
+        self.audit.painted()
+        return True
+
+# Function to switch a label to another tone: the widget is re-polished against the
+# already parsed stylesheet, and only when the tone actually changes
+def set_tone(widget, tone):
+    if widget.property('tone') == tone:
+        return
+    widget.setProperty('tone', tone)
+    style = widget.style()
+    style.unpolish(widget)
+    style.polish(widget)
 
 # GUI Application
-class IGTApp(QWidget):
-    def __init__(self):
+class IGTApp(QWidget, FrontEnd):
+    def __init__(self, profiler=None, config=None, seed=None, audit=None, kiosk=False):
         super().__init__()
         self.setWindowTitle("Iowa Gambling Task")
         self.setGeometry(100, 100, 1200, 800)
-        self.setStyleSheet("background-color: #f0f0f0;")
-
-        self.custom_font = QFont("B Koodak", 20)
-        self.net_worth = net_worth
-        self.previous_net_worth = previous_net_worth
-        self.current_position = current_position
+        self.setObjectName('igt')
+        app = QApplication.instance()
+        if app.styleSheet() != app_stylesheet:
+            app.setStyleSheet(app_stylesheet)
+        self.setLayoutDirection(Qt.LayoutDirection.RightToLeft)
         self.decks = decks
-        self.trial_data = trial_data
-        self.current_trial = current_trial
-        self.presented_deck = None
-        self.participant_id = ""
-        self.participant_name = ""
-        self.timer_running = False
-        self.space_enabled = False
-        self.timer = QTimer()
-        self.timer.timeout.connect(self.timeout)
-        self.is_practice = True
         self.game_ended = False
+        self.go_to_next_page = None  # What Space does on an instructions page
+        # With kiosk, Space on the end page starts the next participant in this window;
+        # with a seed, session i runs with seed + i
+        self.kiosk = kiosk
+        self.seed = seed
+        self.sessions = 0
+        # One-shot timer behind the engine's response window
+        self.timer = QTimer()
+        self.timer.setSingleShot(True)
+        if config is None:
+            config = default_config(outcome_model='sequence', total_trials=total_trials,
+                                    practice_trials=practice_trials, timeout_ms=timeout_duration,
+                                    exhaustion_policy=exhaustion_policy, timer_precision=timer_precision,
+                                    output_format=output_format)
+        self.config = config
+        self.timer.setTimerType(Qt.TimerType.CoarseTimer if config.timer_precision == 'coarse'
+                                else Qt.TimerType.PreciseTimer)
+        # Task state machine, outcomes, response window and logging live in the engine
+        self.engine = IGTEngine.from_config(self, config, output_dir=output_dir, export_excel=export_excel,
+                                            debug=True, seed=seed)
+        self.timer.timeout.connect(self.engine.response_window.poll)
+        if profiler is not None:
+            profiler.instrument(self.engine, engine_phases, 'engine')
+            profiler.instrument(self, frontend_phases, 'qt')
+        self.audit = audit  # LatencyAudit with --audit-latency
+        if audit is not None:
+            # Depending on the platform the window or the widget receives the update request
+            QApplication.instance().installEventFilter(PaintProbe(self, audit))
+
+        # Images are loaded on first use (see load_assets) so the registration page shows first
+        self.deck_images = None
+        self.trial_screen = None  # Built on the first trial, then reused
+        self.pages = {}  # Other screens, built on first use, then reused
+
+        # Every screen is a page of one stacked widget; showing one only switches the current page
+        self.stack = QStackedWidget()
+        self.main_layout = QVBoxLayout()
+        self.main_layout.addWidget(self.stack)
+        self.setLayout(self.main_layout)
 
+        # Start with the registration page
+        self.register_page()
+        QTimer.singleShot(0, self.load_assets)
+
+    def load_assets(self):
+        if self.deck_images is not None:
+            return
         # Load deck images
-        self.deck_images = []
-        for deck in self.decks:
-            img_path = f"/home/parinaz/igt/Iowa_Gambling_Task_tkinter/images/{deck}.png"
-            pixmap = QPixmap(img_path)
-            pixmap = pixmap.scaled(200, 300, Qt.AspectRatioMode.KeepAspectRatio)
-            self.deck_images.append(pixmap)
+        self.deck_images = [load_pixmap(deck, (200, 300)) for deck in self.decks]
 
         # Load arrow image
-        self.arrow_img = QPixmap("/home/parinaz/igt/Iowa_Gambling_Task_tkinter/images/arrow.png")
-        self.arrow_img = self.arrow_img.scaled(100, 100, Qt.AspectRatioMode.KeepAspectRatio)
+        self.arrow_img = load_pixmap('arrow', (100, 100))
 
         # Load F and J key images
-        self.f_key_img = QPixmap("/home/parinaz/igt/Iowa_Gambling_Task_tkinter/images/f_key.png")
-        self.f_key_img = self.f_key_img.scaled(100, 100, Qt.AspectRatioMode.KeepAspectRatio)
-
-        self.j_key_img = QPixmap("/home/parinaz/igt/Iowa_Gambling_Task_tkinter/images/j_key.png")
-        self.j_key_img = self.j_key_img.scaled(100, 100, Qt.AspectRatioMode.KeepAspectRatio)
-
-        # Main layout
-        self.main_layout = QVBoxLayout()
-        self.setLayout(self.main_layout)
-
-        # Start with the registration page
-        self.register_page()
+        self.f_key_img = load_pixmap('f_key', (100, 100))
+        self.j_key_img = load_pixmap('j_key', (100, 100))
+
+        # Import the export library while the participant is still registering
+        self.engine.preload_exporter()
+        QTimer.singleShot(0, self.prerender_pages)
+
+    # Function to build and render the next static screen that is not built yet, one per
+    # idle step so typing on the registration page stays responsive
+    def prerender_pages(self):
+        for name, lines in static_pages:
+            if name not in self.pages:
+                self.prerender(self.page(name, lines))
+                QTimer.singleShot(0, self.prerender_pages)
+                return
+        if self.trial_screen is None:
+            self.build_trial_screen()
+            self.prerender(self.trial_screen)
+
+    # Function to lay out, polish and paint a hidden page once (text layouts and glyphs get cached)
+    def prerender(self, page):
+        page.resize(self.stack.size())
+        page.grab()
 
     def keyPressEvent(self, event):
+        response_ns = time.perf_counter_ns()  # Taken before any widget work
         if self.game_ended:
-            return        
-        if event.key() == Qt.Key.Key_F and self.timer_running:
-            self.play()
-        elif event.key() == Qt.Key.Key_J and self.timer_running:
-            self.pass_turn()
-        elif event.key() == Qt.Key.Key_Space and self.space_enabled and not self.timer_running:
-            self.continue_trial()
-        elif event.key() == Qt.Key.Key_Space and hasattr(self, 'go_to_next_page') and not self.timer_running:
+            if self.kiosk and event.key() == Qt.Key.Key_Space:
+                self.new_participant()
+            return
+        if self.audit is not None:
+            self.audit.key(QKeySequence(event.key()).toString(), event.timestamp(), response_ns, self.engine.state)
+        awaiting = self.engine.state.awaiting
+        if event.key() == Qt.Key.Key_F and awaiting == 'response':
+            self.engine.respond('play', response_ns)
+        elif event.key() == Qt.Key.Key_J and awaiting == 'response':
+            self.engine.respond('pass', response_ns)
+        elif event.key() == Qt.Key.Key_Space and awaiting == 'continue':
+            self.engine.continue_trial()
+        elif event.key() == Qt.Key.Key_Space and self.go_to_next_page is not None and awaiting != 'response':
             self.go_to_next_page()
-
-    def clear_layout(self):
-        while self.main_layout.count():
-            item = self.main_layout.takeAt(0)
-            widget = item.widget()
-            if widget is not None:
-                widget.deleteLater()
-            else:
-                self.clear_layout_recursive(item.layout())
-
-    def clear_layout_recursive(self, layout):
-        if layout is not None:
-            while layout.count():
-                item = layout.takeAt(0)
-                widget = item.widget()
-                if widget is not None:
-                    widget.deleteLater()
-                else:
-                    self.clear_layout_recursive(item.layout())
+        if self.audit is not None:
+            self.audit.handled(self.engine.state)
+
+    # Function to make a label of the shared font, coloured by a stylesheet tone
+    def make_label(self, text="", tone=None):
+        label = QLabel(text)
+        label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        if tone is not None:
+            label.setProperty('tone', tone)
+        return label
+
+    # Function to get a pooled page, built on first use and kept for the rest of the session
+    def page(self, name, lines=()):
+        page = self.pages.get(name)
+        if page is None:
+            page = QWidget()
+            layout = QVBoxLayout(page)
+            for text, tone in lines:
+                layout.addWidget(self.make_label(text, tone))
+            self.stack.addWidget(page)
+            self.pages[name] = page
+        return page
+
+    def show_page(self, page):
+        self.stack.setCurrentWidget(page)
 
     def register_page(self):
-        self.clear_layout()
-        
-        registration_layout = QVBoxLayout()
-        
-        title_label = QLabel("ثبت اطلاعات")
-        title_label.setFont(self.custom_font)
-        title_label.setStyleSheet("color: blue;")
-        title_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        registration_layout.addWidget(title_label)
-        
-        instruction_label = QLabel("نام و شناسه خود را وارد کنید:")
-        instruction_label.setFont(self.custom_font)
-        instruction_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        registration_layout.addWidget(instruction_label)
-        
+        if 'register' in self.pages:
+            self.show_page(self.pages['register'])
+            return
+        page = self.page('register', register_lines)
+        layout = page.layout()
+
         self.name_entry = QLineEdit()
-        self.name_entry.setFont(self.custom_font)
         self.name_entry.setAlignment(Qt.AlignmentFlag.AlignRight)
-        registration_layout.addWidget(self.name_entry)
-        
+        layout.addWidget(self.name_entry)
+
         self.id_entry = QLineEdit()
-        self.id_entry.setFont(self.custom_font)
         self.id_entry.setAlignment(Qt.AlignmentFlag.AlignRight)
-        registration_layout.addWidget(self.id_entry)
-        
+        layout.addWidget(self.id_entry)
+
         start_button = QPushButton("شروع")
-        start_button.setFont(self.custom_font)
-        start_button.setStyleSheet("background-color: green; color: white;")
+        start_button.setObjectName('start_button')
         start_button.clicked.connect(self.start_task)
-        registration_layout.addWidget(start_button)
-        
-        self.main_layout.addLayout(registration_layout)
-        
-        self.setLayoutDirection(Qt.LayoutDirection.RightToLeft)
+        layout.addWidget(start_button)
+
+        self.show_page(page)
 
     def start_task(self):
-        self.participant_name = self.name_entry.text()
-        self.participant_id = self.id_entry.text()
-        if not self.participant_name or not self.participant_id:
+        participant_name = self.name_entry.text()
+        participant_id = self.id_entry.text()
+        if not participant_name or not participant_id:
             QMessageBox.warning(self, "خطای ورودی", "لطفاً نام و شناسه خود را وارد کنید.")
             return
+        if not valid_participant_id(participant_id):
+            QMessageBox.warning(self, "خطای ورودی", invalid_id_text)
+            return
+        self.engine.register(participant_id, participant_name)
+        if self.audit is not None:
+            self.audit.participant_id = participant_id
+        self.setFocus()  # Keys no longer go to the (hidden) entries
         self.show_welcome_page()
 
+    # Function to hand the window over to the next participant (--kiosk): the engine starts
+    # a fresh session and every page and image is reused, so there is nothing to relaunch.
+    # Waits on the end page until the previous participant's data is saved
+    def new_participant(self):
+        job = self.engine.save_job
+        if job is not None and not job.done:
+            return
+        self.sessions += 1
+        self.engine.new_session(self.seed + self.sessions if self.seed is not None else None)
+        self.game_ended = False
+        self.go_to_next_page = None
+        self.name_entry.clear()
+        self.id_entry.clear()
+        self.register_page()
+        self.name_entry.setFocus()
+
     def show_welcome_page(self):
-        self.clear_layout()
-        welcome_layout = QVBoxLayout()
-        
-        welcome_label = QLabel("در این بازی هدف شما این است که تا حد ممکن پول برنده شوید!")
-        welcome_label.setFont(self.custom_font)
-        welcome_label.setStyleSheet("color: blue;")
-        welcome_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        welcome_layout.addWidget(welcome_label)
-        
-        instruction1 = QLabel("برای هر دور یک فلش زرد رنگ بالای یکی از چهار دسته کارت نشان داده خواهد شد")
-        instruction1.setFont(self.custom_font)
-        instruction1.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        welcome_layout.addWidget(instruction1)
-        
-        instruction2 = QLabel("به واسطه آن، میتوانید بین بازی کردن یا رد کردن آن کارت تصمیم بگیرید.")
-        instruction2.setFont(self.custom_font)
-        instruction2.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        welcome_layout.addWidget(instruction2)
-        
-        instruction3 = QLabel("اگر بازی کنید؛ ممکن است سکه برنده شوید و یا از دست بدهید")
-        instruction3.setFont(self.custom_font)
-        instruction3.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        welcome_layout.addWidget(instruction3)
-        
-        instruction4 = QLabel("(و یا نه سکه ببرید و نه از دست بدهید)")
-        instruction4.setFont(self.custom_font)
-        instruction4.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        welcome_layout.addWidget(instruction4)
-        
-        instruction5 = QLabel("اگر رد شوید؛ نه سکه می‌برید و نه چیزی از دست خواهید داد.")
-        instruction5.setFont(self.custom_font)
-        instruction5.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        welcome_layout.addWidget(instruction5)
-
-        instruction5 = QLabel("برخی از دسته کارت ها سودآور تر از بقیه خواهند بود.")
-        instruction5.setFont(self.custom_font)
-        instruction5.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        welcome_layout.addWidget(instruction5)
-        
-        instruction6 = QLabel("توجه کنید که در هر نوبت فقط 4 ثانیه زمان دارید تا تصمیم بگیرید")
-        instruction6.setFont(self.custom_font)
-        instruction6.setStyleSheet("color: red;")
-        instruction6.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        welcome_layout.addWidget(instruction6)
-        
-        instruction7 = QLabel("با 2000 سکه شروع خواهید کرد.")
-        instruction7.setFont(self.custom_font)
-        instruction7.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        welcome_layout.addWidget(instruction7)
-        
-        space_label = QLabel("برای ادامه کلید space را فشار دهید.")
-        space_label.setFont(self.custom_font)
-        space_label.setStyleSheet("color: green;")
-        space_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        welcome_layout.addWidget(space_label)
-        
-        self.main_layout.addLayout(welcome_layout)
-        
+        self.show_page(self.page('welcome', welcome_lines))
         self.go_to_next_page = self.show_practice_instructions
 
     def show_practice_instructions(self):
-        self.clear_layout()
-        practice_layout = QVBoxLayout()
-        
-        title_label = QLabel("پیش از آغاز بازی اصلی، به بازی تمرینی خواهید پرداخت")
-        title_label.setFont(self.custom_font)
-        title_label.setStyleSheet("color: blue;")
-        title_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        practice_layout.addWidget(title_label)
-        
-        instruction1 = QLabel("این مرحله در چند تکرار انجام خواهد شد و فقط جهت آشنایی شما")
-        instruction1.setFont(self.custom_font)
-        instruction1.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        practice_layout.addWidget(instruction1)
-        
-        instruction2 = QLabel("با ساختار و نحوه انجام بازی است.")
-        instruction2.setFont(self.custom_font)
-        instruction2.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        practice_layout.addWidget(instruction2)
-        
-        instruction3 = QLabel("لذا نتایج این مرحله ثبت نخواهد شد")
-        instruction3.setFont(self.custom_font)
-        instruction3.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        practice_layout.addWidget(instruction3)
-        
-        space_label = QLabel("برای ادامه کلید space را فشار دهید.")
-        space_label.setFont(self.custom_font)
-        space_label.setStyleSheet("color: green;")
-        space_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        practice_layout.addWidget(space_label)
-        
-        self.main_layout.addLayout(practice_layout)
-        
-        self.go_to_next_page = self.practice_game
-
-    def practice_game(self):
-        self.is_practice = True
-        self.current_trial = 0
-        self.main_task()
-
-    def show_transition_to_main_game(self):
-        self.clear_layout()
-        transition_layout = QVBoxLayout()
-        
-        title_label = QLabel("پایان مرحله تمرینی")
-        title_label.setFont(self.custom_font)
-        title_label.setStyleSheet("color: blue;")
-        title_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        transition_layout.addWidget(title_label)
-        
-        instruction1 = QLabel("اکنون به بازی اصلی میپردازید.")
-        instruction1.setFont(self.custom_font)
-        instruction1.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        transition_layout.addWidget(instruction1)
-        
-        instruction2 = QLabel("در این مرحله پاسخ های شما ثبت خواهد شد و در پایان")
-        instruction2.setFont(self.custom_font)
-        instruction2.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        transition_layout.addWidget(instruction2)
-        
-        instruction3 = QLabel("نتیجه نهایی خود را مشاهده خواهید کرد.")
-        instruction3.setFont(self.custom_font)
-        instruction3.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        transition_layout.addWidget(instruction3)
-        
-        instruction4 = QLabel("موفق باشید.")
-        instruction4.setFont(self.custom_font)
-        instruction4.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        transition_layout.addWidget(instruction4)
-        
-        space_label = QLabel("برای ادامه کلید space را فشار دهید.")
-        space_label.setFont(self.custom_font)
-        space_label.setStyleSheet("color: green;")
-        space_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        transition_layout.addWidget(space_label)
-        
-        self.main_layout.addLayout(transition_layout)
-        
-        self.go_to_next_page = self.start_main_game
-
-    def start_main_game(self):
-        self.is_practice = False
-        self.current_trial = 0
-        self.net_worth = 2000
-        self.previous_net_worth = 2000
-        # Reset deck instances for main game
-        global deck_instances
-        deck_instances = {deck: list(seq) for deck, seq in deck_sequences.items()}
-        for deck in deck_instances.values():
-            random.shuffle(deck)
-        self.main_task()
-
-    def main_task(self):
-        self.clear_layout()
-        
-        main_layout = QVBoxLayout()
-
-        self.net_worth_label = QLabel(f"موجودی فعلی: {persian_number(self.net_worth)} سکه")
-        self.net_worth_label.setFont(self.custom_font)
-        self.net_worth_label.setStyleSheet("color: purple;")
-        self.net_worth_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        self.show_page(self.page('practice', practice_lines))
+        self.go_to_next_page = self.engine.start_practice
+
+    def show_transition(self, state):
+        self.show_page(self.page('transition', transition_lines))
+        self.go_to_next_page = self.engine.start_main
+
+    def enter_phase(self, state):
+        self.load_assets()
+        if self.trial_screen is None:
+            self.build_trial_screen()
+        # Reuse the trial screen: only text, colour and the arrow position change
+        self.update_ui(state)
+        self.show_page(self.trial_screen)
+
+    def build_trial_screen(self):
+        # Built once and kept alive between practice and main game
+        self.trial_screen = self.page('trial')
+        main_layout = self.trial_screen.layout()
+        main_layout.setContentsMargins(0, 0, 0, 0)
+
+        self.net_worth_label = self.make_label(tone="purple")
         main_layout.addWidget(self.net_worth_label)
         
-        self.previous_net_worth_label = QLabel(f"موجودی قبلی: {persian_number(self.previous_net_worth)} سکه")
-        self.previous_net_worth_label.setFont(self.custom_font)
-        self.previous_net_worth_label.setStyleSheet("color: orange;")
-        self.previous_net_worth_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        self.previous_net_worth_label = self.make_label(tone="orange")
         main_layout.addWidget(self.previous_net_worth_label)
         
         deck_grid = QGridLayout()
         
         self.arrow_labels = []
+        self.arrow_position = None  # Column currently showing the arrow
         for i in range(4):
             label = QLabel()
-            if i == self.current_position:
-                label.setPixmap(self.arrow_img)
             label.setAlignment(Qt.AlignmentFlag.AlignCenter)
             deck_grid.addWidget(label, 0, 3-i)
             self.arrow_labels.append(label)
@@ -393,9 +383,7 @@ class IGTApp(QWidget):
         
         self.feedback_labels = []
         for i in range(4):
-            label = QLabel("")
-            label.setFont(self.custom_font)
-            label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+            label = self.make_label(tone="black")
             deck_grid.addWidget(label, 2, 3-i)
             self.feedback_labels.append(label)
         
@@ -403,9 +391,7 @@ class IGTApp(QWidget):
         f_key_label = QLabel()
         f_key_label.setPixmap(self.f_key_img)
         f_key_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        f_key_text = QLabel("برای بازی کردن")
-        f_key_text.setFont(self.custom_font)
-        f_key_text.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        f_key_text = self.make_label("برای بازی کردن")
         f_key_layout.addWidget(f_key_label)
         f_key_layout.addWidget(f_key_text)
         deck_grid.addLayout(f_key_layout, 3, 3)
@@ -414,160 +400,116 @@ class IGTApp(QWidget):
         j_key_label = QLabel()
         j_key_label.setPixmap(self.j_key_img)
         j_key_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        j_key_text = QLabel("برای گذر کردن")
-        j_key_text.setFont(self.custom_font)
-        j_key_text.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        j_key_text = self.make_label("برای گذر کردن")
         j_key_layout.addWidget(j_key_label)
         j_key_layout.addWidget(j_key_text)
         deck_grid.addLayout(j_key_layout, 3, 0)
         
         main_layout.addLayout(deck_grid)
         
-        self.space_label_container = QVBoxLayout()
-        main_layout.addLayout(self.space_label_container)
-        
-        self.main_layout.addLayout(main_layout)
-        
-        self.start_trial()
+        # Space prompt stays in place and is emptied between trials
+        self.space_label = self.make_label(tone="blue")
+        main_layout.addWidget(self.space_label)
 
-    def start_trial(self):
-        if self.is_practice and self.current_trial >= practice_trials:
-            self.show_transition_to_main_game()
-            return
-        elif not self.is_practice and self.current_trial >= total_trials:
-            self.quit()
-            return
-        self.current_trial += 1
-        self.presented_deck = self.decks[self.current_position]
-        self.timer_running = True
-        self.space_enabled = False
-        self.timer.start(timeout_duration)
-
-    def timeout(self):
-        if self.timer_running:
-            print("Timeout triggered")
-            self.timer_running = False
-            self.timer.stop()
-            self.previous_net_worth = self.net_worth
-            self.feedback_labels[self.current_position].setText("گذر")
-            self.feedback_labels[self.current_position].setStyleSheet("color: black;")
-            if not self.is_practice:
-                log_data(self.participant_id, self.participant_name, 'main', self.current_trial, self.presented_deck, 'pass', 0, self.net_worth)
-            self.update_ui()
-            self.wait_for_space()
-
-    def wait_for_space(self):
-        self.space_enabled = True
-        while self.space_label_container.count():
-            item = self.space_label_container.takeAt(0)
-            widget = item.widget()
-            if widget is not None:
-                widget.deleteLater()
-        
-        space_label = QLabel("برای ادامه فاصله (Space) را بزنید")
-        space_label.setFont(self.custom_font)
-        space_label.setStyleSheet("color: blue;")
-        space_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        self.space_label_container.addWidget(space_label)
-
-    def continue_trial(self):
-        if not self.space_enabled:
+    def move_arrow(self, position):
+        if position == self.arrow_position:
             return
-        print("Continuing to next trial")
-        self.space_enabled = False
-        
-        while self.space_label_container.count():
-            item = self.space_label_container.takeAt(0)
-            widget = item.widget()
-            if widget is not None:
-                widget.deleteLater()
-        
+        if self.arrow_position is not None:
+            self.arrow_labels[self.arrow_position].clear()
+        self.arrow_labels[position].setPixmap(self.arrow_img)
+        self.arrow_position = position
+
+    def present_trial(self, state):
+        self.space_label.setText("")
         self.clear_feedback()
-        
-        self.current_position = random.randint(0, len(self.decks) - 1)
-        for i, label in enumerate(self.arrow_labels):
-            if i == self.current_position:
-                label.setPixmap(self.arrow_img)
-            else:
-                label.clear()
-        
-        self.start_trial()
+        self.move_arrow(state.position)
+        # Paint the arrow first; the response window runs from the real onset
+        self.main_layout.activate()
+        self.repaint()
+        return time.perf_counter_ns()
+
+    def show_outcome(self, state):
+        label = self.feedback_labels[state.position]
+        if state.choice == 'play':
+            label.setText(f"{persian_number(abs(state.outcome))} {'سود' if state.outcome > 0 else 'ضرر'}")
+            set_tone(label, "green" if state.outcome > 0 else "red")
+        else:
+            label.setText("گذر")
+            set_tone(label, "black")
+        self.update_ui(state)
+
+    def wait_for_continue(self, state):
+        self.space_label.setText("برای ادامه فاصله (Space) را بزنید")
 
     def clear_feedback(self):
         for label in self.feedback_labels:
             label.setText("")
 
-    def update_ui(self):
-        self.net_worth_label.setText(f"موجودی فعلی: {persian_number(self.net_worth)} سکه")
-        self.previous_net_worth_label.setText(f"موجودی قبلی: {persian_number(self.previous_net_worth)} سکه")
+    def update_ui(self, state):
+        self.net_worth_label.setText(f"موجودی فعلی: {persian_number(state.net_worth)} سکه")
+        self.previous_net_worth_label.setText(f"موجودی قبلی: {persian_number(state.previous_net_worth)} سکه")
 
-    def play(self):
-        if not self.timer_running:
-            return
-        self.timer.stop()
-        self.timer_running = False
-        selected_deck = self.decks[self.current_position]
-        outcome = simulate_outcome(selected_deck)
-        self.previous_net_worth = self.net_worth
-        self.net_worth += outcome
-        
-        feedback_text = f"{persian_number(abs(outcome))} {'سود' if outcome > 0 else 'ضرر'}"
-        self.feedback_labels[self.current_position].setText(feedback_text)
-        self.feedback_labels[self.current_position].setStyleSheet("color: green;" if outcome > 0 else "color: red;")
-        
-        if not self.is_practice:
-            log_data(self.participant_id, self.participant_name, 'main', self.current_trial, self.presented_deck, 'play', outcome, self.net_worth)
-        self.update_ui()
-        self.wait_for_space()
-
-    def pass_turn(self):
-        if not self.timer_running:
-            return
-        self.timer.stop()
-        self.timer_running = False
-        self.previous_net_worth = self.net_worth
-        self.feedback_labels[self.current_position].setText("گذر")
-        self.feedback_labels[self.current_position].setStyleSheet("color: black;")
-        if not self.is_practice:
-            log_data(self.participant_id, self.participant_name, 'main', self.current_trial, self.presented_deck, 'pass', 0, self.net_worth)
-        self.update_ui()
-        self.wait_for_space()
-
-    def quit(self):
-        if not self.is_practice:
-            log_data(self.participant_id, self.participant_name, 'final', 'end', 'none', 'end', 0, self.net_worth)
-            try:
-                save_data(self.participant_id)
-            except Exception as e:
-                print(f"Error saving data: {e}")
-        
-        self.game_ended = True
-        self.timer.stop()
-        self.clear_layout()
-        quit_layout = QVBoxLayout()
-        
-        final_message = QLabel(f"پایان بازی\n\nپژوهشگران:\n\n Parinaz Khosravani\nparinaz.khosravaani@gmail.com \n\n Farzad Soleimani\nfarzadsoleimani7593@gmail.com")
-        final_message.setFont(self.custom_font)
-        final_message.setStyleSheet("color: blue;")
-        final_message.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        quit_layout.addWidget(final_message)
-        
-        net_worth_label = QLabel(f"موجودی نهایی شما: {persian_number(self.net_worth)} سکه")
-        net_worth_label.setFont(self.custom_font)
-        net_worth_label.setStyleSheet("color: purple;")
-        net_worth_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        quit_layout.addWidget(net_worth_label)
+    def start_timer(self, delay_ms, callback):
+        self.timer.start(delay_ms)  # timeout is connected to response_window.poll
+        return self.timer
 
-        instruction_label = QLabel("برای خروج، لطفاً پنجره را با ماوس ببندید")
-        instruction_label.setFont(self.custom_font)
-        instruction_label.setStyleSheet("color: red;")
-        instruction_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        quit_layout.addWidget(instruction_label)
+    def stop_timer(self, timer):
+        timer.stop()
 
-        self.main_layout.addLayout(quit_layout)
+    def show_end(self, state):
+        self.game_ended = True
+        if 'end' not in self.pages:
+            layout = self.page('end', ((end_message, "blue"),)).layout()
+            self.final_net_worth_label = self.make_label(tone="purple")
+            layout.addWidget(self.final_net_worth_label)
+            self.save_label = self.make_label(tone="black")
+            layout.addWidget(self.save_label)
+            layout.addWidget(self.make_label(*(end_kiosk_line if self.kiosk else end_exit_line)))
+        self.final_net_worth_label.setText(f"موجودی نهایی شما: {persian_number(state.net_worth)} سکه")
+        self.show_page(self.pages['end'])
+        self.update_save_status()
+
+    def log_failed(self, error):
+        QMessageBox.warning(self, "خطا", save_status_texts['failed'][0])
+
+    # Function to show how the background save is doing, polled until it is done
+    def update_save_status(self):
+        job = self.engine.save_job
+        if job is None:
+            return
+        if not job.done:
+            self.save_label.setText(f"در حال ذخیره اطلاعات... {persian_number(int(job.fraction * 100))}٪")
+            set_tone(self.save_label, "black")
+            QTimer.singleShot(100, self.update_save_status)
+            return
+        text, colour = save_status_texts[job.status]
+        self.save_label.setText(text)
+        set_tone(self.save_label, colour)
 
 if __name__ == "__main__":
-    app = QApplication(sys.argv)
-    window = IGTApp()
+    parser = argparse.ArgumentParser(description="Iowa Gambling Task (Qt)")
+    parser.add_argument('--profile', nargs='?', const='', default=None, metavar='TRACE',
+                        help="Time the hot paths and write a Chrome trace on exit")
+    parser.add_argument('--config', default=None, metavar='PATH',
+                        help="Task definition file (.toml or .json, see config.py)")
+    parser.add_argument('--seed', type=int, default=None, help="Session seed (default: a fresh one, logged)")
+    parser.add_argument('--audit-latency', nargs='?', const='', default=None, metavar='CSV',
+                        help="Time every key press up to the next paint and write a latency report on exit")
+    parser.add_argument('--kiosk', action='store_true',
+                        help="Run participants back to back: Space on the end page starts the next session")
+    args, qt_args = parser.parse_known_args()
+    profiler = Profiler() if args.profile is not None else None
+    audit = LatencyAudit() if args.audit_latency is not None else None
+    config = load_config(args.config) if args.config else None
+
+    app = QApplication(sys.argv[:1] + qt_args)
+    window = IGTApp(profiler, config, args.seed, audit, args.kiosk)
     window.show()
-    sys.exit(app.exec())  
\ No newline at end of file
+    status = app.exec()
+    if window.engine.save_job is not None:
+        window.engine.save_job.wait()  # Closing the window early does not cut the save short
+    if profiler is not None:
+        profiler.dump(args.profile or profile_path(output_dir, window.engine.participant_id))
+    if audit is not None:
+        audit.dump(args.audit_latency or latency_path(output_dir, window.engine.participant_id))
+    sys.exit(status)  
\ No newline at end of file
@@ -0,0 +1,74 @@
+import hashlib
+import json
+import os
+
+# On-disk cache of pre-scaled images.
+# A cached file is keyed by the content hash of its source image, the target
+# size and the scaling variant, so it is only rebuilt when a source changes.
+# Source hashes are remembered by (mtime, size) to avoid rehashing on startup.
+
+cache_dir = os.environ.get('IGT_ASSET_CACHE',
+                           os.path.join(os.path.expanduser('~'), '.cache', 'iowa_gambling_task'))
+_index = None  # Source path -> [mtime_ns, size, sha256]
+_index_changed = False
+
+
+def _index_path():
+    return os.path.join(cache_dir, 'index.json')
+
+
+def _load_index():
+    global _index
+    if _index is None:
+        try:
+            with open(_index_path(), encoding='utf-8') as f:
+                _index = json.load(f)
+        except (OSError, ValueError):
+            _index = {}
+    return _index
+
+
+def _save_index():
+    global _index_changed
+    _index_changed = False
+    tmp = f"{_index_path()}.{os.getpid()}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(_index, f)
+    os.replace(tmp, _index_path())
+
+
+# Function to get the content hash of a source image
+def source_digest(source):
+    global _index_changed
+    index = _load_index()
+    key = os.path.abspath(source)
+    stat = os.stat(source)
+    entry = index.get(key)
+    if entry and entry[0] == stat.st_mtime_ns and entry[1] == stat.st_size:
+        return entry[2]
+    with open(source, 'rb') as f:
+        digest = hashlib.sha256(f.read()).hexdigest()
+    index[key] = [stat.st_mtime_ns, stat.st_size, digest]
+    _index_changed = True
+    return digest
+
+
+# Function to get the path of a pre-scaled copy of source, building it if needed.
+# render(source, size, dest) must write a PNG to dest or raise OSError.
+def cached_asset(source, size, variant, render):
+    os.makedirs(cache_dir, exist_ok=True)
+    digest = source_digest(source)
+    stem = os.path.splitext(os.path.basename(source))[0]
+    prefix = f"{stem}-{size[0]}x{size[1]}-{variant}-"
+    path = os.path.join(cache_dir, f"{prefix}{digest[:16]}.png")
+    if not os.path.exists(path):
+        tmp = f"{path[:-4]}.{os.getpid()}.tmp.png"
+        render(source, size, tmp)
+        os.replace(tmp, path)
+        # Drop copies built from an older version of the source
+        for name in os.listdir(cache_dir):
+            if name.startswith(prefix) and name.endswith('.png') and name != os.path.basename(path):
+                os.remove(os.path.join(cache_dir, name))
+    if _index_changed:
+        _save_index()
+    return path
@@ -0,0 +1,439 @@
+import argparse
+import contextlib
+import glob
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+# Benchmark suite for the task's hot paths, run headless.
+# Every benchmark times `number` operations per repeat and keeps the median and
+# best time per operation. Results are stored per commit in results_dir, and a
+# run fails when a benchmark got slower than the previous commit's result by
+# more than its threshold. Benchmarks whose optional dependency is missing
+# (openpyxl, pyarrow, Pillow, PyQt6) are skipped.
+
+src_dir = os.path.dirname(os.path.abspath(__file__))
+repo_dir = os.path.dirname(src_dir)
+image_dir = os.path.join(repo_dir, 'images')
+results_dir = os.path.join(repo_dir, 'benchmark_results')
+default_threshold = 0.25  # Fail when more than 25% slower than the baseline
+# Benchmarks dominated by disk or GUI work are noisier
+thresholds = {
+    'save_data_xlsx_12000': 0.5,
+    'asset_cold': 0.5,
+    'session_qt': 0.5,
+    'page_transition_qt': 0.5,
+    'page_transition_tk': 0.5,
+    'new_participant_qt': 0.5,
+    'startup_tk_import': 0.5,
+    'startup_qt_import': 0.5,
+    'startup_qt_window': 0.5,
+}
+
+benchmarks = {}
+_cleanups = []  # Callables undoing the current benchmark's setup, run when it is done
+
+
+class Skip(Exception):
+    pass
+
+
+# Function to get a temporary directory that is removed after the current benchmark
+def scratch_dir(prefix='igt-bench-'):
+    path = tempfile.mkdtemp(prefix=prefix)
+    _cleanups.append(lambda: shutil.rmtree(path, ignore_errors=True))
+    return path
+
+
+# Decorator registering fn(number) -> callable that performs `number` operations
+def benchmark(name, number, repeat=7):
+    def register(fn):
+        benchmarks[name] = (fn, number, repeat)
+        return fn
+    return register
+
+
+@benchmark('outcome_probabilistic', 100_000)
+def bench_outcome_probabilistic(number):
+    from engine import ProbabilisticOutcomes
+    from decks import decks
+    outcomes = ProbabilisticOutcomes(seed=1)
+    draws = [random.choice(decks) for _ in range(number)]
+    return lambda: [outcomes.draw(deck) for deck in draws]
+
+
+@benchmark('outcome_sequence', 100_000)
+def bench_outcome_sequence(number):
+    from engine import SequenceOutcomes
+    from decks import decks
+    outcomes = SequenceOutcomes(seed=1)
+    draws = [random.choice(decks) for _ in range(number)]
+    return lambda: [outcomes.draw(deck) for deck in draws]
+
+
+@benchmark('persian_number', 100_000)
+def bench_persian_number(number):
+    from persian import persian_number
+    values = [random.randint(-5000, 10000) for _ in range(number)]
+    return lambda: [persian_number(v) for v in values]
+
+
+@benchmark('log_data', 100_000)
+def bench_log_data(number):
+    engine = headless_engine()
+
+    def run():
+        engine.trial_data.clear()
+        for i in range(number):
+            engine.log_data('main', i, 'deck_a', 'play', 100, 2100, 1_000_000, 2_000_000, None)
+    return run
+
+
+def headless_engine():
+    from engine import IGTEngine, HeadlessFrontEnd
+    engine = IGTEngine(HeadlessFrontEnd(), export_excel=False)
+    engine.register('bench', 'bench')
+    return engine
+
+
+def sample_rows(n):
+    engine = headless_engine()
+    for i in range(n):
+        engine.log_data('main', i + 1, 'deck_b', random.choice(('play', 'pass')), random.choice((100, -1150, 0)),
+                        2000 + i, i * 1_000_000, i * 1_000_000 + 700_000_000, None)
+    return engine.trial_data
+
+
+def save_benchmark(rows, output_format):
+    def setup(number):
+        from engine import save_data
+        if output_format == 'xlsx':
+            require('openpyxl')
+        else:
+            require('pyarrow')
+        data = sample_rows(rows)
+        output_dir = scratch_dir()
+
+        def run():
+            with contextlib.redirect_stdout(io.StringIO()):
+                for _ in range(number):
+                    save_data(data, 'bench', output_dir, output_format)
+        return run
+    return setup
+
+
+for rows in (120, 1200, 12000):
+    benchmark(f'save_data_xlsx_{rows}', 1, repeat=3 if rows > 1200 else 5)(save_benchmark(rows, 'xlsx'))
+    benchmark(f'save_data_parquet_{rows}', 1, repeat=5)(save_benchmark(rows, 'parquet'))
+
+
+def asset_benchmark(warm):
+    def setup(number):
+        require('PIL')
+        import assets
+        from main import render_lanczos
+        sources = sorted(glob.glob(os.path.join(image_dir, '*.png')))
+        if not sources:
+            raise Skip(f"No images in {image_dir}")
+        cache_dir = assets.cache_dir
+
+        def restore():
+            assets.cache_dir = cache_dir
+            assets._index = None
+        _cleanups.append(restore)  # Runs after the scratch caches are removed
+
+        def run():
+            assets.cache_dir = scratch_dir('igt-assets-') if not warm else warm_dir
+            assets._index = None
+            for source in sources:
+                assets.cached_asset(source, (200, 300), 'lanczos', render_lanczos)
+        warm_dir = scratch_dir('igt-assets-')
+        if warm:
+            assets.cache_dir = warm_dir
+            run()  # Build the cache once; the timed runs only look it up
+        return run
+    return setup
+
+
+benchmark('asset_cold', 1, repeat=5)(asset_benchmark(warm=False))
+benchmark('asset_warm', 1, repeat=7)(asset_benchmark(warm=True))
+
+
+@benchmark('session_headless', 10)
+def bench_session_headless(number):
+    from engine import run_headless
+    return lambda: [run_headless() for _ in range(number)]
+
+
+# Starting the next participant in the same engine (kiosk mode) after a full session
+@benchmark('session_reset', 1000)
+def bench_session_reset(number):
+    from engine import run_headless
+    engine = run_headless()
+
+    def run():
+        for _ in range(number):
+            engine.new_session()
+    return run
+
+
+# A full 120-trial session through the Qt IGTApp on the offscreen platform,
+# with key presses delivered as real key events
+@benchmark('session_qt', 1, repeat=3)
+def bench_session_qt(number):
+    require('PyQt6')
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    from PyQt6.QtWidgets import QApplication
+    from PyQt6.QtTest import QTest
+    from PyQt6.QtCore import Qt
+    import IGTQT
+    IGTQT.image_dir = image_dir
+    IGTQT.output_dir = scratch_dir()
+    IGTQT.export_excel = False
+    app = QApplication.instance() or QApplication([])
+    keys = (Qt.Key.Key_F, Qt.Key.Key_J)
+
+    def run():
+        window = IGTQT.IGTApp()
+        window.show()
+        window.name_entry.setText('bench')
+        window.id_entry.setText('bench')
+        with contextlib.redirect_stdout(io.StringIO()):
+            window.start_task()
+            for _ in range(2):
+                QTest.keyClick(window, Qt.Key.Key_Space)
+                app.processEvents()
+            while not window.game_ended:
+                QTest.keyClick(window, random.choice(keys))
+                app.processEvents()
+                QTest.keyClick(window, Qt.Key.Key_Space)
+                app.processEvents()
+        window.close()
+        window.deleteLater()
+        app.processEvents()
+    return run
+
+
+# Instruction-page transitions (what a space press does before the trial screen),
+# switch and paint; the pages are prerendered as they are after startup
+@benchmark('page_transition_qt', 100)
+def bench_page_transition_qt(number):
+    require('PyQt6')
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    from PyQt6.QtWidgets import QApplication
+    import IGTQT
+    IGTQT.image_dir = image_dir
+    app = QApplication.instance() or QApplication([])
+    window = IGTQT.IGTApp()
+    window.show()
+    window.load_assets()
+    window.prerender_pages()
+    app.processEvents()
+    pages = [window.page(name) for name, _ in IGTQT.static_pages]
+
+    def run():
+        for i in range(number):
+            window.show_page(pages[i % len(pages)])
+            app.processEvents()  # Delivers the update request: the new page is painted
+    return run
+
+
+# Kiosk handover in the Qt window: new session, registration page shown and painted
+@benchmark('new_participant_qt', 100)
+def bench_new_participant_qt(number):
+    require('PyQt6')
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    from PyQt6.QtWidgets import QApplication
+    import IGTQT
+    IGTQT.image_dir = image_dir
+    app = QApplication.instance() or QApplication([])
+    window = IGTQT.IGTApp(kiosk=True)
+    window.show()
+    window.load_assets()
+    window.prerender_pages()
+    app.processEvents()
+
+    def run():
+        for _ in range(number):
+            window.show_page(window.page('welcome'))
+            window.game_ended = True
+            window.new_participant()
+            app.processEvents()
+    return run
+
+
+@benchmark('page_transition_tk', 100)
+def bench_page_transition_tk(number):
+    try:
+        from tkinter import Tk, TclError
+        root = Tk()
+    except (ImportError, TclError) as e:
+        raise Skip(f"no Tk display ({e})")
+    import main
+    main.image_dir = image_dir
+    root.withdraw()
+    app = main.IGTApp(root)
+    app.load_assets()
+    app.prerender_pages()
+    root.deiconify()
+    root.update()
+    pages = [app.page(name) for name, _ in main.static_pages]
+
+    def run():
+        for i in range(number):
+            app.show_page(pages[i % len(pages)])
+            root.update_idletasks()
+    return run
+
+
+# Fresh-interpreter startup of the front ends (see startup.py for the budget check)
+def startup_benchmark(module, window):
+    def setup(number):
+        import startup
+        if module == 'IGTQT':
+            require('PyQt6')
+
+        def run():
+            for _ in range(number):
+                if window:
+                    startup.first_window_ms(module)
+                else:
+                    startup.import_profile(module)
+        try:
+            run()
+        except RuntimeError as e:
+            raise Skip(str(e))
+        return run
+    return setup
+
+
+benchmark('startup_tk_import', 1, repeat=5)(startup_benchmark('main', window=False))
+benchmark('startup_qt_import', 1, repeat=5)(startup_benchmark('IGTQT', window=False))
+benchmark('startup_qt_window', 1, repeat=5)(startup_benchmark('IGTQT', window=True))
+
+
+def require(*modules):
+    import importlib.util
+    for module in modules:
+        if importlib.util.find_spec(module) is None:
+            raise Skip(f"{module} is not installed")
+
+
+# Function to time one benchmark; returns seconds per operation (median, best)
+def run_benchmark(name, quick=False):
+    setup, number, repeat = benchmarks[name]
+    if quick:
+        number = max(1, number // 10)
+        repeat = min(repeat, 3)
+    try:
+        run = setup(number)
+        run()  # Warm-up
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            run()
+            times.append((time.perf_counter() - start) / number)
+    finally:
+        while _cleanups:
+            _cleanups.pop()()
+    times.sort()
+    return {'median_s': times[len(times) // 2], 'min_s': times[0], 'number': number, 'repeat': repeat}
+
+
+def current_commit():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=repo_dir, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=repo_dir,
+                                    capture_output=True, text=True, check=True).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown', False
+    return commit, dirty
+
+
+# Function to find the stored result to compare against (latest from another commit)
+def load_baseline(directory, commit, baseline=None):
+    candidates = []
+    for path in glob.glob(os.path.join(directory, '*.json')):
+        with open(path, encoding='utf-8') as f:
+            result = json.load(f)
+        if baseline is not None:
+            if result['commit'].startswith(baseline):
+                return result
+        elif result['commit'] != commit:
+            candidates.append(result)
+    if baseline is not None:
+        raise SystemExit(f"No stored results for commit {baseline}")
+    return max(candidates, key=lambda r: r['timestamp']) if candidates else None
+
+
+def format_time(seconds):
+    for unit, scale in (('s', 1), ('ms', 1e-3), ('us', 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.3f} {unit}"
+    return f"{seconds / 1e-9:.1f} ns"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the headless benchmark suite and check for regressions.")
+    parser.add_argument('names', nargs='*', help=f"Benchmarks to run (default: all of {', '.join(benchmarks)})")
+    parser.add_argument('--results-dir', default=results_dir)
+    parser.add_argument('--baseline', default=None, help="Commit to compare against (default: latest other commit)")
+    parser.add_argument('--threshold', type=float, default=None, help="Override every regression threshold")
+    parser.add_argument('--quick', action='store_true', help="Fewer iterations, for a smoke run")
+    parser.add_argument('--no-save', dest='save', action='store_false', help="Do not store this run's results")
+    args = parser.parse_args()
+
+    names = args.names or list(benchmarks)
+    unknown = [name for name in names if name not in benchmarks]
+    if unknown:
+        parser.error(f"Unknown benchmarks: {', '.join(unknown)}")
+    commit, dirty = current_commit()
+    baseline = load_baseline(args.results_dir, commit, args.baseline)
+    base_results = baseline['results'] if baseline else {}
+    if baseline:
+        print(f"Comparing against {baseline['commit'][:10]} ({baseline['timestamp']})")
+
+    results, skipped, regressions = {}, {}, []
+    for name in names:
+        try:
+            result = run_benchmark(name, args.quick)
+        except Skip as e:
+            skipped[name] = str(e)
+            print(f"{name:<26} skipped: {e}")
+            continue
+        results[name] = result
+        line = f"{name:<26} {format_time(result['median_s']):>12} per op (best {format_time(result['min_s'])})"
+        base = base_results.get(name)
+        if base:
+            change = result['median_s'] / base['median_s'] - 1
+            limit = args.threshold if args.threshold is not None else thresholds.get(name, default_threshold)
+            line += f"  {change:+.1%} vs baseline"
+            if change > limit:
+                regressions.append(name)
+                line += f"  REGRESSION (> {limit:.0%})"
+        print(line)
+
+    if args.save and not args.quick:
+        os.makedirs(args.results_dir, exist_ok=True)
+        record = {'commit': commit, 'dirty': dirty, 'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                  'python': platform.python_version(), 'platform': platform.platform(),
+                  'results': results, 'skipped': skipped}
+        path = os.path.join(args.results_dir, f"{commit[:12]}{'-dirty' if dirty else ''}.json")
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(record, f, indent=1)
+        print(f"Results saved to {path}")
+    if regressions:
+        print(f"{len(regressions)} benchmark(s) regressed: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+import argparse
+import glob
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from decks import decks
+from trial_log import read_log, parse_number, write_log, write_table
+
+# Cohort aggregation over the per-participant output directories.
+# Every Participant_* file is reduced (in a process pool) to its typed main
+# trials and per-block IGT metrics; the result is cached next to a manifest of
+# (mtime, size, sha256), so a rerun only reprocesses new or changed files before
+# the cached parts are combined into the cohort dataset.
+
+input_dirs = ["Iowa_Gambling_Task_tkinter/output", "Iowa_Gambling_Task_pyqt/output"]
+cohort_dir = "cohort"
+block_size = 20
+# When a participant was saved in several formats, read the first one found
+input_formats = ['.parquet', '.arrow', '.csv', '.jsonl', '.xlsx']
+
+trial_fields = ['Participant ID', 'Source', 'Trial Number', 'Block', 'Presented Deck', 'Choice', 'Outcome',
+                'Net Worth', 'RT (ms)', 'Timeout']
+trial_types = {'Participant ID': 'string', 'Source': 'string', 'Trial Number': 'int64', 'Block': 'int64',
+               'Presented Deck': 'string', 'Choice': 'string', 'Outcome': 'int64', 'Net Worth': 'int64',
+               'RT (ms)': 'float64', 'Timeout': 'bool'}
+block_fields = (['Participant ID', 'Source', 'Block', 'Trials', 'Net Score']
+                + [f"Play Rate {deck[-1].upper()}" for deck in decks] + ['Pass Rate', 'Timeout Rate'])
+block_types = dict({field: 'float64' for field in block_fields},
+                   **{'Participant ID': 'string', 'Source': 'string', 'Block': 'int64', 'Trials': 'int64',
+                      'Net Score': 'int64'})
+
+
+# Function to list one file per participant and directory
+def participant_files(dirs):
+    files = {}
+    for directory in dirs:
+        for path in glob.glob(os.path.join(directory, "Participant_*")):
+            stem, extension = os.path.splitext(path)
+            if extension not in input_formats:
+                continue
+            current = files.get(stem)
+            if current is None or input_formats.index(extension) < input_formats.index(os.path.splitext(current)[1]):
+                files[stem] = path
+    return sorted(files.values())
+
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# Function to read a participant file as a list of row dicts
+def read_participant(path):
+    if path.endswith(('.parquet', '.arrow')):
+        from trial_log import read_tables
+        return read_tables([path]).to_pylist()
+    if path.endswith('.xlsx'):
+        import pandas as pd
+        df = pd.read_excel(path, engine='openpyxl', dtype=object)
+        return df.astype(object).where(df.notna(), None).to_dict('records')
+    return read_log(path)
+
+
+# Function to reduce one participant file to typed main trials and block metrics (runs in a worker)
+def process_file(path):
+    trials = []
+    for row in read_participant(path):
+        if row.get('Trial Type') != 'main':
+            continue
+        trial_number = parse_number(row.get('Trial Number'))
+        if trial_number is None:
+            continue
+        trials.append({
+            'Participant ID': str(row.get('Participant ID')),
+            'Trial Number': trial_number,
+            'Block': (trial_number - 1) // block_size + 1,
+            'Presented Deck': row.get('Presented Deck'),
+            'Choice': row.get('Choice'),
+            'Outcome': parse_number(row.get('Outcome')),
+            'Net Worth': parse_number(row.get('Net Worth')),
+            'RT (ms)': parse_number(row.get('RT (ms)'), float),
+            # Logs from before the response-window rework have no overshoot column
+            'Timeout': (parse_number(row.get('Timeout Overshoot (ms)'), float) is not None
+                        if 'Timeout Overshoot (ms)' in row else None),
+        })
+    return {'trials': trials, 'blocks': block_metrics(trials)}
+
+
+# Function to compute the standard IGT metrics of every block of trials:
+# net score = plays on (C + D) - plays on (A + B), play rate per deck, pass and timeout rate
+def block_metrics(trials):
+    blocks = {}
+    for trial in trials:
+        blocks.setdefault(trial['Block'], []).append(trial)
+    metrics = []
+    for block, rows in sorted(blocks.items()):
+        presented = {deck: 0 for deck in decks}
+        played = {deck: 0 for deck in decks}
+        passes = 0
+        timeouts = [row['Timeout'] for row in rows if row['Timeout'] is not None]
+        for row in rows:
+            deck = row['Presented Deck']
+            if deck in presented:
+                presented[deck] += 1
+                played[deck] += row['Choice'] == 'play'
+            passes += row['Choice'] == 'pass'
+        metric = {
+            'Participant ID': rows[0]['Participant ID'],
+            'Block': block,
+            'Trials': len(rows),
+            'Net Score': played['deck_c'] + played['deck_d'] - played['deck_a'] - played['deck_b'],
+        }
+        for deck in decks:
+            metric[f"Play Rate {deck[-1].upper()}"] = played[deck] / presented[deck] if presented[deck] else None
+        metric['Pass Rate'] = passes / len(rows)
+        metric['Timeout Rate'] = sum(timeouts) / len(timeouts) if timeouts else None
+        metrics.append(metric)
+    return metrics
+
+
+class Manifest:
+    def __init__(self, directory):
+        self.path = os.path.join(directory, 'manifest.json')
+        self.parts_dir = os.path.join(directory, 'parts')
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                self.entries = json.load(f)  # Source path -> [mtime_ns, size, sha256]
+        except (OSError, ValueError):
+            self.entries = {}
+
+    def part_path(self, digest):
+        return os.path.join(self.parts_dir, f"{digest}.json")
+
+    # Function to split files into (unchanged, changed) with their content hashes
+    def compare(self, paths):
+        unchanged, changed = {}, {}
+        for path in paths:
+            key = os.path.abspath(path)
+            stat = os.stat(path)
+            entry = self.entries.get(key)
+            if entry and entry[0] == stat.st_mtime_ns and entry[1] == stat.st_size:
+                digest = entry[2]
+            else:
+                digest = file_digest(path)  # Touched files are only reprocessed if their content changed
+                self.entries[key] = [stat.st_mtime_ns, stat.st_size, digest]
+            if os.path.exists(self.part_path(digest)):
+                unchanged[path] = digest
+            else:
+                changed[path] = digest
+        return unchanged, changed
+
+    def save(self, paths):
+        keep = {os.path.abspath(path) for path in paths}
+        self.entries = {key: entry for key, entry in self.entries.items() if key in keep}
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.entries, f)
+        os.replace(tmp, self.path)
+        # Drop parts of files that were removed or have changed since
+        digests = {entry[2] for entry in self.entries.values()}
+        for name in os.listdir(self.parts_dir):
+            if name.endswith('.json') and name[:-5] not in digests:
+                os.remove(os.path.join(self.parts_dir, name))
+
+
+def write_part(path, part):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(part, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def read_part(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+# Function to bring the cohort dataset up to date; returns (processed, reused, failed)
+def aggregate(dirs=input_dirs, output_dir=cohort_dir, output_format='csv', workers=None):
+    manifest = Manifest(output_dir)
+    os.makedirs(manifest.parts_dir, exist_ok=True)
+    paths = participant_files(dirs)
+    unchanged, changed = manifest.compare(paths)
+
+    failed = []
+    if changed:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {path: pool.submit(process_file, path) for path in changed}
+            for path, future in futures.items():
+                try:
+                    write_part(manifest.part_path(changed[path]), future.result())
+                except Exception as e:
+                    print(f"Error processing {path}: {e}")
+                    failed.append(path)
+    manifest.save([path for path in paths if path not in failed])
+
+    # Combine the cached parts of every current file into the cohort dataset.
+    # Parts are keyed by content, so the source file name is only added here
+    trials, blocks = [], []
+    for path in paths:
+        if path in failed:
+            continue
+        part = read_part(manifest.part_path(unchanged.get(path) or changed[path]))
+        source = os.path.basename(path)
+        for row in part['trials']:
+            row['Source'] = source
+            trials.append(row)
+        for row in part['blocks']:
+            row['Source'] = source
+            blocks.append(row)
+    if output_format == 'csv':
+        write_log(os.path.join(output_dir, 'cohort_trials.csv'), trials, trial_fields)
+        write_log(os.path.join(output_dir, 'cohort_blocks.csv'), blocks, block_fields)
+    else:
+        write_table(os.path.join(output_dir, f"cohort_trials.{output_format}"), trials, trial_types)
+        write_table(os.path.join(output_dir, f"cohort_blocks.{output_format}"), blocks, block_types)
+    return len(changed) - len(failed), len(unchanged), len(failed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Aggregate participant files into a cohort dataset.")
+    parser.add_argument('dirs', nargs='*', default=input_dirs, help="Output directories with Participant_* files")
+    parser.add_argument('--output-dir', default=cohort_dir)
+    parser.add_argument('--format', choices=('csv', 'parquet', 'arrow'), default='csv')
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: one per core)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    processed, reused, failed = aggregate(args.dirs, args.output_dir, args.format, args.workers)
+    print(f"Processed {processed} new or changed files, reused {reused}, {failed} failed "
+          f"in {time.perf_counter() - start:.2f} s; cohort written to {args.output_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+import json
+import os
+import random
+
+from decks import decks, conditions, probabilities, deck_sequences, exhaustion_policies
+from scheduler import precision_modes
+from presentation import plan_presentation, PlanError
+
+# Task definition files (TOML or JSON), parsed and validated once at startup.
+# A definition becomes an immutable TaskConfig; per deck it keeps a compiled
+# DeckConfig (payoff/threshold tuples, card sequence) that the outcome models
+# read directly, so a protocol variant is a file instead of a source edit.
+#
+#   [task]
+#   outcome_model = "sequence"      # 'probabilistic' or 'sequence'
+#   total_trials = 120
+#   practice_trials = 10
+#   timeout_ms = 4000
+#   start_net_worth = 2000
+#   exhaustion_policy = "reshuffle"
+#   arrow_policy = "uniform"        # 'uniform', 'sequence' (cycles arrow_sequence) or 'balanced'
+#   arrow_sequence = [0, 2, 1, 3]
+#   block_size = 20                 # 'balanced': decks shown equally often in every block
+#   max_run = 3                     # 'balanced': at most 3 trials in a row on one deck (0: no limit)
+#   deck_counts = [30, 30, 30, 30]  # 'balanced': main-task presentations per deck (default: equal)
+#   timer_precision = "spin"
+#   output_format = "xlsx"
+#
+#   [decks.deck_a]
+#   reward = 100
+#   penalty = -250
+#   p_reward = 0.5
+#   p_penalty = 0.5
+#   sequence = [100, 100, -50, ...]
+
+outcome_model_names = ('probabilistic', 'sequence')
+arrow_policies = ('uniform', 'sequence', 'balanced')
+output_format_names = ('xlsx', 'parquet', 'arrow')
+
+
+class ConfigError(ValueError):
+    pass
+
+
+# Base class of the config objects: attributes are set once in __init__
+class Frozen:
+    __slots__ = ()
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def _set(self, name, value):
+        object.__setattr__(self, name, value)
+
+    def __repr__(self):
+        fields = ', '.join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"{type(self).__name__}({fields})"
+
+
+class DeckConfig(Frozen):
+    __slots__ = ('name', 'reward', 'penalty', 'p_reward', 'p_penalty', 'sequence', 'payoffs', 'thresholds')
+
+    def __init__(self, name, reward, penalty, p_reward, p_penalty, sequence):
+        self._set('name', name)
+        self._set('reward', reward)
+        self._set('penalty', penalty)
+        self._set('p_reward', p_reward)
+        self._set('p_penalty', p_penalty)
+        self._set('sequence', tuple(sequence))
+        # Compiled for ProbabilisticOutcomes.draw: one random number picks reward, penalty or $0
+        self._set('payoffs', (reward, penalty, 0))
+        self._set('thresholds', (p_reward, p_reward + p_penalty))
+
+
+class TaskConfig(Frozen):
+    __slots__ = ('outcome_model', 'total_trials', 'practice_trials', 'timeout_ms', 'start_net_worth',
+                 'exhaustion_policy', 'arrow_policy', 'arrow_sequence', 'block_size', 'max_run', 'deck_counts',
+                 'timer_precision', 'output_format', 'decks', 'source')
+
+    def __init__(self, decks, source=None, **task):
+        for name, value in task.items():
+            self._set(name, value)
+        self._set('decks', decks)  # Deck name -> DeckConfig, in deck order
+        self._set('source', source)  # File the config was loaded from, if any
+
+    # Function to get a copy with some task settings changed (validated again)
+    def replace(self, **changes):
+        task = {name: getattr(self, name) for name in task_defaults}
+        task.update(changes)
+        task = validate_task(task)
+        check_presentation(task, self.decks)
+        return TaskConfig(self.decks, self.source, **task)
+
+
+task_defaults = {
+    'outcome_model': 'sequence',
+    'total_trials': 120,
+    'practice_trials': 10,
+    'timeout_ms': 4000,
+    'start_net_worth': 2000,
+    'exhaustion_policy': 'reshuffle',
+    'arrow_policy': 'uniform',
+    'arrow_sequence': None,
+    'block_size': 20,
+    'max_run': 0,
+    'deck_counts': None,
+    'timer_precision': 'spin',
+    'output_format': 'xlsx',
+}
+
+
+def _integer(name, value, minimum=None):
+    if not isinstance(value, int) or isinstance(value, bool):
+        raise ConfigError(f"{name} must be an integer, got {value!r}")
+    if minimum is not None and value < minimum:
+        raise ConfigError(f"{name} must be at least {minimum}, got {value}")
+    return value
+
+
+def _probability(name, value):
+    if not isinstance(value, (int, float)) or isinstance(value, bool) or not 0 <= value <= 1:
+        raise ConfigError(f"{name} must be a probability between 0 and 1, got {value!r}")
+    return float(value)
+
+
+def _choice(name, value, choices):
+    if value not in choices:
+        raise ConfigError(f"{name} must be one of {choices}, got {value!r}")
+    return value
+
+
+def validate_task(task):
+    if not isinstance(task, dict):
+        raise ConfigError(f"The task section must be a table/object, got {task!r}")
+    unknown = set(task) - set(task_defaults)
+    if unknown:
+        raise ConfigError(f"Unknown task settings: {', '.join(sorted(unknown))}")
+    task = dict(task_defaults, **task)
+    _choice('outcome_model', task['outcome_model'], outcome_model_names)
+    _integer('total_trials', task['total_trials'], 1)
+    _integer('practice_trials', task['practice_trials'], 0)
+    _integer('timeout_ms', task['timeout_ms'], 1)
+    _integer('start_net_worth', task['start_net_worth'])
+    _choice('exhaustion_policy', task['exhaustion_policy'], exhaustion_policies)
+    _choice('arrow_policy', task['arrow_policy'], arrow_policies)
+    _choice('timer_precision', task['timer_precision'], precision_modes)
+    _choice('output_format', task['output_format'], output_format_names)
+    sequence = task['arrow_sequence']
+    if task['arrow_policy'] == 'sequence' and not sequence:
+        raise ConfigError("arrow_policy 'sequence' needs a non-empty arrow_sequence")
+    # Checked whenever it is given, even if the arrow policy ignores it
+    if sequence is not None:
+        if not isinstance(sequence, (list, tuple)):
+            raise ConfigError(f"arrow_sequence must be a list of deck positions, got {sequence!r}")
+        for position in sequence:
+            _integer('arrow_sequence entries', position, 0)
+            if position >= len(decks):
+                raise ConfigError(f"arrow_sequence entries must be deck positions below {len(decks)}, got {position}")
+        sequence = tuple(sequence)
+    task['arrow_sequence'] = sequence
+    _integer('block_size', task['block_size'], 1)
+    _integer('max_run', task['max_run'], 0)
+    counts = task['deck_counts']
+    if counts is not None:
+        if not isinstance(counts, (list, tuple)) or len(counts) != len(decks):
+            raise ConfigError(f"deck_counts must list one count per deck ({len(decks)}), got {counts!r}")
+        for count in counts:
+            _integer('deck_counts entries', count, 0)
+        if sum(counts) != task['total_trials']:
+            raise ConfigError(f"deck_counts must add up to total_trials ({task['total_trials']}), got {sum(counts)}")
+        task['deck_counts'] = tuple(counts)
+    return task
+
+
+# Function to get the cards each deck can deal before the session has to stop, or None when unlimited
+def card_supply(outcome_model, exhaustion_policy, deck_config):
+    if outcome_model == 'sequence' and exhaustion_policy == 'stop':
+        return [len(deck.sequence) for deck in deck_config.values()]
+    return None
+
+
+# Function to check that a 'balanced' plan exists for both phases. The deck counts are
+# checked exactly (equal_counts only hands extra trials to decks with cards to spare, so
+# it fails for every seed or for none) and the order comes from a complete solver, so one draw tells
+def check_presentation(task, deck_config):
+    if task['arrow_policy'] != 'balanced':
+        return
+    supply = card_supply(task['outcome_model'], task['exhaustion_policy'], deck_config)
+    try:
+        for n_trials, counts in ((task['practice_trials'], None), (task['total_trials'], task['deck_counts'])):
+            plan_presentation(random.Random(0), n_trials, len(decks), task['block_size'], task['max_run'],
+                              counts, supply)
+    except PlanError as e:
+        raise ConfigError(f"No presentation plan fits the settings: {e}")
+
+
+def validate_deck(name, deck):
+    if not isinstance(deck, dict):
+        raise ConfigError(f"{name} must be a table/object of deck settings, got {deck!r}")
+    unknown = set(deck) - {'reward', 'penalty', 'p_reward', 'p_penalty', 'sequence'}
+    if unknown:
+        raise ConfigError(f"Unknown settings for {name}: {', '.join(sorted(unknown))}")
+    try:
+        reward = _integer(f"{name}.reward", deck.get('reward', conditions[name]['Reward']))
+        penalty = _integer(f"{name}.penalty", deck.get('penalty', conditions[name]['Penalty']))
+        p_reward = _probability(f"{name}.p_reward", deck.get('p_reward', probabilities[name]['Reward']))
+        p_penalty = _probability(f"{name}.p_penalty", deck.get('p_penalty', probabilities[name]['Penalty']))
+        sequence = deck.get('sequence', deck_sequences[name])
+    except KeyError:
+        raise ConfigError(f"{name} has no built-in defaults; give reward, penalty, p_reward, p_penalty and sequence")
+    if p_reward + p_penalty > 1 + 1e-9:
+        raise ConfigError(f"{name}: p_reward + p_penalty must not exceed 1")
+    if not isinstance(sequence, (list, tuple)) or not sequence:
+        raise ConfigError(f"{name}.sequence must be a non-empty list of payoffs")
+    for card in sequence:
+        _integer(f"{name}.sequence entries", card)
+    return DeckConfig(name, reward, penalty, p_reward, p_penalty, sequence)
+
+
+# Function to build a validated config from a parsed definition (dict)
+def build_config(definition, source=None):
+    if not isinstance(definition, dict):
+        raise ConfigError("A task definition must be a table/object")
+    unknown = set(definition) - {'task', 'decks'}
+    if unknown:
+        raise ConfigError(f"Unknown sections: {', '.join(sorted(unknown))}")
+    task = validate_task(definition.get('task', {}))
+    deck_definitions = definition.get('decks', {})
+    if not isinstance(deck_definitions, dict):
+        raise ConfigError(f"The decks section must be a table/object, got {deck_definitions!r}")
+    unknown = set(deck_definitions) - set(decks)
+    if unknown:
+        raise ConfigError(f"Unknown decks: {', '.join(sorted(unknown))} (the task shows {', '.join(decks)})")
+    deck_config = {name: validate_deck(name, deck_definitions.get(name, {})) for name in decks}
+    check_presentation(task, deck_config)
+    return TaskConfig(deck_config, source, **task)
+
+
+# Function to load and validate a TOML (.toml) or JSON task definition
+def load_config(path):
+    try:
+        if path.endswith('.toml'):
+            import tomllib
+            with open(path, 'rb') as f:
+                definition = tomllib.load(f)
+        else:
+            with open(path, encoding='utf-8') as f:
+                definition = json.load(f)
+    except (OSError, ValueError) as e:
+        raise ConfigError(f"Could not read task definition {path}: {e}")
+    return build_config(definition, os.path.abspath(path))
+
+
+# Function to get the built-in task (decks.py) with some task settings changed
+def default_config(**task):
+    return build_config({'task': task})
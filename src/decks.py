@@ -0,0 +1,70 @@
+import random
+from array import array
+
+# Deck configurations shared by the Tk and Qt front ends and the headless simulator
+decks = ['deck_a', 'deck_b', 'deck_c', 'deck_d']
+
+# Reward/penalty payoffs of the probabilistic task (main.py)
+conditions = {
+    'deck_a': {'Reward': 100, 'Penalty': -250},
+    'deck_b': {'Reward': 100, 'Penalty': -1150},
+    'deck_c': {'Reward': 50, 'Penalty': -25},
+    'deck_d': {'Reward': 50, 'Penalty': -200},
+}
+
+# Probability of drawing the reward/penalty; whatever is left over is a $0 payoff
+probabilities = {
+    'deck_a': {'Reward': 0.50, 'Penalty': 0.50},  # 50% gain, 50% loss, 0% $0 payoff
+    'deck_b': {'Reward': 0.90, 'Penalty': 0.10},  # 90% gain, 10% loss, 0% $0 payoff
+    'deck_c': {'Reward': 0.50, 'Penalty': 0.25},  # 50% gain, 25% loss, 25% $0 payoff
+    'deck_d': {'Reward': 0.90, 'Penalty': 0.10},  # 90% gain, 10% loss, 0% $0 payoff
+}
+
+# Fixed card sequences of the sequence-draw task (IGTQT.py)
+deck_sequences = {
+    'deck_a': [100, 100, -50, 100, -200, 100, -100, 100, -150, -250] * 3,  # -25/card
+    'deck_b': [100, 100, 100, 100, 100, 100, 100, 100, 100, -1150] * 3,    # -25/card
+    'deck_c': [50, 50, 50, 25, -25, 50, 0, 50, 25, -25] * 3,                # +25/card
+    'deck_d': [50, 50, 50, 50, 50, 50, 50, 50, 50, -200] * 3,             # +25/card
+}
+
+
+class DeckExhausted(Exception):
+    pass
+
+
+# What a deck does once every card has been drawn
+exhaustion_policies = ('reshuffle', 'wrap', 'stop')
+
+
+# Preshuffled card buffer with a read cursor: draws are O(1) and reset()
+# reshuffles in place instead of rebuilding the deck
+class Deck:
+    __slots__ = ('name', 'cards', 'cursor', 'policy', 'rng')
+
+    def __init__(self, name, sequence, policy='reshuffle', rng=None, seed=None):
+        if policy not in exhaustion_policies:
+            raise ValueError(f"Unknown exhaustion policy: {policy!r} (expected one of {exhaustion_policies})")
+        self.name = name
+        self.cards = array('i', sequence)
+        self.policy = policy
+        self.rng = rng if rng is not None else random.Random(seed)
+        self.reset()
+
+    def reset(self):
+        self.rng.shuffle(self.cards)
+        self.cursor = 0
+
+    def draw(self):
+        if self.cursor >= len(self.cards):
+            if self.policy == 'stop':
+                raise DeckExhausted(f"{self.name} has no cards left")
+            if self.policy == 'reshuffle':
+                self.rng.shuffle(self.cards)
+            self.cursor = 0  # 'wrap' replays the same order
+        card = self.cards[self.cursor]
+        self.cursor += 1
+        return card
+
+    def remaining(self):
+        return len(self.cards) - self.cursor
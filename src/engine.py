@@ -0,0 +1,616 @@
+import argparse
+import glob
+import importlib
+import json
+import os
+import random
+import re
+import tempfile
+import threading
+import time
+from array import array
+
+from decks import decks, Deck, DeckExhausted, exhaustion_policies
+from config import default_config, load_config, arrow_policies, card_supply
+from trial_log import TrialWriter, write_table, write_excel, write_log, atomic_write
+from scheduler import DeadlineTimer, spin_margin
+from streams import new_seed, stream
+from presentation import plan_presentation
+from trial_buffer import TrialBuffer
+
+# UI-agnostic task engine shared by the Tk (main.py) and Qt (IGTQT.py) front ends.
+# The engine owns the practice -> main -> end state machine, the outcome model,
+# the response window and logging; a front end only draws what the engine tells
+# it to and forwards key presses (respond / continue_trial / finish).
+
+log_fields = ['Participant ID', 'Participant Name', 'Trial Type', 'Trial Number', 'Presented Deck',
+              'Choice', 'Outcome', 'Net Worth', 'Onset (ns)', 'Response (ns)', 'RT (ms)',
+              'Timeout Overshoot (ms)', 'Seed']
+# Column types of the typed (Parquet/Arrow) output; numbers are stored as numbers,
+# Persian digits are only applied when they are shown on screen
+log_types = {
+    'Participant ID': 'string', 'Participant Name': 'string', 'Trial Type': 'string',
+    'Trial Number': 'int64',  # 'end' on the final row becomes null
+    'Presented Deck': 'string', 'Choice': 'string', 'Outcome': 'int64', 'Net Worth': 'int64',
+    'Onset (ns)': 'int64', 'Response (ns)': 'int64', 'RT (ms)': 'float64', 'Timeout Overshoot (ms)': 'float64',
+    'Seed': 'int64',
+}
+# Stored once per session in the trial buffer; the rest is one column per field
+session_fields = ('Participant ID', 'Participant Name', 'Seed')
+# Participant IDs name the session's files: letters (any script), digits, '_' and '-' only
+participant_id_pattern = re.compile(r'[\w-]{1,64}')
+output_formats = {'xlsx': '.xlsx', 'parquet': '.parquet', 'arrow': '.arrow'}
+# Libraries each format needs; imported on first use, or ahead of time by preload_exporter
+export_modules = {'xlsx': ('openpyxl',), 'parquet': ('pyarrow', 'pyarrow.parquet'), 'arrow': ('pyarrow',)}
+
+
+# Function to save data to Excel, Parquet or Arrow IPC as Participant_{file_id}; returns the file
+# written. Files are written under a temporary name and renamed, so a crash never leaves half a file
+def save_data(trial_data, file_id, output_dir, output_format='xlsx', progress=None):
+    # Create an output directory if it doesn't exist
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+
+    output_file = os.path.join(output_dir, f"Participant_{file_id}{output_formats[output_format]}")
+    if output_format == 'xlsx':
+        write_excel(output_file, trial_data, log_fields, progress)
+    else:
+        write_table(output_file, trial_data, log_types)
+    print(f"Data saved to {output_file}")  # Debug statement
+    return output_file
+
+
+def valid_participant_id(participant_id):
+    return isinstance(participant_id, str) and participant_id_pattern.fullmatch(participant_id) is not None
+
+
+# Function to import modules (e.g. on a background thread); a missing one is reported when it is used
+def import_modules(names):
+    for name in names:
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            pass
+
+
+# End-of-session export on a worker thread, so the end screen stays responsive.
+# If the preferred format fails, the trials are dumped raw (JSON lines, readable by
+# trial_log.py and cohort.py) next to it, or in the temp directory as a last resort.
+# The thread is not a daemon: closing the window does not cut a save short.
+class SaveJob:
+    def __init__(self, trial_data, file_id, output_dir, output_format='xlsx'):
+        self.total = len(trial_data)
+        self.written = 0
+        self.status = 'saving'  # Then 'saved', 'fallback' (raw dump written) or 'failed'
+        self.path = None
+        self.error = None
+        self._thread = threading.Thread(target=self._run, name="session-save",
+                                        args=(trial_data, file_id, output_dir, output_format))
+        self._thread.start()
+
+    def _run(self, trial_data, file_id, output_dir, output_format):
+        try:
+            self.path = save_data(trial_data, file_id, output_dir, output_format, self._progress)
+            self.written = self.total
+            self.status = 'saved'
+            return
+        except Exception as e:
+            self.error = e
+            print(f"Error saving data: {e}")  # Debug statement
+        for directory in (output_dir, tempfile.gettempdir()):
+            try:
+                os.makedirs(directory, exist_ok=True)
+                self.path = write_log(os.path.join(directory, f"Participant_{file_id}.jsonl"), trial_data)
+                self.written = self.total
+                self.status = 'fallback'
+                print(f"Raw data saved to {self.path}")  # Debug statement
+                return
+            except Exception as e:
+                print(f"Error saving raw data to {directory}: {e}")  # Debug statement
+        self.status = 'failed'
+
+    def _progress(self, written):
+        self.written = written
+
+    @property
+    def done(self):
+        return self.status != 'saving'
+
+    @property
+    def fraction(self):
+        return self.written / self.total if self.total else 1.0
+
+    def wait(self, timeout=None):
+        self._thread.join(timeout)
+        return self.done
+
+
+_default_decks = None
+
+
+# Function to get the built-in decks of decks.py as compiled DeckConfig objects
+def default_decks():
+    global _default_decks
+    if _default_decks is None:
+        _default_decks = default_config().decks
+    return _default_decks
+
+
+# Outcomes drawn from reward/penalty probabilities (the Tk task)
+class ProbabilisticOutcomes:
+    def __init__(self, exhaustion_policy=None, seed=None, deck_config=None):
+        self.seed = seed if seed is not None else new_seed()
+        self.rng = stream(self.seed, 'outcomes')
+        # (reward threshold, penalty threshold, reward, penalty) per deck, from the compiled DeckConfig
+        self.tables = {name: deck.thresholds + deck.payoffs[:2]
+                       for name, deck in (deck_config or default_decks()).items()}
+
+    # Function to switch to another session's seed; the compiled tables are kept
+    def reseed(self, seed):
+        self.seed = seed
+        self.rng = stream(seed, 'outcomes')
+
+    # Each phase draws from its own stream
+    def reset(self, phase=None):
+        if phase is not None:
+            self.rng = stream(self.seed, phase, 'outcomes')
+
+    def draw(self, deck):
+        p_reward, p_penalty, reward, penalty = self.tables[deck]
+        rand = self.rng.random()
+        if rand < p_reward:
+            return reward  # Gain
+        elif rand < p_penalty:
+            return penalty  # Loss
+        return 0  # $0 payoff
+
+
+# Outcomes drawn from shuffled copies of the fixed card sequences (the Qt task)
+class SequenceOutcomes:
+    def __init__(self, exhaustion_policy='reshuffle', seed=None, deck_config=None):
+        self.seed = seed if seed is not None else new_seed()
+        self.deck_config = deck_config or default_decks()
+        self.deck_instances = {name: Deck(name, deck.sequence, exhaustion_policy, stream(self.seed, 'deck', name))
+                               for name, deck in self.deck_config.items()}
+        self.keep_phase_start()
+
+    # Function to switch to another session's seed. The decks are kept, put back in
+    # their configured order and reshuffled from it, as a new engine with that seed would
+    def reseed(self, seed):
+        self.seed = seed
+        for name, deck in self.deck_instances.items():
+            deck.cards[:] = array('i', self.deck_config[name].sequence)
+            deck.rng = stream(seed, 'deck', name)
+            deck.reset()
+        self.keep_phase_start()
+
+    # The card order each deck started the current phase with
+    def keep_phase_start(self):
+        self.phase_start = {name: array('i', deck.cards) for name, deck in self.deck_instances.items()}
+
+    # Each phase shuffles from its own streams, starting from the order the phase before
+    # started with: reshuffles when a deck ran out during that phase (which depend on its
+    # choices, e.g. unlogged practice plays) do not carry over, so replay can skip practice
+    def reset(self, phase=None):
+        for name, deck in self.deck_instances.items():
+            deck.cards[:] = self.phase_start[name]
+            if phase is not None:
+                deck.rng = stream(self.seed, phase, 'deck', name)
+            deck.reset()  # Reshuffled in place
+        self.keep_phase_start()
+
+    def draw(self, deck):
+        return self.deck_instances[deck].draw()  # Raises DeckExhausted under the 'stop' policy
+
+
+outcome_models = {
+    'probabilistic': ProbabilisticOutcomes,
+    'sequence': SequenceOutcomes,
+}
+
+
+# Everything the front end needs to draw the current trial
+class TrialState:
+    __slots__ = ('phase', 'awaiting', 'trial', 'position', 'presented_deck',
+                 'net_worth', 'previous_net_worth', 'choice', 'outcome', 'onset_ns')
+
+    def __init__(self, net_worth):
+        self.phase = None  # 'practice', 'main' or 'ended'
+        self.awaiting = None  # 'response', 'continue', 'transition' or None
+        self.trial = 0
+        self.position = 0  # Arrow starts at Deck A
+        self.presented_deck = None
+        self.net_worth = net_worth
+        self.previous_net_worth = net_worth
+        self.choice = None  # 'play' or 'pass' once the trial is resolved
+        self.outcome = 0
+        self.onset_ns = None  # perf_counter_ns when the arrow was drawn
+
+
+# Interface implemented by the Tk and Qt front ends (no-op defaults)
+class FrontEnd:
+    # Show the trial screen at the start of a practice or main phase
+    def enter_phase(self, state):
+        pass
+
+    # Draw the arrow over state.position and return perf_counter_ns once it is on screen
+    def present_trial(self, state):
+        return time.perf_counter_ns()
+
+    # Show the result of state.choice / state.outcome and the updated net worth
+    def show_outcome(self, state):
+        pass
+
+    def wait_for_continue(self, state):
+        pass
+
+    def show_transition(self, state):
+        pass
+
+    def show_end(self, state):
+        pass
+
+    # The streaming trial log could not be opened; the session goes on with the trials in memory
+    def log_failed(self, error):
+        pass
+
+    # One-shot timer for the response window; returns a handle for stop_timer
+    def start_timer(self, delay_ms, callback):
+        return None
+
+    def stop_timer(self, handle):
+        pass
+
+
+# Front end without a window; a policy(state) -> 'play'/'pass' (or None for a timeout) answers every trial.
+# The default policy picks at random from the session seed's 'headless' stream, so a seeded run repeats
+class HeadlessFrontEnd(FrontEnd):
+    def __init__(self, policy=None, seed=None):
+        self.rng = stream(seed, 'headless') if seed is not None else random.Random()
+        self.policy = policy or (lambda state: self.rng.choice(('play', 'pass')))
+
+
+class IGTEngine:
+    def __init__(self, frontend, outcome_model='sequence', total_trials=120, practice_trials=10,
+                 timeout_ms=4000, start_net_worth=2000, spin_ns=0, output_dir=None,
+                 export_excel=True, debug=False, exhaustion_policy='reshuffle', output_format='xlsx',
+                 deck_config=None, arrow_policy='uniform', arrow_sequence=None, seed=None,
+                 block_size=20, max_run=0, deck_counts=None):
+        if output_format not in output_formats:
+            raise ValueError(f"Unknown output format: {output_format!r} (expected one of {sorted(output_formats)})")
+        if arrow_policy not in arrow_policies:
+            raise ValueError(f"Unknown arrow policy: {arrow_policy!r} (expected one of {arrow_policies})")
+        self.frontend = frontend
+        self.seed = seed if seed is not None else new_seed()  # Logged with every trial, see streams.py
+        self.outcomes = outcome_models[outcome_model](exhaustion_policy, self.seed, deck_config)
+        self.total_trials = total_trials
+        self.practice_trials = practice_trials
+        self.timeout_ns = timeout_ms * 1_000_000
+        self.start_net_worth = start_net_worth
+        self.output_dir = output_dir  # None: keep trials in memory only
+        self.export_excel = export_excel  # Write the end-of-session file in output_format
+        self.output_format = output_format
+        self.debug = debug
+        self.arrow_policy = arrow_policy
+        self.arrow_sequence = arrow_sequence if arrow_policy == 'sequence' else None  # Deck positions, cycled
+        # 'balanced' plans every phase up front (presentation.py) within the decks' card supply
+        self.block_size = block_size
+        self.max_run = max_run
+        self.deck_counts = deck_counts
+        self.card_supply = card_supply(outcome_model, exhaustion_policy, deck_config or default_decks())
+        self.trial_log = None
+        self.response_window = DeadlineTimer(frontend.start_timer, frontend.stop_timer, spin_ns)
+        self.reset_session(self.seed)
+
+    # Everything that belongs to one participant's session, replaced as a whole
+    def reset_session(self, seed):
+        self.seed = seed
+        self.outcomes.reseed(seed)
+        self.arrow_rng = stream(seed, 'arrow')
+        self.arrow_index = 0
+        self.plans = {}  # Phase -> presentation plan, saved with the session
+        self.participant_id = ""
+        self.participant_name = ""
+        self.file_id = ""  # Participant_{file_id}.* are this session's files, see session_file_id
+        # Main trials and the final row, in typed columns (trial_buffer.py)
+        self.trial_data = TrialBuffer(log_types, session_fields, self.total_trials + 1, {'Trial Number': 'end'})
+        self.trial_data.session['Seed'] = seed  # Replays the session's arrows and outcomes (replay.py)
+        self.save_job = None  # SaveJob of the end-of-session export, once started
+        self.state = TrialState(self.start_net_worth)
+
+    # Function to start the next participant in this engine (kiosk mode) without a relaunch.
+    # The configuration, compiled outcome tables and the front end's screens are kept;
+    # a session still running is finished first (saving what it has). Its save keeps the
+    # old trial buffer until it is written, the new session gets a fresh one
+    def new_session(self, seed=None):
+        if self.state.phase not in (None, 'ended'):
+            self.finish()
+        self.response_window.cancel()
+        if self.trial_log is not None:
+            self.trial_log.close()
+            self.trial_log = None
+        if self.save_job is not None:
+            self.save_job.wait()  # Normally written already, while the end page was up
+        self.reset_session(seed if seed is not None else new_seed())
+
+    # Function to build an engine from a validated config.TaskConfig
+    @classmethod
+    def from_config(cls, frontend, config, **kwargs):
+        kwargs.setdefault('spin_ns', spin_margin(config.timer_precision))
+        kwargs.setdefault('output_format', config.output_format)
+        return cls(frontend, config.outcome_model, config.total_trials, config.practice_trials, config.timeout_ms,
+                   config.start_net_worth, exhaustion_policy=config.exhaustion_policy, deck_config=config.decks,
+                   arrow_policy=config.arrow_policy, arrow_sequence=config.arrow_sequence,
+                   block_size=config.block_size, max_run=config.max_run, deck_counts=config.deck_counts, **kwargs)
+
+    # Function to import the export library on a background thread, so the end-of-session
+    # save does not wait for it; call it while nothing is being timed (e.g. on the registration page)
+    def preload_exporter(self):
+        if self.output_dir is None or not self.export_excel:
+            return None
+        thread = threading.Thread(target=import_modules, args=(export_modules[self.output_format],),
+                                  name="preload-exporter", daemon=True)
+        thread.start()
+        return thread
+
+    def register(self, participant_id, participant_name):
+        if not valid_participant_id(participant_id):
+            raise ValueError(f"Participant ID {participant_id!r} may only hold up to 64 letters, digits, '_' and '-'")
+        self.participant_id = participant_id
+        self.participant_name = participant_name
+        self.trial_data.session.update({'Participant ID': participant_id, 'Participant Name': participant_name})
+        if self.debug:
+            print(f"Session seed: {self.seed}")  # Debug statement
+
+    def start_practice(self):
+        self.state.phase = 'practice'
+        self.state.trial = 0
+        self.start_streams('practice')
+        self.frontend.enter_phase(self.state)
+        self.start_trial()
+
+    def start_main(self):
+        state = self.state
+        state.phase = 'main'
+        state.trial = 0
+        state.net_worth = self.start_net_worth  # Reset net worth for the main task
+        state.previous_net_worth = self.start_net_worth
+        self.start_streams('main')  # Fresh decks for the main task
+        if self.output_dir is not None:
+            try:
+                self.file_id = self.session_file_id()
+                self.open_trial_log()
+                if self.plans:
+                    self.save_plan()
+            except OSError as e:
+                # Trials stay in memory; the end-of-session save (or its raw fallback) still runs
+                print(f"Error opening trial log: {e}")  # Debug statement
+                self.frontend.log_failed(e)
+        self.frontend.enter_phase(state)
+        self.start_trial()
+
+    def start_trial(self):
+        state = self.state
+        if state.phase == 'practice' and state.trial >= self.practice_trials:
+            state.awaiting = 'transition'
+            self.frontend.show_transition(state)
+            return
+        elif state.phase == 'main' and state.trial >= self.total_trials:
+            self.finish()
+            return
+        state.trial += 1
+        state.presented_deck = decks[state.position]
+        state.choice = None
+        state.outcome = 0
+        state.awaiting = 'response'
+        # The front end draws the arrow; the response window runs from the real onset
+        state.onset_ns = self.frontend.present_trial(state)
+        self.response_window.arm(state.onset_ns, self.timeout_ns, self.timeout)
+
+    def respond(self, choice, response_ns=None):
+        if response_ns is None:
+            response_ns = time.perf_counter_ns()
+        if self.state.awaiting != 'response':
+            return
+        # A key pressed after the deadline is a timeout, even if the timer has not fired yet
+        if self.response_window.expired(response_ns):
+            self.response_window.expire(response_ns)
+            return
+        # Cancel the timer if the participant responds before the timeout
+        self.response_window.cancel()
+        self.resolve(choice, response_ns)
+
+    def timeout(self):
+        if self.state.awaiting != 'response':
+            return
+        if self.debug:
+            print("Timeout triggered")  # Debug statement
+        self.response_window.cancel()
+        overshoot_ns = self.response_window.overshoot_ns
+        if overshoot_ns is None:
+            # Closed without the timer firing (e.g. a headless policy letting the trial time out).
+            # Still logged with an overshoot: a non-null overshoot is what marks a timeout in the log
+            overshoot_ns = 0
+        self.resolve('pass', overshoot_ns=overshoot_ns)
+
+    def resolve(self, choice, response_ns=None, overshoot_ns=None):
+        state = self.state
+        try:
+            outcome = self.outcomes.draw(state.presented_deck) if choice == 'play' else 0
+        except DeckExhausted as e:
+            # The 'stop' exhaustion policy ends the session instead of paying out 0
+            if self.debug:
+                print(f"Ending session: {e}")  # Debug statement
+            self.finish()
+            return
+        state.awaiting = 'continue'
+        state.choice = choice
+        state.outcome = outcome
+        state.previous_net_worth = state.net_worth
+        state.net_worth += state.outcome
+        # Log data for every main trial, including $0 payoff
+        if state.phase == 'main':
+            self.log_data('main', state.trial, state.presented_deck, choice, state.outcome, state.net_worth,
+                          state.onset_ns, response_ns, overshoot_ns)
+        self.frontend.show_outcome(state)
+        self.frontend.wait_for_continue(state)
+
+    def continue_trial(self):
+        state = self.state
+        if state.awaiting != 'continue':
+            return
+        if self.debug:
+            print("Continuing to next trial")  # Debug statement
+        state.position = self.next_position()
+        self.start_trial()
+
+    # Function to pick the deck the arrow points at next
+    def next_position(self):
+        if not self.arrow_sequence:
+            return self.arrow_rng.randrange(len(decks))
+        position = self.arrow_sequence[self.arrow_index % len(self.arrow_sequence)]
+        self.arrow_index += 1
+        return position
+
+    # Each phase draws from its own streams, so practice cannot shift the main task. A fixed
+    # arrow sequence starts over and a balanced plan is made for the phase; otherwise practice
+    # opens on Deck A and the main task on a deck drawn from its own arrow stream
+    def start_streams(self, phase):
+        self.outcomes.reset(phase)
+        self.arrow_rng = stream(self.seed, phase, 'arrow')
+        self.arrow_index = 0
+        if self.arrow_policy == 'balanced':
+            n_trials = self.practice_trials if phase == 'practice' else self.total_trials
+            plan, solver = plan_presentation(self.arrow_rng, n_trials, len(decks), self.block_size, self.max_run,
+                                             self.deck_counts if phase == 'main' else None, self.card_supply)
+            self.arrow_sequence = plan
+            self.plans[phase] = {'decks': [decks[position] for position in plan], 'solver': solver}
+        if self.arrow_sequence is not None or phase != 'practice':
+            self.state.position = self.next_position()
+        else:
+            self.state.position = 0
+
+    def finish(self):
+        state = self.state
+        if state.phase == 'ended':
+            return
+        self.response_window.cancel()
+        # Save the final result to the data
+        if state.phase == 'main':
+            self.log_data('final', None, 'none', 'end', 0, state.net_worth)  # Trial Number shows as 'end'
+            self.save_data()
+        state.phase = 'ended'
+        state.awaiting = None
+        self.frontend.show_end(state)
+
+    def log_data(self, trial_type, trial_number, presented_deck, choice, outcome, net_worth,
+                 onset_ns=None, response_ns=None, overshoot_ns=None):
+        self.trial_data.append(
+            trial_type,
+            trial_number,
+            presented_deck,
+            choice,
+            outcome,  # Plain integers; the front ends show them with persian_number
+            net_worth,
+            onset_ns,  # perf_counter_ns when the arrow was drawn
+            response_ns,  # perf_counter_ns when the key event was dispatched
+            round((response_ns - onset_ns) / 1e6, 3) if onset_ns is not None and response_ns is not None else None,
+            round(overshoot_ns / 1e6, 3) if overshoot_ns is not None else None,
+        )
+        if self.trial_log is not None:
+            self.trial_log.write(self.trial_data.row(-1))  # Written and fsync'd on the writer thread
+
+    # Function to name this session's files: Participant_{id}, or Participant_{id}_{seed} when
+    # the ID already has files (a rerun, or the same ID twice in kiosk mode), so sessions never share one
+    def session_file_id(self):
+        file_id = self.participant_id
+        n = 1
+        while glob.glob(os.path.join(glob.escape(self.output_dir), glob.escape(f"Participant_{file_id}") + ".*")):
+            n += 1
+            file_id = f"{self.participant_id}_{self.seed}" if n == 2 else f"{self.participant_id}_{self.seed}_{n}"
+        return file_id
+
+    # Start the streaming trial log of the session
+    def open_trial_log(self):
+        if not os.path.exists(self.output_dir):
+            os.makedirs(self.output_dir)
+        path = os.path.join(self.output_dir, f"Participant_{self.file_id}.csv")
+        self.trial_log = TrialWriter(path, log_fields)
+
+    # Function to write the presentation plans next to the trial log
+    def save_plan(self):
+        record = {'Participant ID': self.participant_id, 'Seed': self.seed, 'arrow_policy': self.arrow_policy,
+                  'block_size': self.block_size, 'max_run': self.max_run, 'deck_counts': self.deck_counts,
+                  'card_supply': self.card_supply, 'phases': self.plans}
+
+        def write(tmp):
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(record, f, indent=1)
+        path = atomic_write(os.path.join(self.output_dir, f"Plan_{self.file_id}.json"), write)
+        if self.debug:
+            print(f"Presentation plan saved to {path}")  # Debug statement
+        return path
+
+    def save_data(self):
+        # Flush the streaming log; it already holds every trial
+        if self.trial_log is not None:
+            self.trial_log.close()
+            self.trial_log = None
+        if self.output_dir is not None and self.export_excel:
+            self.save_job = SaveJob(self.trial_data, self.file_id, self.output_dir, self.output_format)
+
+
+# Function to run a whole session without a window, as fast as the CPU allows
+def run_headless(policy=None, outcome_model='sequence', total_trials=120, practice_trials=10,
+                 participant_id='headless', participant_name='headless', output_dir=None,
+                 exhaustion_policy='reshuffle', config=None, seed=None):
+    seed = seed if seed is not None else new_seed()
+    frontend = HeadlessFrontEnd(policy, seed)
+    if config is not None:
+        engine = IGTEngine.from_config(frontend, config, spin_ns=0, output_dir=output_dir, export_excel=False,
+                                       seed=seed)
+    else:
+        engine = IGTEngine(frontend, outcome_model, total_trials, practice_trials, output_dir=output_dir,
+                           export_excel=False, exhaustion_policy=exhaustion_policy, seed=seed)
+    engine.register(participant_id, participant_name)
+    state = engine.state
+    engine.start_practice()
+    while state.phase != 'ended':
+        if state.awaiting == 'response':
+            choice = frontend.policy(state)
+            if choice is None:
+                engine.timeout()  # The policy let the response window run out
+            else:
+                engine.respond(choice)
+        elif state.awaiting == 'continue':
+            engine.continue_trial()
+        elif state.awaiting == 'transition':
+            engine.start_main()
+    return engine
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Drive the task engine headlessly for load testing.")
+    parser.add_argument('--sessions', type=int, default=100)
+    parser.add_argument('--trials', type=int, default=120)
+    parser.add_argument('--model', choices=sorted(outcome_models), default='sequence')
+    parser.add_argument('--exhaustion', choices=exhaustion_policies, default='reshuffle')
+    parser.add_argument('--config', default=None, metavar='PATH',
+                        help="Task definition file (.toml or .json); overrides --trials/--model/--exhaustion")
+    parser.add_argument('--seed', type=int, default=None, help="Seed of the first session (the next ones count up)")
+    args = parser.parse_args()
+    config = load_config(args.config) if args.config else None
+
+    start = time.perf_counter()
+    for i in range(args.sessions):
+        run_headless(outcome_model=args.model, total_trials=args.trials, participant_id=str(i),
+                     exhaustion_policy=args.exhaustion, config=config,
+                     seed=args.seed + i if args.seed is not None else None)
+    elapsed = time.perf_counter() - start
+    trials = args.sessions * (config.total_trials if config else args.trials)
+    print(f"{args.sessions} sessions, {trials} main trials in {elapsed * 1000:.1f} ms "
+          f"({elapsed / trials * 1e6:.2f} us/trial)")
+
+
+if __name__ == "__main__":
+    main()
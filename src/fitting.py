@@ -0,0 +1,180 @@
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from decks import decks
+from cohort import input_dirs, participant_files, process_file
+from trial_log import write_log
+
+# Reinforcement-learning models of choice, fitted per participant by maximum likelihood.
+# This task presents one deck per trial and the participant plays or passes it,
+# so every model keeps an expectancy per deck and plays with probability
+# sigmoid(theta * V[deck]); an outcome is only seen (and learned from) when the
+# deck is played. Likelihoods are vectorized over a whole population of
+# parameter sets so differential evolution evaluates a generation in one pass
+# over the trials; participants are fitted in parallel in a process pool.
+
+outcome_scale = 100  # Outcomes are learned in units of 100 coins
+maxiter = 200
+fits_file = "model_fits.csv"
+
+# Parameter names and bounds of every model
+models = {
+    # Expectancy-Valence: weighted gain/loss utility, delta rule, trial-dependent consistency (t/10)^c
+    'ev': (('a', 'w', 'c'), ((0, 1), (0, 1), (-5, 5))),
+    # Prospect-valence learning with the delta rule, trial-independent consistency 3^c - 1
+    'pvl_delta': (('A', 'alpha', 'lambda', 'c'), ((0, 1), (0, 2), (0, 10), (0, 5))),
+    # Value-plus-perseverance: PVL-Delta expectancies mixed with a decaying perseverance trace
+    'vpp': (('A', 'alpha', 'lambda', 'c', 'ep_pos', 'ep_neg', 'K', 'w'),
+            ((0, 1), (0, 2), (0, 10), (0, 5), (-5, 5), (-5, 5), (0, 1), (0, 1))),
+}
+
+
+# Function to compute the prospect utility of outcomes x for parameter arrays alpha, lam
+def prospect_utility(x, alpha, lam):
+    # A zero outcome is worth nothing, also when alpha is 0 (where 0 ** 0 would give 1)
+    magnitude = np.where(x == 0, 0.0, np.abs(x) ** alpha)
+    return np.where(x >= 0, magnitude, -lam * magnitude)
+
+
+# Function to get the negative log-likelihood of one session for every parameter set.
+# params has shape (n_params, S); deck, played, outcome and valid have one entry per trial
+def negative_log_likelihood(model, params, deck, played, outcome, valid):
+    S = params.shape[1]
+    expectancy = np.zeros((S, len(decks)))
+    perseverance = np.zeros((S, len(decks)))
+    loglik = np.zeros(S)
+    if model == 'ev':
+        a, w, c = params
+    elif model == 'pvl_delta':
+        A, alpha, lam, c = params
+        theta = 3 ** c - 1
+    else:
+        A, alpha, lam, c, ep_pos, ep_neg, K, w = params
+        theta = 3 ** c - 1
+
+    for t in range(len(deck)):
+        d = deck[t]
+        if model == 'ev':
+            theta = ((t + 1) / 10) ** c
+            value = expectancy[:, d]
+        elif model == 'vpp':
+            value = w * expectancy[:, d] + (1 - w) * perseverance[:, d]
+        else:
+            value = expectancy[:, d]
+        if valid[t]:
+            z = theta * value
+            # log sigmoid(z) for a play, log sigmoid(-z) for a pass
+            loglik -= np.logaddexp(0, -z if played[t] else z)
+        if model == 'vpp':
+            perseverance *= K[:, None]
+        if not played[t]:
+            continue
+        x = outcome[t]
+        if model == 'ev':
+            utility = (1 - w) * max(x, 0) + w * min(x, 0)
+            expectancy[:, d] += a * (utility - expectancy[:, d])
+        else:
+            expectancy[:, d] += A * (prospect_utility(x, alpha, lam) - expectancy[:, d])
+            if model == 'vpp':
+                perseverance[:, d] += ep_pos if x >= 0 else ep_neg
+    return -loglik
+
+
+# Function to turn a participant's main trials into model inputs
+def session_arrays(trials):
+    trials = sorted(trials, key=lambda row: row['Trial Number'])
+    deck = np.array([decks.index(row['Presented Deck']) for row in trials], dtype=np.intp)
+    played = np.array([row['Choice'] == 'play' for row in trials])
+    outcome = np.array([(row['Outcome'] or 0) / outcome_scale for row in trials])
+    # Timed-out trials carry no decision, so they are left out of the likelihood
+    valid = np.array([not row['Timeout'] for row in trials])
+    return deck, played, outcome, valid
+
+
+# Function to fit one model to one session; returns the parameters and fit statistics
+def fit_model(model, session, seed=None, iterations=maxiter):
+    from scipy.optimize import differential_evolution
+    names, bounds = models[model]
+
+    # Called with (n_params, S) populations, and with a single vector while polishing
+    def objective(x):
+        nll = negative_log_likelihood(model, np.reshape(x, (len(names), -1)), *session)
+        return nll if np.ndim(x) > 1 else nll[0]
+
+    result = differential_evolution(objective, bounds, vectorized=True, updating='deferred',
+                                    maxiter=iterations, tol=1e-6, seed=seed, polish=True)
+    n = int(session[3].sum())
+    nll = float(np.ravel(result.fun)[0])
+    fit = {'Model': model, 'Trials': n, 'NLL': nll, 'AIC': 2 * nll + 2 * len(names),
+           'BIC': 2 * nll + len(names) * np.log(n) if n else None, 'Converged': bool(result.success)}
+    fit.update(zip(names, (float(v) for v in result.x)))
+    return fit
+
+
+# Function to fit every model to one participant file (runs in a worker)
+def fit_file(path, model_names, seed=None, iterations=maxiter):
+    trials = process_file(path)['trials']
+    if not trials:
+        return []
+    session = session_arrays(trials)
+    fits = []
+    for model in model_names:
+        fit = fit_model(model, session, seed, iterations)
+        fit['Participant ID'] = trials[0]['Participant ID']
+        fit['Source'] = os.path.basename(path)
+        fits.append(fit)
+    return fits
+
+
+# Function to fit a cohort in parallel; returns one row per participant and model
+def fit_cohort(paths, model_names=tuple(models), workers=None, seed=None, iterations=maxiter):
+    rows = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {path: pool.submit(fit_file, path, model_names, seed, iterations) for path in paths}
+        for path, future in futures.items():
+            try:
+                rows.extend(future.result())
+            except Exception as e:
+                print(f"Error fitting {path}: {e}")
+    # Flag each participant's best model by BIC
+    best = {}
+    for row in rows:
+        key = row['Source']
+        if row['BIC'] is not None and (key not in best or row['BIC'] < best[key]['BIC']):
+            best[key] = row
+    for row in rows:
+        row['Best'] = best.get(row['Source']) is row
+    return rows
+
+
+def fit_fields(model_names):
+    fields = ['Participant ID', 'Source', 'Model', 'Trials', 'NLL', 'AIC', 'BIC', 'Best', 'Converged']
+    for model in model_names:
+        fields += [name for name in models[model][0] if name not in fields]
+    return fields
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fit EV, PVL-Delta and VPP models to recorded sessions.")
+    parser.add_argument('dirs', nargs='*', default=input_dirs, help="Output directories with Participant_* files")
+    parser.add_argument('--models', nargs='+', choices=sorted(models), default=list(models))
+    parser.add_argument('--output', default=fits_file)
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: one per core)")
+    parser.add_argument('--maxiter', type=int, default=maxiter, help="Differential evolution generations")
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    paths = participant_files(args.dirs)
+    start = time.perf_counter()
+    rows = fit_cohort(paths, args.models, args.workers, args.seed, args.maxiter)
+    write_log(args.output, rows, fit_fields(args.models))
+    print(f"Fitted {len(args.models)} models to {len(paths)} participants in "
+          f"{time.perf_counter() - start:.1f} s; results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+import argparse
+import csv
+import os
+import sys
+import time
+
+# Input-latency audit (--audit-latency in main.py / IGTQT.py).
+# Every key press gets three timestamps: the OS event time carried by the key
+# event (Qt timestamp(), Tk event.time, in milliseconds), handler entry
+# (perf_counter_ns as the front end's key handler starts) and the end of the
+# next completed paint (Qt: the window's UpdateRequest has been painted and
+# flushed; Tk: an idle callback queued behind the redraw that the handler
+# scheduled). The OS clock cannot be read from Python, so dispatch delay is
+# measured relative to the quickest key of the session, at 1 ms resolution.
+# Rows go to Latency_{id}_{stamp}.csv; summarising one or more of those files
+# prints per-trial histograms and whether the machine meets the limits below.
+
+latency_fields = ['Participant ID', 'Phase', 'Trial Number', 'Key', 'Kind', 'Event Time (ms)',
+                  'Dispatch (ms)', 'Handler (ms)', 'Paint (ms)', 'Total (ms)']
+measures = ['Dispatch (ms)', 'Handler (ms)', 'Paint (ms)', 'Total (ms)']
+# 99th percentile limits for trial keys (responses and continues); Total is one 60 Hz frame
+certify_p99_ms = {'Dispatch (ms)': 4.0, 'Handler (ms)': 8.0, 'Total (ms)': 16.7}
+histogram_edges_ms = (0.5, 1, 2, 4, 8, 16.7, 33.3, 50, 100)
+trial_kinds = ('response', 'continue')
+
+
+class LatencyAudit:
+    def __init__(self):
+        self.participant_id = None
+        self.rows = []
+        self.pending = []  # Keys handled, waiting for their paint
+        self.current = None
+
+    # Function to start a key's record as its handler is entered
+    def key(self, key, event_ms, handler_ns, state):
+        self.current = {'Participant ID': self.participant_id, 'Phase': state.phase, 'Trial Number': state.trial,
+                        'Key': key, 'Kind': None, 'Event Time (ms)': event_ms or None, 'handler_ns': handler_ns, 'feedback_ns': None,
+                        'before': (state.phase, state.trial, state.awaiting)}
+
+    # Function to mark the feedback as ready (the handler has updated the widgets).
+    # Keys that changed nothing (e.g. F while waiting for Space) have no paint to wait for
+    def handled(self, state):
+        row, self.current = self.current, None
+        if row is None:
+            return
+        before = row.pop('before')
+        if before == (state.phase, state.trial, state.awaiting):
+            return
+        # Trial keys go from one trial screen to the next; the rest (transition, end, quit) build a page
+        row['Kind'] = before[2] if before[2] in trial_kinds and state.awaiting in trial_kinds else 'page'
+        row['feedback_ns'] = time.perf_counter_ns()
+        self.pending.append(row)
+
+    # Function to close every pending key at the end of a completed paint
+    def painted(self):
+        if not self.pending:
+            return
+        paint_ns = time.perf_counter_ns()
+        for row in self.pending:
+            feedback_ns = row.pop('feedback_ns')
+            row['Handler (ms)'] = (feedback_ns - row['handler_ns']) / 1e6
+            row['Paint (ms)'] = (paint_ns - feedback_ns) / 1e6
+            self.rows.append(row)
+        self.pending = []
+
+    # Rows with dispatch delay relative to the quickest key and the total
+    def results(self):
+        offsets = [row['handler_ns'] / 1e6 - row['Event Time (ms)'] for row in self.rows
+                   if row['Event Time (ms)'] is not None]
+        quickest = min(offsets) if offsets else None
+        results = []
+        for row in self.rows:
+            result = {field: row.get(field) for field in latency_fields}
+            if row['Event Time (ms)'] is not None:
+                result['Dispatch (ms)'] = row['handler_ns'] / 1e6 - row['Event Time (ms)'] - quickest
+            result['Total (ms)'] = (result['Dispatch (ms)'] or 0) + row['Handler (ms)'] + row['Paint (ms)']
+            for measure in measures:
+                if result[measure] is not None:
+                    result[measure] = round(result[measure], 3)
+            results.append(result)
+        return results
+
+    # Function to write the rows and print the summary
+    def dump(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        results = self.results()
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=latency_fields)
+            writer.writeheader()
+            writer.writerows(results)
+        print(f"Latency audit saved to {path} ({len(results)} keys)")
+        print(format_report(results))
+        return path
+
+
+# Function to get the default audit path for a session
+def latency_path(output_dir, participant_id):
+    stamp = time.strftime('%Y%m%d-%H%M%S')
+    return os.path.join(output_dir, f"Latency_{participant_id or 'session'}_{stamp}.csv")
+
+
+def percentile(values, q):
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+# Function to count values into histogram_edges_ms bins (the last bin is open-ended)
+def histogram(values):
+    counts = [0] * (len(histogram_edges_ms) + 1)
+    for value in values:
+        counts[sum(1 for edge in histogram_edges_ms if value >= edge)] += 1
+    return counts
+
+
+def format_histogram(measure, values, width=40):
+    counts = histogram(values)
+    lines = [f"{measure}: n={len(values)} p50={percentile(values, 0.5):.2f} p95={percentile(values, 0.95):.2f} "
+             f"p99={percentile(values, 0.99):.2f} max={values[-1]:.2f}"]
+    lows = (0,) + histogram_edges_ms
+    shown = max(i for i, count in enumerate(counts) if count) + 1
+    for i, count in enumerate(counts[:shown]):
+        label = f"{lows[i]:g}-{histogram_edges_ms[i]:g}" if i < len(histogram_edges_ms) else f">={lows[i]:g}"
+        bar = '#' * (round(width * count / len(values)) if count else 0)
+        lines.append(f"  {label:>10} ms {count:>6} {bar}")
+    return "\n".join(lines)
+
+
+# Function to check trial keys against certify_p99_ms; returns a list of problems
+def certify(results):
+    problems = []
+    trial_rows = [row for row in results if row['Kind'] in trial_kinds]
+    if not trial_rows:
+        return ["no trial keys recorded"]
+    for measure, limit in certify_p99_ms.items():
+        values = sorted(row[measure] for row in trial_rows if row[measure] is not None)
+        if values and percentile(values, 0.99) > limit:
+            problems.append(f"{measure} p99 {percentile(values, 0.99):.2f} ms is over {limit} ms")
+    return problems
+
+
+def format_report(results):
+    lines = []
+    for kind in trial_kinds:
+        rows = [row for row in results if row['Kind'] == kind]
+        if not rows:
+            continue
+        lines.append(f"{kind} keys")
+        for measure in measures:
+            values = sorted(row[measure] for row in rows if row[measure] is not None)
+            if values:
+                lines.append(format_histogram(measure, values))
+    problems = certify(results)
+    lines += [f"FAIL: {problem}" for problem in problems] or ["PASS: trial keys within the latency limits"]
+    return "\n".join(lines)
+
+
+# Function to read an audit file back with numbers typed
+def read_audit(path):
+    with open(path, newline='', encoding='utf-8') as f:
+        rows = list(csv.DictReader(f))
+    for row in rows:
+        for measure in measures:
+            row[measure] = float(row[measure]) if row.get(measure) else None
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarise input-latency audits and check a machine against the limits.")
+    parser.add_argument('files', nargs='+', help="Latency_* files recorded with --audit-latency (pooled)")
+    args = parser.parse_args()
+    results = []
+    for path in args.files:
+        results += read_audit(path)
+    print(format_report(results))
+    sys.exit(1 if certify(results) else 0)
+
+
+if __name__ == "__main__":
+    main()
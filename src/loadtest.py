@@ -0,0 +1,190 @@
+import argparse
+import asyncio
+import base64
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+
+from server import encode_frame, read_frame, accept_key, ProtocolError
+
+# Load-test harness for server.py.
+# Starts the server in its own process (or targets --host/--port), opens N
+# WebSocket sessions that all stay connected at once, plays every session to
+# the end with a random policy and reports round-trip latency, completed
+# sessions and the server's memory per session.
+
+
+class LoadClient:
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+
+    async def send(self, message):
+        self.writer.write(encode_frame(0x1, json.dumps(message).encode('utf-8'), mask=True))
+        await self.writer.drain()
+
+    async def receive(self):
+        while True:
+            opcode, payload = await read_frame(self.reader, masked=False)
+            if opcode == 0x1:
+                return json.loads(payload)
+            if opcode == 0x8:
+                raise ConnectionError("Server closed the WebSocket")
+
+
+# Function to open a new session over a WebSocket
+async def connect(host, port, participant_id):
+    reader, writer = await asyncio.open_connection(host, port)
+    key = base64.b64encode(os.urandom(16)).decode('ascii')
+    writer.write((f"GET /ws?participant_id={participant_id} HTTP/1.1\r\nHost: {host}:{port}\r\n"
+                  "Upgrade: websocket\r\nConnection: Upgrade\r\n"
+                  f"Sec-WebSocket-Key: {key}\r\nSec-WebSocket-Version: 13\r\n\r\n").encode('ascii'))
+    head = (await reader.readuntil(b'\r\n\r\n')).decode('latin-1')
+    if not head.startswith("HTTP/1.1 101") or accept_key(key) not in head:
+        raise ConnectionError(head.split('\r\n', 1)[0])
+    return LoadClient(reader, writer)
+
+
+# Function to play one session to the end; returns the respond -> outcome latencies in ms
+async def play_session(host, port, index, think_ms, all_connected, play_prob):
+    client = await connect(host, port, f"load-{index}")
+    await client.receive()  # Session snapshot
+    await all_connected.wait()  # Hold every connection open before anyone starts
+    await client.send({'action': 'start'})
+    latencies = []
+    sent_ns = None
+    while True:
+        event = await client.receive()
+        kind = event.get('event')
+        if kind == 'trial':
+            await asyncio.sleep(random.uniform(*think_ms) / 1000)
+            sent_ns = time.perf_counter_ns()
+            await client.send({'action': 'respond', 'choice': 'play' if random.random() < play_prob else 'pass'})
+        elif kind == 'outcome':
+            if sent_ns is not None:
+                latencies.append((time.perf_counter_ns() - sent_ns) / 1e6)
+                sent_ns = None
+            await client.send({'action': 'continue'})
+        elif kind == 'transition':
+            await client.send({'action': 'start_main'})
+        elif kind == 'end':
+            break
+        elif kind == 'error':
+            raise ProtocolError(400, event['error'])
+    client.writer.close()
+    return latencies
+
+
+# Function to read a process' current and peak resident memory in KiB (Linux)
+def process_memory(pid):
+    memory = {}
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith(('VmRSS:', 'VmHWM:')):
+                    name, value = line.split(':')
+                    memory[name] = int(value.split()[0])
+    except OSError:
+        pass
+    return memory
+
+
+# Function to start server.py in its own process; returns (process, port)
+def spawn_server(args):
+    command = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'server.py'),
+               '--host', args.host, '--port', '0', '--trials', str(args.trials),
+               '--practice-trials', str(args.practice_trials), '--timeout', str(args.timeout),
+               '--max-sessions', str(args.sessions)]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+    line = process.stdout.readline()  # "Serving IGT sessions on http://host:port"
+    if not line:
+        raise RuntimeError("Server did not start")
+    return process, int(line.rsplit(':', 1)[1])
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q / 100 * len(values)))]
+
+
+async def run(args):
+    process = None
+    port = args.port
+    if args.spawn:
+        process, port = spawn_server(args)
+    try:
+        baseline = process_memory(process.pid) if process else {}
+        all_connected = asyncio.Event()
+        tasks = [asyncio.create_task(play_session(args.host, port, i, args.think_ms, all_connected, args.play_prob))
+                 for i in range(args.sessions)]
+
+        # Wait until every session is connected, then let them all play at once
+        start = time.perf_counter()
+        while True:
+            stats = await http_get(args.host, port, '/stats')
+            failed = sum(1 for t in tasks if t.done() and t.exception())
+            if stats['connected'] + failed >= args.sessions:
+                break
+            await asyncio.sleep(0.1)
+        connected = stats['connected']
+        print(f"{connected} sessions connected concurrently in {time.perf_counter() - start:.2f} s")
+        all_connected.set()
+
+        start = time.perf_counter()
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        elapsed = time.perf_counter() - start
+        peak = process_memory(process.pid) if process else {}
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    latencies = [ms for r in results if not isinstance(r, BaseException) for ms in r]
+    errors = [r for r in results if isinstance(r, BaseException)]
+    completed = len(results) - len(errors)
+    print(f"{completed}/{args.sessions} sessions completed in {elapsed:.1f} s "
+          f"({len(latencies) / elapsed:.0f} responses/s)")
+    if latencies:
+        print(f"Respond -> outcome latency: p50 {statistics.median(latencies):.2f} ms, "
+              f"p95 {percentile(latencies, 95):.2f} ms, p99 {percentile(latencies, 99):.2f} ms, "
+              f"max {max(latencies):.2f} ms")
+    if peak:
+        per_session = (peak['VmHWM'] - baseline.get('VmRSS', 0)) / args.sessions
+        print(f"Server memory: peak {peak['VmHWM'] / 1024:.1f} MiB, {per_session:.1f} KiB per session")
+    for error in errors[:5]:
+        print(f"Session failed: {error!r}")
+    return 0 if not errors and connected >= args.sessions else 1
+
+
+# Function to fetch a JSON resource from the server
+async def http_get(host, port, path):
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: {host}\r\nConnection: close\r\n\r\n".encode('ascii'))
+    response = await reader.read()
+    writer.close()
+    return json.loads(response.split(b'\r\n\r\n', 1)[1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the IGT session server with concurrent sessions.")
+    parser.add_argument('--sessions', type=int, default=1000)
+    parser.add_argument('--trials', type=int, default=120)
+    parser.add_argument('--practice-trials', type=int, default=10)
+    parser.add_argument('--timeout', type=int, default=4000, help="Response window in ms")
+    parser.add_argument('--think-ms', type=float, nargs=2, default=[200, 800],
+                        help="Participant think time range before each response")
+    parser.add_argument('--play-prob', type=float, default=0.5)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765, help="Port of a running server (with --no-spawn)")
+    parser.add_argument('--no-spawn', dest='spawn', action='store_false',
+                        help="Target an already running server instead of starting one")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(run(args)))
+
+
+if __name__ == "__main__":
+    main()
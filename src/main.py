@@ -1,229 +1,302 @@
-import random
-import pandas as pd
+import argparse
+import time
 import os
 from tkinter import Tk, Label, Button, Frame, Entry, messagebox, PhotoImage, font
-from PIL import Image, ImageTk
-import arabic_reshaper
-from bidi.algorithm import get_display
-
-# Deck configurations
-conditions = {
-    'deck_a': {'Reward': 100, 'Penalty': -250},
-    'deck_b': {'Reward': 100, 'Penalty': -1150},
-    'deck_c': {'Reward': 50, 'Penalty': -25},
-    'deck_d': {'Reward': 50, 'Penalty': -200},
-}
+from decks import decks
+from assets import cached_asset
+from engine import IGTEngine, FrontEnd, valid_participant_id
+from config import default_config, load_config
+from persian import shape, prewarm, NumberTemplate, cache_stats, format_stats
+from profiler import Profiler, engine_phases, profile_path
+from latency import LatencyAudit, latency_path
 
 # Initialize variables
-net_worth = 2000
-previous_net_worth = net_worth
-current_position = 0  # Arrow starts at Deck A
-decks = ['deck_a', 'deck_b', 'deck_c', 'deck_d']
-trial_data = []  # Stores trial data for Excel output
+output_dir = "Iowa_Gambling_Task_tkinter/output"
+image_dir = "Iowa_Gambling_Task_tkinter/images"
+export_excel = True  # Also write Participant_{id}.xlsx at the end (trial_log.py can convert later)
+output_format = 'xlsx'  # End-of-session file: 'xlsx', or typed 'parquet' / 'arrow' (needs pyarrow)
 timeout_duration = 4  # Seconds to timeout
+timer_precision = 'spin'  # 'coarse' (Tk after) or 'spin' (after, then busy-wait the last 2 ms)
 total_trials = 20
-current_trial = 0
 practice_trials = 10  # Number of practice trials
 
-# Function to convert numbers to Persian numerals
-def persian_number(number):
-    persian_digits = {
-        '0': '۰', '1': '۱', '2': '۲', '3': '۳', '4': '۴',
-        '5': '۵', '6': '۶', '7': '۷', '8': '۸', '9': '۹'
-    }
-    # Handle negative numbers
-    if isinstance(number, int) or isinstance(number, float):
-        number_str = str(abs(number))  # Convert to absolute value first
-        persian_num = ''.join(persian_digits[digit] for digit in number_str)
-        if number < 0:
-            return f"-{persian_num}"  # Add negative sign if necessary
-        return persian_num
-    return number  # Return as-is if not a number
-
-# Function to log data to Excel
-def log_data(participant_id, participant_name, trial_type, choice, outcome, net_worth):
-    trial_data.append({
-        'Participant ID': participant_id,
-        'Participant Name': participant_name,
-        'Trial Type': trial_type,
-        'Choice': choice,
-        'Outcome': persian_number(outcome) if outcome != 0 else "0",  # Record $0 payoff as "0"
-        'Net Worth': persian_number(net_worth),
-    })
-
-# Function to save data to Excel
-def save_data(participant_id):
-    try:
-        # Create an output directory if it doesn't exist
-        output_dir = "Iowa_Gambling_Task_tkinter/output"
-        if not os.path.exists(output_dir):
-            os.makedirs(output_dir)
-
-        # Save the Excel file in the output directory
-        df = pd.DataFrame(trial_data)
-        output_file = os.path.join(output_dir, f"Participant_{participant_id}.xlsx")
-        df.to_excel(output_file, index=False, engine='openpyxl')
-        print(f"Data saved to {output_file}")  # Debug statement
-    except Exception as e:
-        print(f"Error saving data: {e}")  # Debug statement
-
-# Function to simulate deck outcome based on probabilities
-def simulate_outcome(deck):
-    if deck == 'deck_a':
-        # Deck A: 50% gain, 50% loss, 0% $0 payoff
-        if random.random() < 0.50:
-            return 100  # Gain
-        else:
-            return -250  # Loss
-    elif deck == 'deck_b':
-        # Deck B: 90% gain, 10% loss, 0% $0 payoff
-        if random.random() < 0.90:
-            return 100  # Gain
-        else:
-            return -1150  # Loss
-    elif deck == 'deck_c':
-        # Deck C: 50% gain, 25% loss, 25% $0 payoff
-        rand = random.random()
-        if rand < 0.50:
-            return 50  # Gain
-        elif rand < 0.75:
-            return -25  # Loss
-        else:
-            return 0  # $0 payoff
-    elif deck == 'deck_d':
-        # Deck D: 90% gain, 10% loss, 0% $0 payoff
-        if random.random() < 0.90:
-            return 50  # Gain
-        else:
-            return -200  # Loss
-    else:
-        return 0  # Default case (should not occur)
+# Function to reshape and display Persian text (cached, see persian.py)
+persian_text = shape
+
+# Fixed screens: (text, colour, padding) per line
+register_lines = (
+    ("ثبت اطلاعات", "blue", 100),
+    ("نام و شناسه خود را وارد کنید:", "black", 20),
+)
+welcome_lines = (
+    ("در این بازی هدف شما این است که تا حد ممکن پول برنده شوید!", "blue", 50),
+    ("برای هر دور یک فلش زرد رنگ بالای یکی از چهار دسته کارت نشان داده خواهد شد", "black", 10),
+    ("به واسطه آن، میتوانید بین بازی کردن یا رد کردن آن کارت تصمیم بگیرید.", "black", 10),
+    ("اگر بازی کنید؛ ممکن است سکه برنده شوید و یا از دست بدهید", "black", 20),
+    ("(و یا نه سکه ببرید و نه از دست بدهید)", "black", 20),
+    ("اگر رد شوید؛ نه سکه می‌برید و نه چیزی از دست خواهید داد.", "black", 20),
+    ("توجه کنید که در هر نوبت فقط 4 ثانیه زمان دارید تا تصمیم بگیرید", "red", 20),
+    ("با 2000 سکه شروع خواهید کرد.", "black", 20),
+    ("برای ادامه کلید space را فشار دهید.", "green", 50),
+)
+practice_lines = (
+    ("پیش از آغاز بازی اصلی، به بازی تمرینی خواهید پرداخت", "blue", 50),
+    ("این مرحله در چند تکرار انجام خواهد شد و فقط جهت آشنایی شما", "black", 10),
+    ("با ساختار و نحوه انجام بازی است.", "black", 10),
+    ("لذا نتایج این مرحله ثبت نخواهد شد", "black", 20),
+    ("برای ادامه کلید space را فشار دهید.", "green", 50),
+)
+transition_lines = (
+    ("پایان مرحله تمرینی", "blue", 50),
+    ("اکنون به بازی اصلی میپردازید.", "black", 20),
+    ("در این مرحله پاسخ های شما ثبت خواهد شد و در پایان", "black", 10),
+    ("نتیجه نهایی خود را مشاهده خواهید کرد.", "black", 10),
+    ("موفق باشید.", "black", 20),
+    ("برای ادامه کلید space را فشار دهید.", "green", 50),
+)
+# Static screens built during idle time after startup (see prerender_pages)
+static_pages = (('welcome', welcome_lines), ('practice', practice_lines), ('transition', transition_lines))
+# Other fixed strings of the trial and end screens
+fixed_texts = ("برای بازی کردن", "برای گذر کردن", "گذر", "برای ادامه فاصله (Space) را بزنید", "خروج",
+               "پایان بازی\n\nپژوهشگران:\n\n Parinaz Khosravani\nparinaz.khosravaani@gmail.com \n\n Farzad Soleimani\nfarzadsoleimani7593@gmail.com")
+
+# Last line of the end screen with --kiosk
+kiosk_text = "برای شرکت‌کننده بعدی کلید space را فشار دهید"
+# Keys bound during a session, released before the next participant types their name
+session_keys = ('<f>', '<j>', '<space>', '<q>')
+
+# Labels that only change by a number, shaped once and filled with Persian digits
+net_worth_text = NumberTemplate("موجودی فعلی: {} سکه", shape)
+previous_net_worth_text = NumberTemplate("موجودی قبلی: {} سکه", shape)
+final_net_worth_text = NumberTemplate("موجودی نهایی شما: {} سکه", shape)
+gain_text = NumberTemplate("{} سود", shape)
+loss_text = NumberTemplate("{} ضرر", shape)
+# The participant ID names the output files (see engine.valid_participant_id)
+invalid_id_text = "شناسه فقط می‌تواند شامل حروف، ارقام، _ و - باشد (حداکثر ۶۴ نویسه)."
+# Status of the background save on the end screen
+save_progress_text = NumberTemplate("در حال ذخیره اطلاعات... {}٪", shape)
+save_status_texts = {
+    'saved': ("اطلاعات ذخیره شد", "green"),
+    'fallback': ("اطلاعات به صورت خام ذخیره شد", "orange"),
+    'failed': ("خطا در ذخیره اطلاعات! لطفاً به آزمایشگر اطلاع دهید", "red"),
+}
 
-# Function to reshape and display Persian text
-def persian_text(text):
-    reshaped_text = arabic_reshaper.reshape(text)
-    return get_display(reshaped_text)
+# Function to resize an image with LANCZOS into the asset cache
+def render_lanczos(source, size, dest):
+    from PIL import Image  # Only needed on an asset cache miss
+    with Image.open(source) as img:
+        img.resize(size, Image.Resampling.LANCZOS).save(dest, format='PNG')
+
+# Function to load a resized image, decoding the pre-scaled cached copy
+def load_image(name, size):
+    source = os.path.join(image_dir, f"{name}.png")
+    return PhotoImage(file=cached_asset(source, size, 'lanczos', render_lanczos))
+
+# Front-end methods timed with --profile, by phase
+frontend_phases = {
+    'load_assets': 'assets',
+    'enter_phase': 'render',
+    'build_trial_screen': 'render',
+    'present_trial': 'render',
+    'update_ui': 'render',
+    'show_page': 'render',
+    'show_outcome': 'feedback',
+    'wait_for_continue': 'feedback',
+    'show_transition': 'render',
+    'show_end': 'render',
+}
 
 # GUI Application
-class IGTApp:
-    def __init__(self, root):
+class IGTApp(FrontEnd):
+    def __init__(self, root, profiler=None, config=None, seed=None, audit=None, kiosk=False):
         self.root = root
+        self.audit = audit  # LatencyAudit with --audit-latency
+        # With kiosk, Space on the end page starts the next participant in this window;
+        # with a seed, session i runs with seed + i
+        self.kiosk = kiosk
+        self.seed = seed
+        self.sessions = 0
         self.root.title("Iowa Gambling Task")
         self.root.geometry("1920x1200")
         self.root.configure(bg="#f0f0f0")
 
         self.custom_font = font.Font(family="B Koodak", size=40)
-        self.net_worth = net_worth
-        self.previous_net_worth = previous_net_worth
-        self.current_position = current_position
         self.decks = decks
-        self.trial_data = trial_data
-        self.current_trial = current_trial
-        self.participant_id = ""
-        self.participant_name = ""
-        self.timer_running = False
-        self.space_enabled = False
-        self.timer_id = None  # Store the timer ID to cancel it if needed
-        self.is_practice = True  # Flag to indicate if it's a practice trial
+        # Task state machine, outcomes, response window and logging live in the engine
+        if config is None:
+            config = default_config(outcome_model='probabilistic', total_trials=total_trials,
+                                    practice_trials=practice_trials, timeout_ms=timeout_duration * 1000,
+                                    timer_precision=timer_precision, output_format=output_format)
+        self.config = config
+        self.engine = IGTEngine.from_config(self, config, output_dir=output_dir, export_excel=export_excel,
+                                            debug=True, seed=seed)
+        if profiler is not None:
+            self.instrument(profiler)
+
+        # Images are loaded on first use (see load_assets) so the registration page shows first
+        self.deck_images = None
+        self.trial_screen = None  # Built on the first trial, then reused
+        # Every screen is a frame placed over the whole window; showing one only raises it
+        self.pages = {}
+
+        # Start with the registration page
+        self.register_page()
+        self.root.after_idle(self.load_assets)  # Queued behind the page's first redraw
+
+    # Function to bind a key; with --audit-latency the handler is timed up to the next redraw
+    def bind_key(self, sequence, handler):
+        if self.audit is None:
+            self.root.bind(sequence, handler)
+            return
 
+        def audited(event):
+            self.audit.key(event.keysym, event.time, time.perf_counter_ns(), self.engine.state)
+            handler(event)
+            self.audit.handled(self.engine.state)
+            self.root.after_idle(self.audit.painted)  # Runs after the redraw the handler queued
+        self.root.bind(sequence, audited)
+
+    # Time the hot paths of this session (only called with --profile)
+    def instrument(self, profiler):
+        global persian_text
+        profiler.instrument(self.engine, engine_phases, 'engine')
+        profiler.instrument(self, frontend_phases, 'tk')
+        persian_text = profiler.wrap(persian_text, 'persian_text', 'text')
+
+    def load_assets(self):
+        if self.deck_images is not None:
+            return
         # Load deck images
-        self.deck_images = []
-        for deck in self.decks:
-            img = Image.open(f"Iowa_Gambling_Task_tkinter/images/{deck}.png")
-            img = img.resize((200, 300), Image.Resampling.LANCZOS)
-            self.deck_images.append(ImageTk.PhotoImage(img))
+        self.deck_images = [load_image(deck, (200, 300)) for deck in self.decks]
 
         # Load arrow image
-        self.arrow_img = Image.open("Iowa_Gambling_Task_tkinter/images/arrow.png")
-        self.arrow_img = self.arrow_img.resize((100, 100), Image.Resampling.LANCZOS)
-        self.arrow_img = ImageTk.PhotoImage(self.arrow_img)
+        self.arrow_img = load_image('arrow', (100, 100))
 
         # Load F and J key images
-        self.f_key_img = Image.open("Iowa_Gambling_Task_tkinter/images/f_key.png")
-        self.f_key_img = self.f_key_img.resize((100, 100), Image.Resampling.LANCZOS)
-        self.f_key_img = ImageTk.PhotoImage(self.f_key_img)
-
-        self.j_key_img = Image.open("Iowa_Gambling_Task_tkinter/images/j_key.png")
-        self.j_key_img = self.j_key_img.resize((100, 100), Image.Resampling.LANCZOS)
-        self.j_key_img = ImageTk.PhotoImage(self.j_key_img)
-
-        # Start with the registration page
-        self.register_page()
+        self.f_key_img = load_image('f_key', (100, 100))
+        self.j_key_img = load_image('j_key', (100, 100))
+
+        # Import the export library and shape the fixed screens while the participant is still registering
+        self.engine.preload_exporter()
+        prewarm(text for lines in (welcome_lines, practice_lines, transition_lines) for text, _, _ in lines)
+        prewarm(fixed_texts)
+        prewarm(text for text, _ in save_status_texts.values())
+        self.root.after_idle(self.prerender_pages)
+
+    # Function to build the next static screen that is not built yet, one per idle step
+    # so typing on the registration page stays responsive
+    def prerender_pages(self):
+        for name, lines in static_pages:
+            if name not in self.pages:
+                self.page(name, lines).update_idletasks()  # Geometry is computed before it is shown
+                self.root.after_idle(self.prerender_pages)
+                return
+        if self.trial_screen is None:
+            self.build_trial_screen()
+            self.trial_screen.update_idletasks()
+
+    # Function to get a cached page, built on first use and stacked behind the visible one
+    def page(self, name, lines=()):
+        page = self.pages.get(name)
+        if page is None:
+            page = Frame(self.root, bg="#f0f0f0")
+            for text, colour, padding in lines:
+                Label(page, text=persian_text(text), font=self.custom_font, fg=colour, bg="#f0f0f0").pack(pady=padding)
+            page.place(x=0, y=0, relwidth=1, relheight=1)
+            page.lower()
+            self.pages[name] = page
+        return page
+
+    def show_page(self, page):
+        page.tkraise()
 
     def register_page(self):
-        self.clear_frame()
-        Label(self.root, text=persian_text("ثبت اطلاعات"), font=self.custom_font, fg="blue", bg="#f0f0f0").pack(pady=100)
-        Label(self.root, text=persian_text("نام و شناسه خود را وارد کنید:"), font=self.custom_font, bg="#f0f0f0").pack(pady=20)
-
-        self.name_entry = Entry(self.root, font=self.custom_font, justify="right")
+        if 'register' in self.pages:
+            self.show_page(self.pages['register'])
+            return
+        page = self.page('register', register_lines)
+        self.name_entry = Entry(page, font=self.custom_font, justify="right")
         self.name_entry.pack(pady=10)
 
-        self.id_entry = Entry(self.root, font=self.custom_font, justify="right")
+        self.id_entry = Entry(page, font=self.custom_font, justify="right")
         self.id_entry.pack(pady=10)
 
-        Button(self.root, text=persian_text("شروع"), command=self.start_task, font=self.custom_font, bg="green", fg="white").pack(pady=20)
+        Button(page, text=persian_text("شروع"), command=self.start_task, font=self.custom_font, bg="green", fg="white").pack(pady=20)
+        self.show_page(page)
 
     def start_task(self):
-        self.participant_name = self.name_entry.get()
-        self.participant_id = self.id_entry.get()
-        if not self.participant_name or not self.participant_id:
+        participant_name = self.name_entry.get()
+        participant_id = self.id_entry.get()
+        if not participant_name or not participant_id:
             messagebox.showwarning(persian_text("خطای ورودی"), persian_text("لطفاً نام و شناسه خود را وارد کنید."))
             return
+        if not valid_participant_id(participant_id):
+            messagebox.showwarning(persian_text("خطای ورودی"), persian_text(invalid_id_text))
+            return
+        self.engine.register(participant_id, participant_name)
+        if self.audit is not None:
+            self.audit.participant_id = participant_id
+        self.root.focus_set()  # Keys no longer go to the (hidden) entries
         self.show_welcome_page()
 
+    # Function to hand the window over to the next participant (--kiosk): the engine starts
+    # a fresh session and every page and image is reused, so there is nothing to relaunch.
+    # Waits on the end page until the previous participant's data is saved
+    def new_participant(self):
+        job = self.engine.save_job
+        if job is not None and not job.done:
+            return
+        for sequence in session_keys:
+            self.root.unbind(sequence)
+        self.sessions += 1
+        self.engine.new_session(self.seed + self.sessions if self.seed is not None else None)
+        self.name_entry.delete(0, 'end')
+        self.id_entry.delete(0, 'end')
+        self.register_page()
+        self.name_entry.focus_set()
+
     def show_welcome_page(self):
-        self.clear_frame()
-        Label(self.root, text=persian_text("در این بازی هدف شما این است که تا حد ممکن پول برنده شوید!"), font=self.custom_font, fg="blue", bg="#f0f0f0").pack(pady=50)
-        Label(self.root, text=persian_text("برای هر دور یک فلش زرد رنگ بالای یکی از چهار دسته کارت نشان داده خواهد شد"), font=self.custom_font, bg="#f0f0f0").pack(pady=10)
-        Label(self.root, text=persian_text("به واسطه آن، میتوانید بین بازی کردن یا رد کردن آن کارت تصمیم بگیرید."), font=self.custom_font, bg="#f0f0f0").pack(pady=10)
-        Label(self.root, text=persian_text("اگر بازی کنید؛ ممکن است سکه برنده شوید و یا از دست بدهید"), font=self.custom_font, bg="#f0f0f0").pack(pady=20)
-        Label(self.root, text=persian_text("(و یا نه سکه ببرید و نه از دست بدهید)"), font=self.custom_font, bg="#f0f0f0").pack(pady=20)
-        Label(self.root, text=persian_text("اگر رد شوید؛ نه سکه می‌برید و نه چیزی از دست خواهید داد."), font=self.custom_font, bg="#f0f0f0").pack(pady=20)
-        Label(self.root, text=persian_text("توجه کنید که در هر نوبت فقط 4 ثانیه زمان دارید تا تصمیم بگیرید"), font=self.custom_font, fg='red', bg="#f0f0f0").pack(pady=20)
-        Label(self.root, text=persian_text("با 2000 سکه شروع خواهید کرد."), font=self.custom_font,fg='black', bg="#f0f0f0").pack(pady=20)
-        Label(self.root, text=persian_text("برای ادامه کلید space را فشار دهید."), font=self.custom_font, fg="green", bg="#f0f0f0").pack(pady=50)
-        self.root.bind('<space>', lambda event: self.show_practice_instructions())
+        self.show_page(self.page('welcome', welcome_lines))
+        self.bind_key('<space>', lambda event: self.show_practice_instructions())
 
     def show_practice_instructions(self):
-        self.clear_frame()
-        Label(self.root, text=persian_text("پیش از آغاز بازی اصلی، به بازی تمرینی خواهید پرداخت"), font=self.custom_font, fg="blue", bg="#f0f0f0").pack(pady=50)
-        Label(self.root, text=persian_text("این مرحله در چند تکرار انجام خواهد شد و فقط جهت آشنایی شما"), font=self.custom_font, bg="#f0f0f0").pack(pady=10)
-        Label(self.root, text=persian_text("با ساختار و نحوه انجام بازی است."), font=self.custom_font, bg="#f0f0f0").pack(pady=10)
-        Label(self.root, text=persian_text("لذا نتایج این مرحله ثبت نخواهد شد"), font=self.custom_font, bg="#f0f0f0").pack(pady=20)
-        Label(self.root, text=persian_text("برای ادامه کلید space را فشار دهید."), font=self.custom_font, fg="green", bg="#f0f0f0").pack(pady=50)
-        self.root.bind('<space>', lambda event: self.practice_game())
-
-    def practice_game(self):
-        self.is_practice = True
-        self.current_trial = 0
-        self.main_task()
-
-    def show_transition_to_main_game(self):
-        self.clear_frame()
-        Label(self.root, text=persian_text("پایان مرحله تمرینی"), font=self.custom_font, fg="blue", bg="#f0f0f0").pack(pady=50)
-        Label(self.root, text=persian_text("اکنون به بازی اصلی میپردازید."), font=self.custom_font, bg="#f0f0f0").pack(pady=20)
-        Label(self.root, text=persian_text("در این مرحله پاسخ های شما ثبت خواهد شد و در پایان"), font=self.custom_font, bg="#f0f0f0").pack(pady=10)
-        Label(self.root, text=persian_text("نتیجه نهایی خود را مشاهده خواهید کرد."), font=self.custom_font, bg="#f0f0f0").pack(pady=10)
-        Label(self.root, text=persian_text("موفق باشید."), font=self.custom_font, bg="#f0f0f0").pack(pady=20)
-        Label(self.root, text=persian_text("برای ادامه کلید space را فشار دهید."), font=self.custom_font, fg="green", bg="#f0f0f0").pack(pady=50)
-        self.root.bind('<space>', lambda event: self.start_main_game())
-
-    def start_main_game(self):
-        self.is_practice = False
-        self.current_trial = 0
-        self.net_worth = 2000  # Reset net_worth to 2000 for the main task
-        self.previous_net_worth = 2000  # Reset previous_net_worth as well
-        self.main_task()
-
-    def main_task(self):
-        self.clear_frame()
-        self.net_worth_label = Label(self.root, text=persian_text(f"موجودی فعلی: {persian_number(self.net_worth)} سکه"), font=self.custom_font, fg="purple", bg="#f0f0f0")
+        self.show_page(self.page('practice', practice_lines))
+        self.bind_key('<space>', lambda event: self.engine.start_practice())
+
+    def show_transition(self, state):
+        self.show_page(self.page('transition', transition_lines))
+        self.bind_key('<space>', lambda event: self.engine.start_main())
+
+    def enter_phase(self, state):
+        self.load_assets()
+        if self.trial_screen is None:
+            self.build_trial_screen()
+        # Reuse the trial screen: only text and the arrow position change
+        self.update_ui(state)
+        self.show_page(self.trial_screen)
+
+        # Bind keys for play, pass, continue and quit
+        # Response time is taken as soon as Tk dispatches the key event
+        self.bind_key('<f>', lambda event: self.engine.respond('play', time.perf_counter_ns()))
+        self.bind_key('<j>', lambda event: self.engine.respond('pass', time.perf_counter_ns()))
+        self.bind_key('<space>', lambda event: self.engine.continue_trial())
+        self.bind_key('<q>', lambda event: self.engine.finish())
+
+    def build_trial_screen(self):
+        # Built once and kept alive between practice and main game
+        self.trial_screen = self.page('trial')
+
+        self.net_worth_label = Label(self.trial_screen, text="", font=self.custom_font, fg="purple", bg="#f0f0f0")
         self.net_worth_label.pack(pady=20)
 
-        self.previous_net_worth_label = Label(self.root, text=persian_text(f"موجودی قبلی: {persian_number(self.previous_net_worth)} سکه"), font=self.custom_font, fg="orange", bg="#f0f0f0")
+        self.previous_net_worth_label = Label(self.trial_screen, text="", font=self.custom_font, fg="orange", bg="#f0f0f0")
         self.previous_net_worth_label.pack(pady=20)
 
-        self.deck_frame = Frame(self.root, bg="#f0f0f0")
+        # Space prompt stays in place and is emptied between trials
+        self.space_label = Label(self.trial_screen, text="", font=self.custom_font, fg="blue", bg="#f0f0f0")
+        self.space_label.pack(pady=20)
+
+        self.deck_frame = Frame(self.trial_screen, bg="#f0f0f0")
         self.deck_frame.place(relx=0.5, rely=0.5, anchor="center")
 
         self.deck_labels = []
@@ -238,7 +311,6 @@ class IGTApp:
             self.feedback_labels.append(feedback_label)
 
         self.arrow_label = Label(self.deck_frame, image=self.arrow_img, bg="#f0f0f0")
-        self.arrow_label.grid(row=0, column=self.current_position, padx=30, pady=30)
 
         # Add F and J key images with text, closer together and positioned lower
         self.f_key_label = Label(self.deck_frame, image=self.f_key_img, bg="#f0f0f0")
@@ -249,112 +321,94 @@ class IGTApp:
         self.j_key_label.grid(row=3, column=3, padx=10, pady=20)  # Reduced padding and moved lower
         Label(self.deck_frame, text=persian_text("برای گذر کردن"), font=self.custom_font, bg="#f0f0f0").grid(row=4, column=3, padx=10, pady=5)  # Reduced padding
 
-        # Bind keys for play, pass, and quit
-        self.root.bind('<f>', lambda event: self.play())
-        self.root.bind('<j>', lambda event: self.pass_turn())
-        self.root.bind('<q>', lambda event: self.quit())
-
-        # Start the first trial
-        self.start_trial()
-
-    def start_trial(self):
-        if self.is_practice and self.current_trial >= practice_trials:
-            self.show_transition_to_main_game()
-            return
-        elif not self.is_practice and self.current_trial >= total_trials:
-            self.quit()
-            return
-        self.current_trial += 1
-        self.timer_running = True
-        self.space_enabled = False
-        # Start the timer and store its ID
-        self.timer_id = self.root.after(timeout_duration * 1000, self.timeout)  # Fixed: No parentheses!
-
-    def timeout(self):
-        if self.timer_running:  # Only proceed if the timer is still running
-            print("Timeout triggered")  # Debug statement
-            self.timer_running = False
-            self.previous_net_worth = self.net_worth
-            self.feedback_labels[self.current_position].config(text=persian_text("گذر"), fg="black")
-            if not self.is_practice:
-                log_data(self.participant_id, self.participant_name, 'main', 'pass', 0, self.net_worth)
-            self.update_ui()
-            self.wait_for_space()
-
-    def wait_for_space(self):
-        self.space_enabled = True
-        self.space_label = Label(self.root, text=persian_text("برای ادامه فاصله (Space) را بزنید"), font=self.custom_font, fg="blue", bg="#f0f0f0")
-        self.space_label.pack(pady=20)
-        self.root.bind('<space>', lambda event: self.continue_trial())
-
-    def continue_trial(self):
-        if not self.space_enabled:
-            return
-        print("Continuing to next trial")  # Debug statement
-        self.space_enabled = False
-        self.space_label.destroy()
+    def present_trial(self, state):
+        self.space_label.config(text="")
         self.clear_feedback()
-        self.current_position = random.randint(0, len(self.decks) - 1)
-        self.arrow_label.grid(row=0, column=self.current_position, padx=30, pady=30)
-        self.start_trial()
+        self.arrow_label.grid(row=0, column=state.position, padx=30, pady=30)
+        # Draw the arrow first; the response window runs from the real onset
+        self.root.update_idletasks()
+        return time.perf_counter_ns()
+
+    def show_outcome(self, state):
+        if state.choice == 'play':
+            feedback = (gain_text if state.outcome > 0 else loss_text).format(abs(state.outcome))
+            self.feedback_labels[state.position].config(text=feedback, fg="green" if state.outcome > 0 else "red")
+        else:
+            self.feedback_labels[state.position].config(text=persian_text("گذر"), fg="black")
+        self.update_ui(state)
+
+    def wait_for_continue(self, state):
+        self.space_label.config(text=persian_text("برای ادامه فاصله (Space) را بزنید"))
 
     def clear_feedback(self):
         for feedback_label in self.feedback_labels:
             feedback_label.config(text="")
 
-    def update_ui(self):
-        self.net_worth_label.config(text=persian_text(f"موجودی فعلی: {persian_number(self.net_worth)} سکه"))
-        self.previous_net_worth_label.config(text=persian_text(f"موجودی قبلی: {persian_number(self.previous_net_worth)} سکه"))
-
-    def play(self):
-        if not self.timer_running:
+    def update_ui(self, state):
+        self.net_worth_label.config(text=net_worth_text.format(state.net_worth))
+        self.previous_net_worth_label.config(text=previous_net_worth_text.format(state.previous_net_worth))
+
+    def start_timer(self, delay_ms, callback):
+        return self.root.after(delay_ms, callback)
+
+    def stop_timer(self, handle):
+        self.root.after_cancel(handle)
+
+    def show_end(self, state):
+        if 'end' not in self.pages:
+            page = self.page('end', ((fixed_texts[-1], "blue", 100),))
+            self.final_net_worth_label = Label(page, text="", font=self.custom_font, fg="purple", bg="#f0f0f0")
+            self.final_net_worth_label.pack(pady=20)
+            self.save_label = Label(page, text="", font=self.custom_font, bg="#f0f0f0")
+            self.save_label.pack(pady=20)
+            if self.kiosk:
+                Label(page, text=persian_text(kiosk_text), font=self.custom_font, fg="green", bg="#f0f0f0").pack(pady=20)
+            Button(page, text=persian_text("خروج"), command=self.root.destroy, font=self.custom_font, bg="gray", fg="white").pack(pady=20)
+        self.final_net_worth_label.config(text=final_net_worth_text.format(state.net_worth))
+        self.show_page(self.pages['end'])
+        if self.kiosk:
+            self.bind_key('<space>', lambda event: self.new_participant())
+        self.update_save_status()
+
+    def log_failed(self, error):
+        messagebox.showwarning(persian_text("خطا"), persian_text(save_status_texts['failed'][0]))
+
+    # Function to show how the background save is doing, polled until it is done
+    def update_save_status(self):
+        job = self.engine.save_job
+        if job is None:
             return
-        # Cancel the timer if the participant responds before the timeout
-        if self.timer_id:
-            self.root.after_cancel(self.timer_id)
-        self.timer_running = False
-        selected_deck = self.decks[self.current_position]
-        outcome = simulate_outcome(selected_deck)
-        self.previous_net_worth = self.net_worth
-        self.net_worth += outcome
-        feedback = persian_text(f"{persian_number(abs(outcome))} {'سود' if outcome > 0 else 'ضرر'}")
-        self.feedback_labels[self.current_position].config(text=feedback, fg="green" if outcome > 0 else "red")
-        # Log data for every trial, including $0 payoff
-        if not self.is_practice:
-            log_data(self.participant_id, self.participant_name, 'main', selected_deck, outcome, self.net_worth)
-        self.update_ui()
-        self.wait_for_space()
-
-    def pass_turn(self):
-        if not self.timer_running:
+        if not job.done:
+            self.save_label.config(text=save_progress_text.format(int(job.fraction * 100)), fg="black")
+            self.root.after(100, self.update_save_status)
             return
-        # Cancel the timer if the participant responds before the timeout
-        if self.timer_id:
-            self.root.after_cancel(self.timer_id)
-        self.timer_running = False
-        self.previous_net_worth = self.net_worth
-        self.feedback_labels[self.current_position].config(text=persian_text("گذر"), fg="black")
-        if not self.is_practice:
-            log_data(self.participant_id, self.participant_name, 'main', 'pass', 0, self.net_worth)
-        self.update_ui()
-        self.wait_for_space()
-
-    def quit(self):
-        # Save the final result to the data
-        if not self.is_practice:
-            log_data(self.participant_id, self.participant_name, 'final', 'end', 0, self.net_worth)
-            save_data(self.participant_id)  # Save data to Excel
-        self.clear_frame()
-        Label(self.root, text=persian_text(f"پایان بازی\n\nپژوهشگران:\n\n Parinaz Khosravani\nparinaz.khosravaani@gmail.com \n\n Farzad Soleimani\nfarzadsoleimani7593@gmail.com"), font=self.custom_font, fg="blue", bg="#f0f0f0").pack(pady=100)
-        Label(self.root, text=persian_text(f"موجودی نهایی شما: {persian_number(self.net_worth)} سکه"), font=self.custom_font, fg="purple", bg="#f0f0f0").pack(pady=20)
-        Button(self.root, text=persian_text("خروج"), command=self.root.destroy, font=self.custom_font, bg="gray", fg="white").pack(pady=20)
-
-    def clear_frame(self):
-        for widget in self.root.winfo_children():
-            widget.destroy()
+        text, colour = save_status_texts[job.status]
+        self.save_label.config(text=persian_text(text), fg=colour)
 
 # Run the application
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Iowa Gambling Task (Tk)")
+    parser.add_argument('--profile', nargs='?', const='', default=None, metavar='TRACE',
+                        help="Time the hot paths and write a Chrome trace on exit")
+    parser.add_argument('--config', default=None, metavar='PATH',
+                        help="Task definition file (.toml or .json, see config.py)")
+    parser.add_argument('--seed', type=int, default=None, help="Session seed (default: a fresh one, logged)")
+    parser.add_argument('--audit-latency', nargs='?', const='', default=None, metavar='CSV',
+                        help="Time every key press up to the next redraw and write a latency report on exit")
+    parser.add_argument('--kiosk', action='store_true',
+                        help="Run participants back to back: Space on the end page starts the next session")
+    args = parser.parse_args()
+    profiler = Profiler() if args.profile is not None else None
+    audit = LatencyAudit() if args.audit_latency is not None else None
+    config = load_config(args.config) if args.config else None
+
     root = Tk()
-    app = IGTApp(root)
-    root.mainloop()
\ No newline at end of file
+    app = IGTApp(root, profiler, config, args.seed, audit, args.kiosk)
+    root.mainloop()
+    if app.engine.save_job is not None:
+        app.engine.save_job.wait()  # Closing the window early does not cut the save short
+    if profiler is not None:
+        profiler.dump(args.profile or profile_path(output_dir, app.engine.participant_id))
+        print(f"Text cache: {format_stats(cache_stats())}")  # Shaping cache hit rates, with the profile
+    if audit is not None:
+        audit.dump(args.audit_latency or latency_path(output_dir, app.engine.participant_id))
@@ -0,0 +1,86 @@
+import functools
+
+# Cached Persian text rendering.
+# Digits go through a module-level translation table, reshaped + bidi-reordered
+# strings are kept in a bounded LRU cache, and labels that only differ by a
+# number (net worth, gain/loss) are shaped once as a template with the digits
+# spliced in, so a trial does no text shaping at all once the caches are warm.
+
+digit_table = str.maketrans('0123456789', '۰۱۲۳۴۵۶۷۸۹')
+shape_cache_size = 512
+_placeholder = '۰'  # A digit, so the bidi algorithm places it exactly like the number it stands for
+
+
+# Function to convert numbers to Persian numerals
+def persian_number(number):
+    if isinstance(number, (int, float)):
+        return str(number).translate(digit_table)
+    return number  # Return as-is if not a number
+
+
+# Function to reshape and bidi-reorder Persian text for widgets without bidi support (Tk)
+@functools.lru_cache(maxsize=shape_cache_size)
+def shape(text):
+    import arabic_reshaper
+    from bidi.algorithm import get_display
+    return get_display(arabic_reshaper.reshape(text))
+
+
+# Function to shape a list of fixed strings ahead of time (e.g. while the first page is idle)
+def prewarm(texts, shaper=shape):
+    for text in texts:
+        shaper(text)
+
+
+# A text with one '{}' number slot, shaped once per sign and then filled with digits
+class NumberTemplate:
+    __slots__ = ('text', 'shaper', 'variants')
+    hits = 0
+    misses = 0
+
+    def __init__(self, text, shaper=None):
+        self.text = text
+        self.shaper = shaper  # None: no shaping (Qt lays out bidi text itself)
+        self.variants = {}
+
+    def format(self, number):
+        sign = '-' if number < 0 else ''
+        variant = self.variants.get(sign)
+        if variant is None:
+            NumberTemplate.misses += 1
+            text = self.text.format(sign + _placeholder)
+            variant = self.shaper(text) if self.shaper is not None else text
+            if variant.count(_placeholder) != 1:
+                variant = False  # The fixed text has Persian digits of its own; shape in full
+            self.variants[sign] = variant
+        else:
+            NumberTemplate.hits += 1
+        digits = persian_number(abs(number))
+        if variant is False:
+            text = self.text.format(sign + digits)
+            return self.shaper(text) if self.shaper is not None else text
+        return variant.replace(_placeholder, digits)
+
+
+# Function to summarise how well the caches are doing
+def cache_stats():
+    info = shape.cache_info()
+    lookups = info.hits + info.misses
+    templates = NumberTemplate.hits + NumberTemplate.misses
+    return {
+        'shape_hits': info.hits,
+        'shape_misses': info.misses,
+        'shape_hit_rate': info.hits / lookups if lookups else None,
+        'shape_size': info.currsize,
+        'template_hits': NumberTemplate.hits,
+        'template_misses': NumberTemplate.misses,
+        'template_hit_rate': NumberTemplate.hits / templates if templates else None,
+    }
+
+
+def format_stats(stats):
+    rate = lambda r: f"{r:.1%}" if r is not None else "n/a"
+    return (f"shape cache {stats['shape_hits']}/{stats['shape_hits'] + stats['shape_misses']} hits "
+            f"({rate(stats['shape_hit_rate'])}, {stats['shape_size']} entries), "
+            f"templates {stats['template_hits']}/{stats['template_hits'] + stats['template_misses']} hits "
+            f"({rate(stats['template_hit_rate'])})")
@@ -0,0 +1,161 @@
+# Presentation plans: which deck the arrow points at on every trial of a phase,
+# computed up front instead of one independent random pick per trial.
+#
+# A plan shows every deck a fixed number of times (equal by default), spread
+# evenly over blocks of block_size trials, with no deck shown more than max_run
+# times in a row. Block quotas come from sequential apportionment (each trial
+# slot goes to the deck furthest behind its share), so every block is balanced
+# to within one presentation per deck. Each block is then ordered by weighted
+# sampling from its remaining quota, skipping choices that would break the run
+# limit or leave the rest of the block unsolvable. That is O(trials x decks);
+# if the greedy order still runs into a dead end, a backtracking solver orders
+# that block instead.
+
+
+class PlanError(ValueError):
+    pass
+
+
+# Function to split n_trials over decks as evenly as possible. The remainder goes to
+# random decks among those with a card to spare (supply caps each deck, None is unlimited),
+# so whether a split exists does not depend on the draw
+def equal_counts(rng, n_trials, n_decks, supply=None):
+    counts = [n_trials // n_decks] * n_decks
+    supply = supply or [None] * n_decks
+    for deck, cards in enumerate(supply):
+        if cards is not None and counts[deck] > cards:
+            raise PlanError(f"Deck {deck} would be shown {counts[deck]} times but has only {cards} cards")
+    spare = [deck for deck, cards in enumerate(supply) if cards is None or cards > counts[deck]]
+    extra = n_trials % n_decks
+    if extra > len(spare):
+        raise PlanError(f"{n_trials} trials need {extra} decks with more than {counts[0]} cards, "
+                        f"only {len(spare)} have them")
+    for deck in rng.sample(spare, extra):
+        counts[deck] += 1
+    return counts
+
+
+# Function to get how many times each deck is shown in each block
+def block_quotas(counts, n_trials, block_size):
+    quotas = []
+    given = [0] * len(counts)
+    for t in range(1, n_trials + 1):
+        # The slot goes to the deck furthest behind its share of the first t trials
+        deck = max(range(len(counts)), key=lambda d: counts[d] * t / n_trials - given[d])
+        given[deck] += 1
+        if (t - 1) % block_size == 0:
+            quotas.append([0] * len(counts))
+        quotas[-1][deck] += 1
+    return quotas
+
+
+# Whether the remaining quota can still be ordered with at most max_run in a row,
+# given that the last deck placed has already been shown `run` times in a row
+def _feasible(remaining, last, run, max_run):
+    total = sum(remaining)
+    for deck, count in enumerate(remaining):
+        others = total - count
+        # Each deck needs a different deck between runs; the open run shortens the first one
+        capacity = max_run * (others + 1) - (run if deck == last else 0)
+        if count > capacity:
+            return False
+    return True
+
+
+# The last deck of a block must also leave the following block solvable
+def _can_place(remaining, deck, run, max_run, following):
+    if not max_run:
+        return True
+    if not _feasible(remaining, deck, run, max_run):
+        return False
+    return any(remaining) or following is None or _feasible(following, deck, run, max_run)
+
+
+def _order_greedy(rng, quota, last, run, max_run, following=None):
+    remaining = list(quota)
+    order = []
+    for _ in range(sum(quota)):
+        candidates = []
+        for deck, count in enumerate(remaining):
+            if count == 0 or (max_run and deck == last and run >= max_run):
+                continue
+            remaining[deck] -= 1
+            if _can_place(remaining, deck, run + 1 if deck == last else 1, max_run, following):
+                candidates.append(deck)
+            remaining[deck] += 1
+        if not candidates:
+            return None
+        deck = rng.choices(candidates, [remaining[d] for d in candidates])[0]
+        remaining[deck] -= 1
+        run = run + 1 if deck == last else 1
+        last = deck
+        order.append(deck)
+    return order
+
+
+# Constraint solver fallback: depth-first search over the block's remaining quota
+def _order_backtracking(rng, quota, last, run, max_run, following=None):
+    remaining = list(quota)
+    order = []
+
+    def place(last, run):
+        if not any(remaining):
+            return True
+        decks = [d for d, count in enumerate(remaining) if count]
+        rng.shuffle(decks)
+        for deck in decks:
+            next_run = run + 1 if deck == last else 1
+            if max_run and next_run > max_run:
+                continue
+            remaining[deck] -= 1
+            order.append(deck)
+            if _can_place(remaining, deck, next_run, max_run, following) and place(deck, next_run):
+                return True
+            order.pop()
+            remaining[deck] += 1
+        return False
+
+    return order if place(last, run) else None
+
+
+# Function to build a plan; returns (positions, solver) where solver is 'greedy' or 'backtracking'.
+# supply caps each deck's count (e.g. its number of cards under the 'stop' exhaustion policy)
+def plan_presentation(rng, n_trials, n_decks, block_size=None, max_run=0, counts=None, supply=None):
+    if n_trials <= 0:
+        return [], 'greedy'
+    counts = list(counts) if counts is not None else equal_counts(rng, n_trials, n_decks, supply)
+    if len(counts) != n_decks or sum(counts) != n_trials:
+        raise PlanError(f"Deck counts {counts} must give {n_decks} decks {n_trials} trials in total")
+    if supply is not None:
+        for deck, (count, cards) in enumerate(zip(counts, supply)):
+            if cards is not None and count > cards:
+                raise PlanError(f"Deck {deck} would be shown {count} times but has only {cards} cards")
+    if max_run and not _feasible(counts, None, 0, max_run):
+        raise PlanError(f"Deck counts {counts} cannot be ordered with at most {max_run} in a row")
+
+    plan = []
+    solver = 'greedy'
+    last, run = None, 0
+    quotas = block_quotas(counts, n_trials, block_size or n_trials)
+    for b, quota in enumerate(quotas):
+        following = quotas[b + 1] if b + 1 < len(quotas) else None
+        order = _order_greedy(rng, quota, last, run, max_run, following)
+        if order is None:
+            solver = 'backtracking'
+            order = _order_backtracking(rng, quota, last, run, max_run, following)
+            if order is None:
+                raise PlanError(f"No order of block {quota} keeps runs to {max_run} after {run} x deck {last}")
+        for deck in order:
+            run = run + 1 if deck == last else 1
+            last = deck
+        plan.extend(order)
+    return plan, solver
+
+
+# Function to get the longest run of one deck in a plan
+def longest_run(plan):
+    longest = run = 0
+    for i, deck in enumerate(plan):
+        run = run + 1 if i and deck == plan[i - 1] else 1
+        longest = max(longest, run)
+    return longest
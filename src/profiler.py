@@ -0,0 +1,123 @@
+import functools
+import json
+import os
+import threading
+import time
+from array import array
+
+# Opt-in hot-path profiler for live sessions (--profile in main.py / IGTQT.py).
+# instrument() swaps the chosen methods of an object for timed wrappers, so
+# nothing is measured (or slowed down) unless profiling was asked for. Spans go
+# into a fixed-size ring buffer of perf_counter_ns values; dump() writes them as
+# a Chrome trace (chrome://tracing, Perfetto) and prints percentiles per span.
+
+default_capacity = 1 << 16  # Spans kept; the oldest are overwritten
+
+
+class Profiler:
+    def __init__(self, capacity=default_capacity):
+        self.capacity = capacity
+        self.names = [None] * capacity
+        self.categories = [None] * capacity
+        self.starts = array('q', bytes(8 * capacity))
+        self.durations = array('q', bytes(8 * capacity))
+        self.count = 0  # Spans recorded so far, including overwritten ones
+        self.origin_ns = time.perf_counter_ns()
+
+    def record(self, name, category, start_ns, end_ns):
+        i = self.count % self.capacity
+        self.names[i] = name
+        self.categories[i] = category
+        self.starts[i] = start_ns
+        self.durations[i] = end_ns - start_ns
+        self.count += 1
+
+    # Function to wrap a callable so every call is recorded as a span
+    def wrap(self, func, name, category):
+        record = self.record
+        clock = time.perf_counter_ns
+
+        @functools.wraps(func)
+        def timed(*args, **kwargs):
+            start = clock()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record(name, category, start, clock())
+        return timed
+
+    # Function to time methods of one object; phases maps method name -> category
+    def instrument(self, obj, phases, prefix=None):
+        prefix = prefix or type(obj).__name__
+        for method, category in phases.items():
+            setattr(obj, method, self.wrap(getattr(obj, method), f"{prefix}.{method}", category))
+
+    # Spans still in the buffer, oldest first, as (name, category, start_ns, duration_ns)
+    def spans(self):
+        n = min(self.count, self.capacity)
+        first = self.count - n
+        for k in range(first, self.count):
+            i = k % self.capacity
+            yield self.names[i], self.categories[i], self.starts[i], self.durations[i]
+
+    def summary(self):
+        durations = {}
+        for name, category, _, duration in self.spans():
+            durations.setdefault((category, name), []).append(duration)
+        rows = []
+        for (category, name), values in sorted(durations.items()):
+            values.sort()
+            pick = lambda q: values[min(len(values) - 1, int(q * len(values)))] / 1e6
+            rows.append({'name': name, 'category': category, 'count': len(values),
+                         'p50_ms': pick(0.50), 'p95_ms': pick(0.95), 'p99_ms': pick(0.99),
+                         'max_ms': values[-1] / 1e6, 'total_ms': sum(values) / 1e6})
+        return rows
+
+    def trace(self):
+        pid = os.getpid()
+        tid = threading.get_ident()
+        events = [{'name': name, 'cat': category, 'ph': 'X', 'pid': pid, 'tid': tid,
+                   'ts': (start - self.origin_ns) / 1000, 'dur': duration / 1000}
+                  for name, category, start, duration in self.spans()]
+        return {'traceEvents': events, 'displayTimeUnit': 'ms',
+                'otherData': {'spans_recorded': self.count, 'spans_kept': len(events)}}
+
+    # Function to write the Chrome trace and print the summary percentiles
+    def dump(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        data = self.trace()
+        data['summary'] = self.summary()
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        print(f"Profile saved to {path} ({self.count} spans)")
+        print(format_summary(data['summary']))
+        return path
+
+
+def format_summary(rows):
+    lines = [f"{'span':<36} {'phase':<10} {'count':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}"]
+    for row in rows:
+        lines.append(f"{row['name']:<36} {row['category']:<10} {row['count']:>6} {row['p50_ms']:>8.3f} "
+                     f"{row['p95_ms']:>8.3f} {row['p99_ms']:>8.3f} {row['max_ms']:>8.3f}")
+    return "\n".join(lines)
+
+
+# Engine methods timed in every front end, by phase
+engine_phases = {
+    'start_trial': 'setup',
+    'continue_trial': 'setup',
+    'start_main': 'setup',
+    'respond': 'input',
+    'timeout': 'input',
+    'resolve': 'input',
+    'log_data': 'logging',
+    'save_data': 'logging',
+}
+
+
+# Function to get the default trace path for a session
+def profile_path(output_dir, participant_id):
+    stamp = time.strftime('%Y%m%d-%H%M%S')
+    return os.path.join(output_dir, f"Profile_{participant_id or 'session'}_{stamp}.json")
@@ -0,0 +1,128 @@
+import argparse
+import sys
+import time
+
+from config import load_config
+from cohort import read_participant
+from decks import exhaustion_policies
+from engine import IGTEngine, HeadlessFrontEnd, outcome_models
+from trial_log import parse_number
+
+# Session replay.
+# A recorded session is re-run headlessly with its logged seed, answering every
+# trial with the recorded choice (or letting it time out) and no response
+# windows, so it runs at full speed. Arrows, outcomes and net worth must come out
+# identical to the log: a check that a logic or performance change did not alter
+# what participants see. The task settings must match the recording (--config,
+# or --model/--exhaustion for the built-in decks).
+
+compared_fields = ['Presented Deck', 'Choice', 'Outcome', 'Net Worth']
+
+
+class ReplayError(Exception):
+    pass
+
+
+# Function to get the seed and the typed main trials (plus final net worth) of a recording
+def recorded_session(rows):
+    trials = []
+    final = None
+    for row in rows:
+        if row.get('Trial Type') == 'final':
+            final = parse_number(row.get('Net Worth'))
+        if row.get('Trial Type') != 'main':
+            continue
+        trials.append({
+            'Trial Number': parse_number(row.get('Trial Number')),
+            'Presented Deck': row.get('Presented Deck'),
+            'Choice': row.get('Choice'),
+            'Outcome': parse_number(row.get('Outcome')),
+            'Net Worth': parse_number(row.get('Net Worth')),
+            'Timeout': parse_number(row.get('Timeout Overshoot (ms)'), float) is not None,
+            'Seed': parse_number(row.get('Seed')),
+        })
+    if not trials:
+        raise ReplayError("no main trials")
+    seeds = {trial['Seed'] for trial in trials}
+    if None in seeds:
+        raise ReplayError("no Seed column (recorded before sessions were seeded)")
+    if len(seeds) > 1:
+        raise ReplayError(f"more than one seed: {sorted(seeds)}")
+    trials.sort(key=lambda trial: trial['Trial Number'])
+    return seeds.pop(), trials, final
+
+
+# Function to replay one recording; returns (replayed engine, list of mismatch messages)
+def replay_session(rows, config=None, outcome_model='sequence', exhaustion_policy='reshuffle'):
+    seed, trials, final = recorded_session(rows)
+    # Practice trials draw from their own streams and each phase's decks start from the order the
+    # phase before started with (see SequenceOutcomes.reset), so practice can be skipped
+    if config is not None:
+        engine = IGTEngine.from_config(HeadlessFrontEnd(), config.replace(practice_trials=0), spin_ns=0,
+                                       export_excel=False, seed=seed)
+    else:
+        engine = IGTEngine(HeadlessFrontEnd(), outcome_model, len(trials), 0, export_excel=False,
+                           exhaustion_policy=exhaustion_policy, seed=seed)
+    state = engine.state
+    engine.start_practice()
+    while state.phase != 'ended':
+        if state.awaiting == 'response':
+            if state.trial > len(trials):
+                engine.finish()  # The recording ends here (e.g. an abandoned session)
+            elif trials[state.trial - 1]['Timeout']:
+                engine.timeout()
+            else:
+                engine.respond(trials[state.trial - 1]['Choice'])
+        elif state.awaiting == 'continue':
+            engine.continue_trial()
+        elif state.awaiting == 'transition':
+            engine.start_main()
+
+    replayed = [row for row in engine.trial_data if row['Trial Type'] == 'main']
+    mismatches = []
+    if len(replayed) != len(trials):
+        mismatches.append(f"{len(trials)} trials recorded, {len(replayed)} replayed")
+    for recorded, row in zip(trials, replayed):
+        for field in compared_fields:
+            if recorded[field] != row[field]:
+                mismatches.append(f"trial {recorded['Trial Number']}: {field} recorded {recorded[field]!r}, "
+                                  f"replayed {row[field]!r}")
+    if final is not None and final != engine.state.net_worth:
+        mismatches.append(f"final net worth recorded {final}, replayed {engine.state.net_worth}")
+    return engine, mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded sessions headlessly and check they match.")
+    parser.add_argument('files', nargs='+', help="Participant_* files (.csv, .jsonl, .xlsx, .parquet, .arrow)")
+    parser.add_argument('--config', default=None, metavar='PATH', help="Task definition the sessions ran with")
+    parser.add_argument('--model', choices=sorted(outcome_models), default='sequence')
+    parser.add_argument('--exhaustion', choices=exhaustion_policies, default='reshuffle')
+    parser.add_argument('--show', type=int, default=5, help="Mismatches to print per session")
+    args = parser.parse_args()
+    config = load_config(args.config) if args.config else None
+
+    failed = 0
+    for path in args.files:
+        try:
+            rows = read_participant(path)
+            start = time.perf_counter()
+            engine, mismatches = replay_session(rows, config, args.model, args.exhaustion)
+            elapsed = time.perf_counter() - start
+        except (OSError, ReplayError) as e:
+            print(f"{path}: cannot replay: {e}")
+            failed += 1
+            continue
+        trials = sum(1 for row in engine.trial_data if row['Trial Type'] == 'main')
+        if mismatches:
+            failed += 1
+            print(f"{path}: {len(mismatches)} mismatches (seed {engine.seed})")
+            for message in mismatches[:args.show]:
+                print(f"  {message}")
+        else:
+            print(f"{path}: {trials} trials identical (seed {engine.seed}, replayed in {elapsed * 1000:.1f} ms)")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+import time
+
+# Response-window timer with absolute, drift-corrected deadlines.
+# The deadline is computed from the measured stimulus onset rather than from
+# when the timer was armed, the toolkit timer is re-armed if it wakes early,
+# and with spin_ns > 0 the last stretch is a tight perf_counter_ns loop so the
+# window closes within microseconds of the deadline.
+
+precision_modes = ('coarse', 'precise', 'spin')
+default_spin_ns = 2_000_000  # Busy-wait the final 2 ms in 'spin' mode
+
+
+class DeadlineTimer:
+    # start(delay_ms, callback) arms a one-shot toolkit timer and returns a handle,
+    # stop(handle) cancels it
+    def __init__(self, start, stop, spin_ns=0):
+        self.start = start
+        self.stop = stop
+        self.spin_ns = spin_ns
+        self.deadline_ns = None
+        self.fired_ns = None
+        self._handle = None
+        self._callback = None
+
+    def arm(self, onset_ns, duration_ns, callback):
+        self.cancel()
+        self.deadline_ns = onset_ns + duration_ns
+        self.fired_ns = None
+        self._callback = callback
+        self.poll()
+
+    def poll(self):
+        self._handle = None
+        if self._callback is None:
+            return
+        remaining = self.deadline_ns - time.perf_counter_ns()
+        if remaining > self.spin_ns:
+            if self.spin_ns:
+                delay_ms = (remaining - self.spin_ns) // 1_000_000  # Wake early, then spin
+            else:
+                delay_ms = -(-remaining // 1_000_000)  # Never wake before the deadline
+            self._handle = self.start(int(delay_ms), self.poll)
+            return
+        while time.perf_counter_ns() < self.deadline_ns:
+            pass
+        self.expire(time.perf_counter_ns())
+
+    # Close the window at now_ns (timer fired, or a response arrived after the deadline)
+    def expire(self, now_ns):
+        callback = self._callback
+        self.cancel()
+        self.fired_ns = now_ns
+        if callback is not None:
+            callback()
+
+    def cancel(self):
+        if self._handle is not None:
+            self.stop(self._handle)
+            self._handle = None
+        self._callback = None
+
+    def expired(self, now_ns):
+        return self.deadline_ns is not None and now_ns >= self.deadline_ns
+
+    @property
+    def overshoot_ns(self):
+        if self.fired_ns is None or self.deadline_ns is None:
+            return None
+        return self.fired_ns - self.deadline_ns
+
+
+# Function to pick the busy-wait margin for a precision mode
+def spin_margin(precision):
+    if precision not in precision_modes:
+        raise ValueError(f"Unknown timer precision: {precision!r} (expected one of {precision_modes})")
+    return default_spin_ns if precision == 'spin' else 0
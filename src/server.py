@@ -0,0 +1,501 @@
+import argparse
+import asyncio
+import base64
+import collections
+import hashlib
+import json
+import os
+import secrets
+import struct
+import time
+from urllib.parse import urlsplit, parse_qsl
+
+from engine import IGTEngine, FrontEnd, log_fields, log_types, outcome_models, participant_id_pattern
+from config import load_config
+from decks import exhaustion_policies
+from trial_log import write_log, write_table
+
+# Multi-participant session server (stdlib asyncio only).
+# Every session owns its own IGTEngine, so any number of participants can run
+# in one process. Sessions are driven over a WebSocket (events are pushed as
+# they happen, including timeouts) or over plain HTTP JSON requests.
+#
+#   GET  /ws?participant_id=..&participant_name=..   new session + WebSocket
+#   GET  /sessions/<id>/ws                           reattach a WebSocket
+#   POST /sessions                                   new session (JSON body)
+#   GET  /sessions/<id>                              state + queued events
+#   POST /sessions/<id>/<action>                     start, respond, continue, start_main, quit
+#   GET  /stats                                      server counters
+#
+# WebSocket messages are JSON: {"action": "respond", "choice": "play"} etc.
+
+host = '127.0.0.1'
+port = 8765
+output_dir = None  # Directory for Participant_{id}_{session}.csv of finished sessions (None: keep nothing)
+output_format = 'csv'  # 'csv', or typed 'parquet' / 'arrow' (needs pyarrow)
+outcome_model = 'sequence'
+exhaustion_policy = 'reshuffle'
+total_trials = 120
+practice_trials = 10
+timeout_duration = 4000  # Milliseconds to timeout
+max_sessions = 5000
+session_ttl = 15 * 60  # Seconds an idle session is kept
+ended_ttl = 60  # Seconds a finished session is kept for a last GET
+max_events = 16  # Events queued per session for HTTP clients
+max_message_size = 4096  # Largest request body / WebSocket message accepted
+max_write_buffer = 64 * 1024  # A WebSocket client further behind than this is dropped
+
+actions = ('start', 'respond', 'continue', 'start_main', 'quit')
+_ws_guid = b"258EAFA5-E914-47DA-95CA-C5AB0DC11B8D"
+
+
+class ProtocolError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+# Front end of one session: turns engine callbacks into JSON events
+class SessionFrontEnd(FrontEnd):
+    def __init__(self, session, loop):
+        self.session = session
+        self.loop = loop
+
+    def enter_phase(self, state):
+        self.session.emit({'event': 'phase', 'phase': state.phase})
+
+    def present_trial(self, state):
+        self.session.emit({'event': 'trial', 'phase': state.phase, 'trial': state.trial,
+                           'position': state.position, 'deck': state.presented_deck,
+                           'net_worth': state.net_worth, 'timeout_ms': self.session.server.timeout_ms})
+        return time.perf_counter_ns()
+
+    def show_outcome(self, state):
+        self.session.emit({'event': 'outcome', 'phase': state.phase, 'trial': state.trial,
+                           'choice': state.choice, 'outcome': state.outcome,
+                           'net_worth': state.net_worth})
+
+    def show_transition(self, state):
+        self.session.emit({'event': 'transition'})
+
+    def show_end(self, state):
+        self.session.emit({'event': 'end', 'net_worth': state.net_worth})
+        self.session.server.session_ended(self.session)
+
+    def start_timer(self, delay_ms, callback):
+        return self.loop.call_later(delay_ms / 1000, callback)
+
+    def stop_timer(self, handle):
+        handle.cancel()
+
+
+class Session:
+    __slots__ = ('id', 'server', 'engine', 'events', 'socket', 'last_active')
+
+    def __init__(self, server, session_id, participant_id, participant_name):
+        self.id = session_id
+        self.server = server
+        frontend = SessionFrontEnd(self, server.loop)
+        if server.config is not None:
+            self.engine = IGTEngine.from_config(frontend, server.config, spin_ns=0, export_excel=False)
+        else:
+            self.engine = IGTEngine(frontend, server.outcome_model, server.total_trials, server.practice_trials,
+                                    server.timeout_ms, export_excel=False, exhaustion_policy=server.exhaustion_policy)
+        self.engine.register(participant_id, participant_name)
+        self.events = collections.deque(maxlen=max_events)  # Oldest events drop off for slow HTTP clients
+        self.socket = None  # Attached WebSocket, if any
+        self.last_active = time.monotonic()
+
+    def emit(self, event):
+        if self.socket is not None and self.socket.send_json(event):
+            return
+        self.events.append(event)
+
+    def handle(self, message):
+        self.last_active = time.monotonic()
+        action = message.get('action')
+        engine = self.engine
+        if action == 'start':
+            if engine.state.phase is None:
+                engine.start_practice()
+        elif action == 'respond':
+            choice = message.get('choice')
+            if choice not in ('play', 'pass'):
+                raise ProtocolError(400, f"Unknown choice: {choice!r}")
+            engine.respond(choice, time.perf_counter_ns())
+        elif action == 'continue':
+            engine.continue_trial()
+        elif action == 'start_main':
+            if engine.state.awaiting == 'transition':
+                engine.start_main()
+        elif action == 'quit':
+            engine.finish()
+        else:
+            raise ProtocolError(400, f"Unknown action: {action!r} (expected one of {actions})")
+
+    def snapshot(self):
+        state = self.engine.state
+        events = list(self.events)
+        self.events.clear()
+        return {'session': self.id, 'phase': state.phase, 'awaiting': state.awaiting, 'trial': state.trial,
+                'position': state.position, 'net_worth': state.net_worth, 'events': events}
+
+
+# Server-side WebSocket connection (RFC 6455, text frames only)
+class WebSocket:
+    __slots__ = ('reader', 'writer', 'closed')
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.closed = False
+
+    # Queue a frame without waiting; returns False if the client is gone or too far behind
+    def send_json(self, obj):
+        if self.closed:
+            return False
+        if self.writer.transport.get_write_buffer_size() > max_write_buffer:
+            self.abort()
+            return False
+        self.writer.write(encode_frame(0x1, json.dumps(obj).encode('utf-8')))
+        return True
+
+    async def receive(self):
+        while True:
+            opcode, payload = await read_frame(self.reader, masked=True)
+            if opcode == 0x1:
+                try:
+                    return payload.decode('utf-8')
+                except UnicodeDecodeError:
+                    self.close(1007)  # Invalid frame payload data
+                    return None
+            if opcode == 0x8:
+                self.close()
+                return None
+            if opcode == 0x9:
+                self.writer.write(encode_frame(0xA, payload))
+
+    # Function to send a close frame, with a status code if given, and close the connection
+    def close(self, code=None):
+        if not self.closed:
+            self.closed = True
+            self.writer.write(encode_frame(0x8, struct.pack('!H', code) if code is not None else b''))
+            self.writer.close()
+
+    def abort(self):
+        self.closed = True
+        self.writer.transport.abort()
+
+
+# Function to encode an unmasked WebSocket frame (mask=True for client frames)
+def encode_frame(opcode, payload, mask=False):
+    header = bytearray([0x80 | opcode])
+    mask_bit = 0x80 if mask else 0
+    length = len(payload)
+    if length < 126:
+        header.append(mask_bit | length)
+    elif length < 1 << 16:
+        header.append(mask_bit | 126)
+        header += struct.pack('!H', length)
+    else:
+        header.append(mask_bit | 127)
+        header += struct.pack('!Q', length)
+    if mask:
+        key = os.urandom(4)
+        header += key
+        payload = apply_mask(payload, key)
+    return bytes(header) + payload
+
+
+def apply_mask(payload, key):
+    n = len(payload)
+    mask = int.from_bytes((key * (n // 4 + 1))[:n], 'big')
+    return (int.from_bytes(payload, 'big') ^ mask).to_bytes(n, 'big')
+
+
+# Function to read one WebSocket frame; fragmented messages are not supported
+async def read_frame(reader, masked):
+    first, second = await reader.readexactly(2)
+    opcode = first & 0x0F
+    if not first & 0x80:
+        raise ProtocolError(1003, "Fragmented frames are not supported")
+    if bool(second & 0x80) != masked:
+        raise ProtocolError(1002, "Unexpected frame masking")
+    length = second & 0x7F
+    if length == 126:
+        length, = struct.unpack('!H', await reader.readexactly(2))
+    elif length == 127:
+        length, = struct.unpack('!Q', await reader.readexactly(8))
+    if length > max_message_size:
+        raise ProtocolError(1009, "Message too big")
+    key = await reader.readexactly(4) if masked else None
+    payload = await reader.readexactly(length)
+    return opcode, apply_mask(payload, key) if masked else payload
+
+
+def accept_key(key):
+    return base64.b64encode(hashlib.sha1(key.encode('ascii') + _ws_guid).digest()).decode('ascii')
+
+
+class SessionServer:
+    def __init__(self, outcome_model=outcome_model, total_trials=total_trials, practice_trials=practice_trials,
+                 timeout_ms=timeout_duration, exhaustion_policy=exhaustion_policy, output_dir=output_dir,
+                 max_sessions=max_sessions, output_format=output_format, config=None):
+        self.config = config  # A config.TaskConfig replaces the task settings above
+        if config is not None:
+            outcome_model, total_trials, practice_trials = config.outcome_model, config.total_trials, config.practice_trials
+            timeout_ms, exhaustion_policy = config.timeout_ms, config.exhaustion_policy
+        self.outcome_model = outcome_model
+        self.total_trials = total_trials
+        self.practice_trials = practice_trials
+        self.timeout_ms = timeout_ms
+        self.exhaustion_policy = exhaustion_policy
+        self.output_dir = output_dir
+        self.max_sessions = max_sessions
+        self.output_format = output_format
+        self.sessions = {}
+        self.loop = None
+        self.server = None
+        self.started = 0
+        self.finished = 0
+        self._reaper = None
+
+    async def start(self, host=host, port=port):
+        self.loop = asyncio.get_running_loop()
+        if self.output_dir is not None:
+            os.makedirs(self.output_dir, exist_ok=True)
+        self.server = await asyncio.start_server(self.handle_connection, host, port, backlog=4096)
+        self._reaper = asyncio.create_task(self.reap())
+        return self.server.sockets[0].getsockname()[:2]
+
+    async def stop(self):
+        self._reaper.cancel()
+        self.server.close()
+        await self.server.wait_closed()
+
+    def create_session(self, participant_id, participant_name):
+        if len(self.sessions) >= self.max_sessions:
+            raise ProtocolError(503, "Too many sessions")
+        for name, value in (('participant_id', participant_id), ('participant_name', participant_name)):
+            if value is not None and not isinstance(value, str):
+                raise ProtocolError(400, f"{name} must be a string, got {value!r}")
+        if participant_id and not participant_id_pattern.fullmatch(participant_id):
+            raise ProtocolError(400, "participant_id may only hold up to 64 letters, digits, '_' and '-'")
+        session_id = secrets.token_urlsafe(9)
+        session = Session(self, session_id, participant_id or session_id, participant_name or "")
+        self.sessions[session_id] = session
+        self.started += 1
+        return session
+
+    def get_session(self, session_id):
+        session = self.sessions.get(session_id)
+        if session is None:
+            raise ProtocolError(404, f"No session {session_id}")
+        return session
+
+    def session_ended(self, session):
+        self.finished += 1
+        session.last_active = time.monotonic()
+        engine = session.engine
+        if self.output_dir is not None and engine.trial_data:
+            # The session id keeps two sessions of one participant ID apart
+            path = os.path.join(self.output_dir, f"Participant_{engine.participant_id}_{session.id}.{self.output_format}")
+            if self.output_format == 'csv':
+                future = self.loop.run_in_executor(None, write_log, path, engine.trial_data, log_fields)
+            else:
+                future = self.loop.run_in_executor(None, write_table, path, engine.trial_data, log_types)
+            future.add_done_callback(lambda future: report_save(future, path))
+
+    # Drop idle sessions and finished sessions nobody came back for
+    async def reap(self):
+        while True:
+            await asyncio.sleep(min(ended_ttl, session_ttl) / 4)
+            now = time.monotonic()
+            for session_id, session in list(self.sessions.items()):
+                ttl = ended_ttl if session.engine.state.phase == 'ended' else session_ttl
+                if now - session.last_active > ttl:
+                    session.engine.finish()  # Abandoned sessions still save what they have
+                    if session.socket is not None:
+                        session.socket.close()
+                    del self.sessions[session_id]
+
+    def stats(self):
+        return {'sessions': len(self.sessions), 'started': self.started, 'finished': self.finished,
+                'connected': sum(1 for s in self.sessions.values() if s.socket is not None)}
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                request = await read_request(reader)
+                if request is None:
+                    break
+                method, path, query, headers, body = request
+                if headers.get('upgrade', '').lower() == 'websocket':
+                    await self.handle_websocket(reader, writer, path, query, headers)
+                    break
+                try:
+                    status, payload = self.route(method, path, body)
+                except ProtocolError as e:
+                    status, payload = e.status, {'error': str(e)}
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                writer.write(http_response(status, payload, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        except ProtocolError as e:
+            writer.write(http_response(e.status, {'error': str(e)}, False))
+        finally:
+            writer.close()
+
+    def route(self, method, path, body):
+        parts = path.strip('/').split('/')
+        if method == 'GET' and parts == ['stats']:
+            return 200, self.stats()
+        if parts[0] != 'sessions':
+            raise ProtocolError(404, f"No route {path}")
+        if method == 'POST' and len(parts) == 1:
+            message = parse_json(body)
+            session = self.create_session(message.get('participant_id'), message.get('participant_name'))
+            return 201, session.snapshot()
+        session = self.get_session(parts[1] if len(parts) > 1 else '')
+        if method == 'GET' and len(parts) == 2:
+            session.last_active = time.monotonic()
+            return 200, session.snapshot()
+        if method == 'POST' and len(parts) == 3:
+            message = parse_json(body)
+            message['action'] = parts[2]
+            session.handle(message)
+            return 200, session.snapshot()
+        raise ProtocolError(405, f"{method} {path} not allowed")
+
+    async def handle_websocket(self, reader, writer, path, query, headers):
+        parts = path.strip('/').split('/')
+        if parts == ['ws']:
+            session = self.create_session(query.get('participant_id'), query.get('participant_name'))
+        elif len(parts) == 3 and parts[0] == 'sessions' and parts[2] == 'ws':
+            session = self.get_session(parts[1])
+        else:
+            raise ProtocolError(404, f"No route {path}")
+        if 'sec-websocket-key' not in headers:
+            raise ProtocolError(400, "Missing Sec-WebSocket-Key")
+        writer.write(("HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                      f"Sec-WebSocket-Accept: {accept_key(headers['sec-websocket-key'])}\r\n\r\n").encode('ascii'))
+        socket = WebSocket(reader, writer)
+        if session.socket is not None:
+            session.socket.close()  # The newest connection wins
+        session.socket = socket
+        socket.send_json(session.snapshot())
+        try:
+            while not socket.closed:
+                text = await socket.receive()
+                if text is None:
+                    break
+                try:
+                    session.handle(parse_json(text.encode('utf-8')))
+                except ProtocolError as e:
+                    socket.send_json({'event': 'error', 'error': str(e)})
+                await writer.drain()
+        except ProtocolError:
+            socket.abort()
+        finally:
+            if session.socket is socket:
+                session.socket = None
+
+
+# Function to report a session file that could not be written (runs when the write is done)
+def report_save(future, path):
+    if not future.cancelled() and future.exception() is not None:
+        print(f"Error saving {path}: {future.exception()}", flush=True)
+
+
+# Function to read one HTTP/1.1 request; returns None at end of stream
+async def read_request(reader):
+    try:
+        head = await reader.readuntil(b'\r\n\r\n')
+    except asyncio.IncompleteReadError as e:
+        if not e.partial:
+            return None
+        raise
+    except asyncio.LimitOverrunError:
+        raise ProtocolError(431, "Request header too large")
+    lines = head.decode('latin-1').split('\r\n')
+    try:
+        method, target, _ = lines[0].split(' ', 2)
+    except ValueError:
+        raise ProtocolError(400, "Malformed request line")
+    headers = {}
+    for line in lines[1:]:
+        if ':' in line:
+            name, value = line.split(':', 1)
+            headers[name.strip().lower()] = value.strip()
+    try:
+        length = int(headers.get('content-length', 0))
+    except ValueError:
+        raise ProtocolError(400, "Content-Length is not a number")
+    if length < 0:
+        raise ProtocolError(400, "Content-Length is negative")
+    if length > max_message_size:
+        raise ProtocolError(413, "Request body too large")
+    body = await reader.readexactly(length) if length else b''
+    url = urlsplit(target)
+    return method, url.path, dict(parse_qsl(url.query)), headers, body
+
+
+def parse_json(body):
+    if not body:
+        return {}
+    try:
+        message = json.loads(body)
+    except ValueError:
+        raise ProtocolError(400, "Body is not valid JSON")
+    if not isinstance(message, dict):
+        raise ProtocolError(400, "Body must be a JSON object")
+    return message
+
+
+_reasons = {200: 'OK', 201: 'Created', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+            413: 'Payload Too Large', 431: 'Request Header Fields Too Large', 503: 'Service Unavailable'}
+
+
+def http_response(status, payload, keep_alive=True):
+    body = json.dumps(payload).encode('utf-8')
+    head = (f"HTTP/1.1 {status} {_reasons.get(status, 'Error')}\r\nContent-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\nConnection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+    return head.encode('ascii') + body
+
+
+async def serve(args):
+    server = SessionServer(args.model, args.trials, args.practice_trials, args.timeout, args.exhaustion,
+                           args.output_dir, args.max_sessions, args.format,
+                           load_config(args.config) if args.config else None)
+    address = await server.start(args.host, args.port)
+    print(f"Serving IGT sessions on http://{address[0]}:{address[1]}", flush=True)
+    async with server.server:
+        await server.server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Host many concurrent IGT sessions over HTTP/WebSocket.")
+    parser.add_argument('--host', default=host)
+    parser.add_argument('--port', type=int, default=port)
+    parser.add_argument('--model', choices=sorted(outcome_models), default=outcome_model)
+    parser.add_argument('--exhaustion', choices=exhaustion_policies, default=exhaustion_policy)
+    parser.add_argument('--trials', type=int, default=total_trials)
+    parser.add_argument('--practice-trials', type=int, default=practice_trials)
+    parser.add_argument('--timeout', type=int, default=timeout_duration, help="Response window in ms")
+    parser.add_argument('--output-dir', default=output_dir)
+    parser.add_argument('--format', choices=('csv', 'parquet', 'arrow'), default=output_format)
+    parser.add_argument('--max-sessions', type=int, default=max_sessions)
+    parser.add_argument('--config', default=None, metavar='PATH',
+                        help="Task definition file (.toml or .json); overrides the task settings above")
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
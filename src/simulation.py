@@ -0,0 +1,150 @@
+import argparse
+import time
+import numpy as np
+
+from decks import decks, conditions, probabilities, deck_sequences, exhaustion_policies
+
+# Headless cohort simulator for the IGT deck model.
+# Every array is shaped (agents, trials) so a whole cohort is simulated in a
+# handful of NumPy operations instead of one simulate_outcome call per trial.
+
+start_net_worth = 2000
+start_position = 0  # Arrow starts at Deck A, as in the GUI
+
+
+# Function to build the per-agent play probability table, shape (agents, decks)
+def play_probability_table(n_agents, play_prob):
+    if play_prob is None:
+        play_prob = 0.5
+    table = np.asarray(play_prob, dtype=np.float64)
+    if table.ndim == 0:
+        table = np.full(len(decks), float(table))
+    if table.ndim == 1:
+        table = np.broadcast_to(table, (n_agents, len(decks)))
+    if table.shape != (n_agents, len(decks)):
+        raise ValueError(f"play_prob must broadcast to ({n_agents}, {len(decks)}), got {table.shape}")
+    return table
+
+
+# Function to draw the presented deck for every trial (continue_trial picks uniformly)
+def present_arrows(rng, n_agents, n_trials):
+    presented = rng.integers(0, len(decks), size=(n_agents, n_trials), dtype=np.int8)
+    presented[:, 0] = start_position
+    return presented
+
+
+# Function to draw outcomes from the probabilistic deck model (main.py)
+def probabilistic_outcomes(rng, presented, played, exhaustion_policy=None):
+    reward = np.array([conditions[d]['Reward'] for d in decks], dtype=np.int32)
+    penalty = np.array([conditions[d]['Penalty'] for d in decks], dtype=np.int32)
+    p_reward = np.array([probabilities[d]['Reward'] for d in decks])
+    p_penalty = p_reward + np.array([probabilities[d]['Penalty'] for d in decks])
+
+    rand = rng.random(presented.shape)
+    outcome = np.where(rand < p_reward[presented], reward[presented],
+                       np.where(rand < p_penalty[presented], penalty[presented], 0))
+    outcome[~played] = 0
+    return outcome.astype(np.int32)
+
+
+# Function to draw outcomes from per-agent shuffled copies of deck_sequences (IGTQT.py).
+# Exhausted decks follow the same policies as decks.Deck: 'reshuffle' deals a fresh
+# permutation, 'wrap' replays the same one and 'stop' pays 0 from then on.
+def sequence_outcomes(rng, presented, played, exhaustion_policy='reshuffle'):
+    if exhaustion_policy not in exhaustion_policies:
+        raise ValueError(f"Unknown exhaustion policy: {exhaustion_policy!r} (expected one of {exhaustion_policies})")
+    n_agents, n_trials = presented.shape
+    lengths = np.array([len(deck_sequences[d]) for d in decks])
+    n_cards = int(lengths.max())
+    cards = np.zeros((len(decks), n_cards), dtype=np.int32)
+    for i, deck in enumerate(decks):
+        cards[i, :lengths[i]] = deck_sequences[deck]
+
+    # The card drawn on a trial is the number of earlier plays on the same deck
+    draws = (presented[:, :, None] == np.arange(len(decks), dtype=np.int8)) & played[:, :, None]
+    drawn_before = np.cumsum(draws, axis=1, dtype=np.int16) - draws
+    card_index = np.take_along_axis(drawn_before, presented[:, :, None].astype(np.intp), axis=2)[:, :, 0]
+    deck_length = lengths[presented]
+
+    # Only deal as many passes through a deck as the busiest agent needs
+    passes = 1
+    if exhaustion_policy == 'reshuffle' and played.any():
+        passes = int((card_index[played] // deck_length[played]).max()) + 1
+
+    # Shuffle every agent's decks at once; padding slots sort to the end of each pass
+    keys = rng.random((n_agents, len(decks), passes, n_cards))
+    padding = np.arange(n_cards)[None, :] >= lengths[:, None]
+    keys += 2.0 * padding[None, :, None, :]
+    order = np.argsort(keys, axis=3)
+    shuffled = cards[np.arange(len(decks))[None, :, None, None], order]
+
+    available = played.copy()
+    if exhaustion_policy == 'stop':
+        available &= card_index < deck_length
+        card_pass = np.zeros_like(card_index)
+        card_index = np.minimum(card_index, deck_length - 1)
+    elif exhaustion_policy == 'wrap':
+        card_pass = np.zeros_like(card_index)
+        card_index = card_index % deck_length
+    else:
+        card_pass = card_index // deck_length
+        card_index = card_index % deck_length
+    outcome = shuffled[np.arange(n_agents)[:, None], presented, card_pass, card_index]
+    outcome[~available] = 0
+    return outcome
+
+
+outcome_models = {
+    'probabilistic': probabilistic_outcomes,
+    'sequence': sequence_outcomes,
+}
+
+
+# Function to simulate a cohort of agents playing the task
+def simulate_cohort(n_agents, n_trials=120, model='sequence', play_prob=None, seed=None,
+                    exhaustion_policy='reshuffle'):
+    if model not in outcome_models:
+        raise ValueError(f"Unknown outcome model: {model!r} (expected one of {sorted(outcome_models)})")
+    # Independent streams for arrows, choices and outcomes, so changing one model keeps the others' draws
+    seed_sequence = np.random.SeedSequence(seed)
+    arrow_rng, choice_rng, outcome_rng = (np.random.default_rng(s) for s in seed_sequence.spawn(3))
+    table = play_probability_table(n_agents, play_prob)
+
+    presented = present_arrows(arrow_rng, n_agents, n_trials)
+    played = choice_rng.random((n_agents, n_trials)) < table[np.arange(n_agents)[:, None], presented]
+    outcome = outcome_models[model](outcome_rng, presented, played, exhaustion_policy)
+    net_worth = start_net_worth + np.cumsum(outcome, axis=1, dtype=np.int64)
+
+    return {
+        'presented': presented,
+        'played': played,
+        'outcome': outcome,
+        'net_worth': net_worth,
+        'seed': seed_sequence.entropy,  # Pass back as seed to reproduce the cohort
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate a synthetic IGT cohort without the GUI.")
+    parser.add_argument('--agents', type=int, default=10000)
+    parser.add_argument('--trials', type=int, default=120)
+    parser.add_argument('--model', choices=sorted(outcome_models), default='sequence')
+    parser.add_argument('--play-prob', type=float, nargs='+', default=[0.5],
+                        help="One probability for all decks or one per deck (A B C D)")
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--exhaustion', choices=exhaustion_policies, default='reshuffle')
+    args = parser.parse_args()
+
+    play_prob = args.play_prob[0] if len(args.play_prob) == 1 else args.play_prob
+    start = time.perf_counter()
+    result = simulate_cohort(args.agents, args.trials, args.model, play_prob, args.seed, args.exhaustion)
+    elapsed = time.perf_counter() - start
+
+    final = result['net_worth'][:, -1]
+    print(f"Simulated {args.agents} agents x {args.trials} trials ({args.model}) in {elapsed * 1000:.1f} ms "
+          f"(seed {result['seed']})")
+    print(f"Final net worth: mean {final.mean():.1f}, sd {final.std():.1f}, min {final.min()}, max {final.max()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+# Startup budget check.
+# Each front end is imported in a fresh interpreter under `python -X importtime`.
+# The check fails when the import takes longer than its budget, or when it pulls
+# in a library that should only load on first use (export, image and analysis
+# libraries). It also times a fresh interpreter up to the first window of each
+# front end that can open one here. benchmark.py tracks the same numbers per commit.
+
+src_dir = os.path.dirname(os.path.abspath(__file__))
+repo_dir = os.path.dirname(src_dir)
+image_dir = os.path.join(repo_dir, 'images')
+
+# Budgets in milliseconds
+import_budget_ms = {'main': 150, 'IGTQT': 200}
+window_budget_ms = {'main': 1000, 'IGTQT': 1500}
+# Loaded on first use or in the background, never while the registration page is drawn
+deferred_modules = ('pandas', 'numpy', 'scipy', 'PIL', 'openpyxl', 'pyarrow')
+
+# Opens the front end's first window and prints when it is up
+window_scripts = {
+    'main': ("import sys; from tkinter import Tk; import main; main.image_dir = sys.argv[1]; "
+             "root = Tk(); app = main.IGTApp(root); root.update(); print('shown', flush=True); root.destroy()"),
+    'IGTQT': ("import sys; from PyQt6.QtWidgets import QApplication; import IGTQT; IGTQT.image_dir = sys.argv[1]; "
+              "app = QApplication(sys.argv[:1]); window = IGTQT.IGTApp(); window.show(); app.processEvents(); "
+              "print('shown', flush=True)"),
+}
+
+
+def child_env():
+    env = dict(os.environ)
+    # Without a display, Qt can still open its window offscreen
+    if not env.get('DISPLAY') and not env.get('WAYLAND_DISPLAY'):
+        env.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    return env
+
+
+# Function to import a module in a fresh interpreter; returns {module: (self_us, cumulative_us)}
+def import_profile(module):
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f"import {module}"], cwd=src_dir,
+                            capture_output=True, text=True, env=child_env())
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        own, cumulative, name = line[len('import time:'):].split('|')
+        times[name.strip()] = (int(own), int(cumulative))
+    return times
+
+
+# Function to time a fresh interpreter up to the first window, in milliseconds
+def first_window_ms(module):
+    start = time.perf_counter()
+    child = subprocess.Popen([sys.executable, '-c', window_scripts[module], image_dir], cwd=src_dir,
+                             stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, env=child_env())
+    for line in child.stdout:
+        if line.strip() == 'shown':
+            elapsed = (time.perf_counter() - start) * 1000
+            child.kill()
+            child.wait()
+            return elapsed
+    child.wait()
+    raise RuntimeError((child.stderr.read().strip().splitlines() or ['no window'])[-1])
+
+
+# Function to check one front end; returns a list of problems
+def check(module, windows=True, show=8):
+    problems = []
+    try:
+        times = import_profile(module)
+    except RuntimeError as e:
+        print(f"{module}: cannot import: {e}")
+        return [f"{module} does not import"]
+    total_ms = times[module][1] / 1000
+    budget = import_budget_ms[module]
+    print(f"{module}: import {total_ms:.1f} ms (budget {budget} ms)")
+    for name, (own, cumulative) in sorted(times.items(), key=lambda item: -item[1][0])[:show]:
+        print(f"  {own / 1000:7.1f} ms  {name}")
+    if total_ms > budget:
+        problems.append(f"{module} imports in {total_ms:.1f} ms, over its {budget} ms budget")
+    loaded = sorted({name.split('.')[0] for name in times} & set(deferred_modules))
+    if loaded:
+        problems.append(f"{module} imports {', '.join(loaded)} at startup")
+
+    if windows:
+        try:
+            elapsed = first_window_ms(module)
+        except RuntimeError as e:
+            print(f"  first window skipped: {e}")
+        else:
+            budget = window_budget_ms[module]
+            print(f"  first window after {elapsed:.0f} ms (budget {budget} ms)")
+            if elapsed > budget:
+                problems.append(f"{module} shows its first window after {elapsed:.0f} ms, over its {budget} ms budget")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check front-end import time and time to first window.")
+    parser.add_argument('modules', nargs='*', help=f"Front ends to check (default: {', '.join(import_budget_ms)})")
+    parser.add_argument('--no-window', dest='windows', action='store_false', help="Only check the imports")
+    args = parser.parse_args()
+    unknown = [module for module in args.modules if module not in import_budget_ms]
+    if unknown:
+        parser.error(f"Unknown front ends: {', '.join(unknown)}")
+
+    problems = []
+    for module in args.modules or list(import_budget_ms):
+        problems += check(module, args.windows)
+    for problem in problems:
+        print(f"FAIL: {problem}")
+    sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,22 @@
+import random
+import secrets
+
+# Reproducible random streams of a session.
+# Every session has one seed, logged with each trial. Every purpose (arrow
+# placement, outcome draws, the shuffle of each deck) in every phase gets its
+# own stream derived from it, so practice trials or an extra draw somewhere
+# cannot shift the numbers any other part of the task sees. Streams are
+# random.Random seeded with a string, which is hashed with SHA-512: stable
+# across runs and Python versions, and no NumPy needed in the front ends.
+
+seed_bits = 48  # Seeds stay exact in Excel, which stores numbers as doubles
+
+
+# Function to draw a fresh session seed from the OS
+def new_seed():
+    return secrets.randbits(seed_bits)
+
+
+# Function to get the stream of one purpose, e.g. stream(seed, 'main', 'arrow')
+def stream(seed, *purpose):
+    return random.Random(':'.join(map(str, ('igt', seed) + purpose)))
@@ -0,0 +1,134 @@
+from array import array
+
+# Columnar in-session trial log.
+# Instead of one dict per trial (repeating the participant, the field names and
+# the strings on every row), each trial field is one preallocated typed array:
+# int64 and float64 values, and int8 codes into a small vocabulary for the text
+# fields (trial type, deck, choice). Per-session values (participant, seed) are
+# stored once. Every column keeps an Arrow-layout validity bitmap next to its
+# values, so to_arrow() wraps the arrays' memory instead of copying it, and
+# to_pandas() goes through Arrow with ArrowDtype columns, again without a copy.
+# Indexing and iterating still give the familiar row dicts, for the CSV/JSONL and
+# Excel writers, the streaming log and replay. NumPy, pandas and pyarrow are only
+# imported by the conversions, so the front ends can hold a buffer without them.
+
+default_capacity = 256
+typecodes = {'string': 'b', 'int64': 'q', 'float64': 'd'}
+
+
+def zeros(typecode, n):
+    return array(typecode, bytes(array(typecode).itemsize * n))
+
+
+class TrialBuffer:
+    # types: field -> 'string', 'int64' or 'float64', in log order; session_fields are
+    # stored once (in self.session), the rest once per trial. null_values gives the
+    # value a null shows as in row dicts (e.g. the final row's 'end' trial number)
+    def __init__(self, types, session_fields=(), capacity=default_capacity, null_values=None):
+        self.types = dict(types)
+        self.fields = list(self.types)
+        self.session = {field: None for field in session_fields}
+        self.columns = [field for field in self.fields if field not in self.session]
+        self.null_values = dict(null_values or {})
+        # Text columns: value -> code, and code -> value
+        self._codes = [{} if self.types[field] == 'string' else None for field in self.columns]
+        self._vocab = [[] for _ in self.columns]
+        self._allocate(max(1, capacity))
+
+    def _allocate(self, capacity):
+        self.capacity = capacity
+        self.length = 0
+        self._values = [zeros(typecodes[self.types[field]], capacity) for field in self.columns]
+        self._valid = [bytearray((capacity + 7) // 8) for _ in self.columns]
+        self._slots = list(zip(self._values, self._valid, self._codes))  # Per column, for append
+
+    # New, larger arrays (never resized in place, so tables already exported keep their memory)
+    def _grow(self):
+        values, valid, length = self._values, self._valid, self.length
+        self._allocate(self.capacity * 2)
+        self.length = length
+        for k in range(len(self.columns)):
+            self._values[k][:length] = values[k][:length]
+            self._valid[k][:len(valid[k])] = valid[k]
+
+    # Function to drop every trial; the buffer starts over in fresh arrays of the same capacity
+    def clear(self):
+        self._allocate(self.capacity)
+
+    # Function to add one trial; values follow self.columns, None is null
+    def append(self, *values):
+        i = self.length
+        if i == self.capacity:
+            self._grow()
+        byte, bit = i >> 3, 1 << (i & 7)
+        for (column, valid, codes), value in zip(self._slots, values):
+            if value is None:
+                continue
+            if codes is not None:
+                code = codes.get(value)
+                value = code if code is not None else self._add_code(codes, value)
+            column[i] = value
+            valid[byte] |= bit
+        self.length = i + 1
+
+    def _add_code(self, codes, value):
+        k = next(k for k, column_codes in enumerate(self._codes) if column_codes is codes)
+        if len(codes) >= 127:
+            raise ValueError(f"Too many distinct values in column {self.columns[k]!r}")
+        codes[value] = len(codes)
+        self._vocab[k].append(value)
+        return codes[value]
+
+    def __len__(self):
+        return self.length
+
+    # Function to get one trial as a dict of every field (session values included)
+    def row(self, i):
+        if i < 0:
+            i += self.length
+        if not 0 <= i < self.length:
+            raise IndexError(f"Trial {i} out of range")
+        row = dict(self.session)
+        byte, bit = i >> 3, 1 << (i & 7)
+        for k, field in enumerate(self.columns):
+            if self._valid[k][byte] & bit:
+                value = self._values[k][i]
+                row[field] = self._vocab[k][value] if self._codes[k] is not None else value
+            else:
+                row[field] = self.null_values.get(field)
+        return {field: row[field] for field in self.fields}
+
+    __getitem__ = row
+
+    def __iter__(self):
+        for i in range(self.length):
+            yield self.row(i)
+
+    # Function to get the trials as an Arrow table. Trial columns are views of the
+    # buffer's memory (text columns as dictionary arrays); with dictionary=False text
+    # columns are decoded to plain strings, the types written to Parquet/Arrow files
+    def to_arrow(self, dictionary=True):
+        import pyarrow as pa
+        n = self.length
+        arrays = {}
+        for k, field in enumerate(self.columns):
+            kind = self.types[field]
+            buffers = [pa.py_buffer(self._valid[k]), pa.py_buffer(self._values[k])]
+            if kind == 'string':
+                codes = pa.Array.from_buffers(pa.int8(), n, buffers)
+                column = pa.DictionaryArray.from_arrays(codes, pa.array(self._vocab[k], pa.string()))
+                arrays[field] = column if dictionary else column.dictionary_decode()
+            else:
+                arrays[field] = pa.Array.from_buffers(pa.int64() if kind == 'int64' else pa.float64(), n, buffers)
+        for field, value in self.session.items():
+            arrays[field] = pa.repeat(pa.scalar(value, type=pa.type_for_alias(self.types[field])), n)
+        return pa.table({field: arrays[field] for field in self.fields})
+
+    # Function to get the trials as a pandas DataFrame backed by the Arrow table (no copy)
+    def to_pandas(self):
+        import pandas as pd
+        return self.to_arrow().to_pandas(types_mapper=pd.ArrowDtype)
+
+    # Bytes held by the columns (allocated capacity, not just the trials so far)
+    def nbytes(self):
+        return sum(values.itemsize * len(values) + len(valid) for values, valid in zip(self._values, self._valid))
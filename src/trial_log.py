@@ -0,0 +1,228 @@
+import argparse
+import atexit
+import csv
+import json
+import os
+import queue
+import threading
+
+# Append-only trial log written from a background thread.
+# The GUI thread only enqueues a row; the writer thread appends it to a
+# line-buffered CSV (or JSONL) file and fsyncs after every block, so a crash
+# loses at most the rows of the block in flight. Every log is a new file: an
+# existing one is never appended to (FileExistsError), so sessions cannot merge.
+
+_close_marker = object()
+
+
+class TrialWriter:
+    def __init__(self, path, fieldnames=None, block_size=10, flush_interval=1.0):
+        self.path = path
+        self.fieldnames = fieldnames
+        self.block_size = block_size
+        self.flush_interval = flush_interval
+        self.error = None
+        # Created here, so a name that is already taken fails in the caller
+        self._file = open(path, 'x', newline='', encoding='utf-8', buffering=1)
+        self._queue = queue.SimpleQueue()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="trial-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def write(self, row):
+        if self._closed:
+            raise ValueError(f"Trial log {self.path} is closed")
+        self._queue.put(row)
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_close_marker)
+        self._thread.join()
+        atexit.unregister(self.close)
+
+    def _run(self):
+        try:
+            with self._file as f:
+                write_row = self._row_writer(f)
+                pending = 0
+                while True:
+                    try:
+                        row = self._queue.get(timeout=self.flush_interval if pending else None)
+                    except queue.Empty:
+                        row = None
+                    if row is _close_marker:
+                        break
+                    if row is not None:
+                        write_row(row)
+                        pending += 1
+                    # Sync a full block, or whatever is pending once the session goes quiet
+                    if pending and (row is None or pending >= self.block_size):
+                        self._sync(f)
+                        pending = 0
+                self._sync(f)
+        except Exception as e:
+            self.error = e
+            print(f"Error writing trial log: {e}")
+
+    def _row_writer(self, f):
+        if self.path.endswith('.jsonl'):
+            return lambda row: f.write(json.dumps(row, ensure_ascii=False) + "\n")
+        writer = csv.DictWriter(f, fieldnames=self.fieldnames, extrasaction='ignore')
+        writer.writeheader()
+        return writer.writerow
+
+    @staticmethod
+    def _sync(f):
+        f.flush()
+        os.fsync(f.fileno())
+
+
+# Function to write a finished session's rows in one go (tmp file + rename, so
+# readers never see a partial log)
+def write_log(path, rows, fieldnames=None):
+    def write(tmp):
+        with open(tmp, 'w', newline='', encoding='utf-8') as f:
+            if path.endswith('.jsonl'):
+                for row in rows:
+                    f.write(json.dumps(row, ensure_ascii=False) + "\n")
+            else:
+                writer = csv.DictWriter(f, fieldnames=fieldnames or list(rows[0]), extrasaction='ignore')
+                writer.writeheader()
+                writer.writerows(rows)
+            f.flush()
+            os.fsync(f.fileno())
+    return atomic_write(path, write)
+
+
+# Function to write a file under a temporary name and rename it into place, so readers
+# never see half a file; write(tmp) writes it, and the temporary file is removed on failure
+def atomic_write(path, write):
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        write(tmp)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    return path
+
+
+_persian_digits = str.maketrans('۰۱۲۳۴۵۶۷۸۹', '0123456789')
+
+
+# Function to coerce a logged value to int/float; Persian-digit strings from older
+# logs are parsed too, anything else (e.g. 'end' or '') becomes None
+def parse_number(value, kind=int):
+    if value is None or isinstance(value, (int, float)):
+        return kind(value) if value is not None else None
+    try:
+        return kind(str(value).translate(_persian_digits))
+    except ValueError:
+        return None
+
+
+# Function to turn rows into typed columns; types maps field -> 'string', 'int64', 'float64' or 'bool'
+def typed_columns(rows, types):
+    columns = {}
+    for field, kind in types.items():
+        values = [row.get(field) for row in rows]
+        if kind == 'int64':
+            values = [parse_number(v, int) for v in values]
+        elif kind == 'float64':
+            values = [parse_number(v, float) for v in values]
+        elif kind == 'bool':
+            values = [None if v is None else bool(v) for v in values]
+        else:
+            values = [None if v is None else str(v) for v in values]
+        columns[field] = values
+    return columns
+
+
+# Function to write rows as a typed Parquet (.parquet) or Arrow IPC (.arrow) file. A
+# TrialBuffer (trial_buffer.py) already holds typed columns: its table wraps them as they are
+def write_table(path, rows, types):
+    import pyarrow as pa
+    if hasattr(rows, 'to_arrow'):
+        table = rows.to_arrow(dictionary=False)
+    else:
+        columns = typed_columns(rows, types)
+        table = pa.table({field: pa.array(values, type=types[field]) for field, values in columns.items()})
+
+    def write(tmp):
+        if path.endswith('.parquet'):
+            import pyarrow.parquet as pq
+            pq.write_table(table, tmp)
+        else:
+            with pa.OSFile(tmp, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+    return atomic_write(path, write)
+
+
+# Function to write rows to an Excel sheet atomically; progress(rows_written) is called as it goes.
+# openpyxl's write-only mode streams rows out without building a DataFrame or a full worksheet
+def write_excel(path, rows, fieldnames=None, progress=None, progress_every=100):
+    from openpyxl import Workbook
+    fieldnames = fieldnames or list(rows[0])
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Sheet1')
+    sheet.append(fieldnames)
+    for i, row in enumerate(rows, 1):
+        sheet.append([row.get(field) for field in fieldnames])
+        if progress is not None and i % progress_every == 0:
+            progress(i)
+    atomic_write(path, workbook.save)
+    if progress is not None:
+        progress(len(rows))
+    return path
+
+
+# Function to load many Parquet/Arrow participant files as one Arrow table
+def read_tables(paths):
+    import pyarrow.dataset as ds
+    paths = list(paths)
+    file_format = 'parquet' if paths and paths[0].endswith('.parquet') else 'ipc'
+    return ds.dataset(paths, format=file_format).to_table()
+
+
+# Function to read a trial log back as a list of dicts
+def read_log(path):
+    with open(path, newline='', encoding='utf-8') as f:
+        if path.endswith('.jsonl'):
+            return [json.loads(line) for line in f if line.strip()]
+        return list(csv.DictReader(f))
+
+
+# Function to convert a trial log to Excel (optional post-processing step)
+def export_excel(log_path, output_file=None):
+    if output_file is None:
+        output_file = os.path.splitext(log_path)[0] + ".xlsx"
+    return write_excel(output_file, read_log(log_path))
+
+
+# Function to convert a trial log to a typed Parquet or Arrow file
+def export_table(log_path, types, extension='.parquet'):
+    output_file = os.path.splitext(log_path)[0] + extension
+    return write_table(output_file, read_log(log_path), types)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert streaming trial logs to Excel, Parquet or Arrow.")
+    parser.add_argument('logs', nargs='+', help="Participant_*.csv or Participant_*.jsonl files")
+    parser.add_argument('--format', choices=('xlsx', 'parquet', 'arrow'), default='xlsx')
+    args = parser.parse_args()
+    if args.format != 'xlsx':
+        from engine import log_types
+    for log_path in args.logs:
+        if args.format == 'xlsx':
+            output_file = export_excel(log_path)
+        else:
+            output_file = export_table(log_path, log_types, f".{args.format}")
+        print(f"Data saved to {output_file}")
+
+
+if __name__ == "__main__":
+    main()
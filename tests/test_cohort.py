@@ -0,0 +1,21 @@
+from cohort import aggregate
+from engine import run_headless
+from trial_log import read_log
+
+
+# Times out every third trial, plays the rest
+def timeout_policy(state):
+    return None if state.trial % 3 == 0 else 'play'
+
+
+def test_headless_timeouts_show_in_the_cohort(tmp_path):
+    data_dir = tmp_path / 'output'
+    engine = run_headless(timeout_policy, total_trials=60, practice_trials=0, participant_id='p1',
+                          output_dir=str(data_dir), seed=3)
+    assert sum(1 for row in engine.trial_data if row['Timeout Overshoot (ms)'] is not None) == 20
+
+    aggregate([str(data_dir)], str(tmp_path / 'cohort'), workers=1)
+    trials = read_log(str(tmp_path / 'cohort' / 'cohort_trials.csv'))
+    assert sum(row['Timeout'] == 'True' for row in trials) == 20
+    blocks = read_log(str(tmp_path / 'cohort' / 'cohort_blocks.csv'))
+    assert [round(float(row['Timeout Rate']), 2) for row in blocks] == [0.3, 0.35, 0.35]
@@ -0,0 +1,76 @@
+import pytest
+
+from config import build_config, default_config, load_config, ConfigError
+
+
+def task(**settings):
+    return build_config({'task': settings})
+
+
+def test_defaults():
+    config = default_config()
+    assert config.arrow_policy == 'uniform' and config.arrow_sequence is None
+
+
+def test_arrow_sequence():
+    config = task(arrow_policy='sequence', arrow_sequence=[0, 1, 2, 3])
+    assert config.arrow_sequence == (0, 1, 2, 3)
+
+
+@pytest.mark.parametrize('policy', ['uniform', 'sequence', 'balanced'])
+@pytest.mark.parametrize('sequence', [3, {'a': 1}, 'abc', [0, 4], [0, -1], [0, 1.5], [True]])
+def test_bad_arrow_sequence_is_a_config_error(policy, sequence):
+    with pytest.raises(ConfigError):
+        task(arrow_policy=policy, arrow_sequence=sequence)
+
+
+def test_sequence_policy_needs_a_sequence():
+    with pytest.raises(ConfigError):
+        task(arrow_policy='sequence')
+
+
+@pytest.mark.parametrize('settings', [
+    {'total_trials': 0},
+    {'total_trials': '120'},
+    {'timeout_ms': 0},
+    {'exhaustion_policy': 'never'},
+    {'output_format': 'docx'},
+    {'unknown_setting': 1},
+    {'deck_counts': [30, 30, 30]},
+    {'deck_counts': [30, 30, 30, 31]},
+    {'arrow_policy': 'balanced', 'max_run': 1, 'deck_counts': [117, 1, 1, 1]},
+])
+def test_invalid_task_settings(settings):
+    with pytest.raises(ConfigError):
+        task(**settings)
+
+
+def test_balanced_with_stop_policy_checks_card_supply():
+    task(outcome_model='sequence', exhaustion_policy='stop', arrow_policy='balanced', total_trials=120)
+    with pytest.raises(ConfigError):
+        task(outcome_model='sequence', exhaustion_policy='stop', arrow_policy='balanced', total_trials=121)
+
+
+def test_bad_deck_definitions():
+    with pytest.raises(ConfigError):
+        build_config({'decks': {'deck_e': {}}})
+    with pytest.raises(ConfigError):
+        build_config({'decks': {'deck_a': {'p_reward': 0.8, 'p_penalty': 0.5}}})
+    with pytest.raises(ConfigError):
+        build_config({'decks': {'deck_a': {'sequence': []}}})
+
+
+@pytest.mark.parametrize('definition', [
+    5, [], {'task': 5}, {'task': ['total_trials']}, {'decks': 5}, {'decks': ['deck_a']},
+    {'decks': {'deck_a': 5}}, {'decks': {'deck_a': ['sequence']}},
+])
+def test_sections_that_are_not_tables(definition):
+    with pytest.raises(ConfigError):
+        build_config(definition)
+
+
+def test_load_config_reports_a_deck_that_is_not_a_table(tmp_path):
+    path = tmp_path / 'task.toml'
+    path.write_text("[decks]\ndeck_a = 5\n")
+    with pytest.raises(ConfigError, match='deck_a'):
+        load_config(str(path))
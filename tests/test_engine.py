@@ -0,0 +1,96 @@
+import os
+
+import pytest
+
+from engine import IGTEngine, HeadlessFrontEnd
+from replay import replay_session
+from trial_log import read_log
+
+
+def play_session(engine, participant_id):
+    engine.register(participant_id, 'name')
+    state = engine.state
+    engine.start_practice()
+    while state.phase != 'ended':
+        if state.awaiting == 'response':
+            engine.respond(engine.frontend.policy(state))
+        elif state.awaiting == 'continue':
+            engine.continue_trial()
+        elif state.awaiting == 'transition':
+            engine.start_main()
+        state = engine.state
+
+
+def kiosk_engine(output_dir, seed):
+    return IGTEngine(HeadlessFrontEnd(lambda state: 'play'), 'sequence', 20, 4, output_dir=str(output_dir),
+                     export_excel=False, seed=seed)
+
+
+def test_new_session_resets_everything(tmp_path):
+    engine = kiosk_engine(tmp_path, 100)
+    play_session(engine, 'p1')
+    first = engine.trial_data
+    engine.new_session(101)
+    assert engine.trial_data is not first and len(engine.trial_data) == 0
+    assert engine.state.phase is None and engine.participant_id == '' and engine.plans == {}
+    play_session(engine, 'p2')
+    assert len(first) == 21 and len(engine.trial_data) == 21
+
+
+def test_reset_engine_matches_a_fresh_one(tmp_path):
+    engine = kiosk_engine(tmp_path, 100)
+    play_session(engine, 'p1')
+    engine.new_session(101)
+    play_session(engine, 'p2')
+    fresh = kiosk_engine(tmp_path / 'fresh', 101)
+    play_session(fresh, 'p2')
+    assert [row['Outcome'] for row in engine.trial_data] == [row['Outcome'] for row in fresh.trial_data]
+
+
+def test_same_id_twice_gets_separate_files(tmp_path):
+    engine = kiosk_engine(tmp_path, 100)
+    play_session(engine, 'p1')
+    engine.new_session(101)
+    play_session(engine, 'p1')
+    engine.new_session(100)
+    play_session(engine, 'p1')  # Same ID and seed again
+    names = sorted(name for name in os.listdir(tmp_path) if name.endswith('.csv'))
+    assert names == ['Participant_p1.csv', 'Participant_p1_100.csv', 'Participant_p1_101.csv']
+    for name in names:
+        rows = read_log(str(tmp_path / name))
+        assert len(rows) == 21 and len({row['Seed'] for row in rows}) == 1
+        _, mismatches = replay_session(rows)
+        assert mismatches == []
+
+
+def test_seeded_headless_run_repeats():
+    from engine import run_headless
+    runs = [[(row['Choice'], row['Outcome']) for row in run_headless(seed=42).trial_data] for _ in range(2)]
+    assert runs[0] == runs[1]
+    assert {choice for choice, _ in runs[0]} >= {'play', 'pass'}
+
+
+@pytest.mark.parametrize('participant_id', ['1403/05/01', '../p1', 'a.b', '', 'x' * 65, 7])
+def test_register_refuses_ids_that_cannot_name_files(tmp_path, participant_id):
+    engine = kiosk_engine(tmp_path, 1)
+    with pytest.raises(ValueError):
+        engine.register(participant_id, 'name')
+
+
+class LogFailures(HeadlessFrontEnd):
+    def __init__(self):
+        super().__init__(lambda state: 'play')
+        self.errors = []
+
+    def log_failed(self, error):
+        self.errors.append(error)
+
+
+def test_session_goes_on_when_the_trial_log_cannot_be_opened(tmp_path):
+    blocked = tmp_path / 'not_a_directory'
+    blocked.write_text('')
+    frontend = LogFailures()
+    engine = IGTEngine(frontend, 'sequence', 20, 4, output_dir=str(blocked), export_excel=False, seed=1)
+    play_session(engine, 'p1')
+    assert len(frontend.errors) == 1 and isinstance(frontend.errors[0], OSError)
+    assert engine.state.phase == 'ended' and len(engine.trial_data) == 21
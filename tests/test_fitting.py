@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+from fitting import models, negative_log_likelihood, prospect_utility
+
+
+def test_prospect_utility_of_gains_and_losses():
+    alpha = np.array([0.5, 1.0])
+    lam = np.array([2.0, 3.0])
+    assert np.allclose(prospect_utility(4.0, alpha, lam), [2.0, 4.0])
+    assert np.allclose(prospect_utility(-4.0, alpha, lam), [-4.0, -12.0])
+
+
+def test_prospect_utility_of_nothing_is_zero_for_any_alpha():
+    alpha = np.array([0.0, 0.5, 2.0])
+    lam = np.array([1.0, 1.0, 1.0])
+    assert np.array_equal(prospect_utility(0.0, alpha, lam), [0.0, 0.0, 0.0])
+
+
+# Four trials of deck 0: a gain, nothing, a loss, then a timeout
+session = (np.array([0, 0, 0, 0]), np.array([True, True, False, False]),
+           np.array([1.0, 0.0, 0.0, 0.0]), np.array([True, True, True, False]))
+
+
+def test_indifferent_choices_cost_log_two_per_decision():
+    # c = 0 gives PVL-Delta a consistency of 3^0 - 1 = 0, so every choice has probability 1/2
+    params = np.array([[0.5], [1.0], [1.0], [0.0]])
+    assert np.allclose(negative_log_likelihood('pvl_delta', params, *session), 3 * np.log(2))
+
+
+def test_expectancy_valence_by_hand():
+    a, w, c = 0.5, 0.4, 0.0  # Consistency (t/10)^0 = 1
+    params = np.array([[a], [w], [c]])
+    # Expectancy 0, then (1 - w) * 1 * a = 0.3 after the gain, then 0.15 after nothing
+    expected = np.logaddexp(0, 0) + np.logaddexp(0, -0.3) + np.logaddexp(0, 0.15)
+    assert np.allclose(negative_log_likelihood('ev', params, *session), expected)
+
+
+def test_a_zero_outcome_teaches_nothing_when_alpha_is_zero():
+    # With alpha = 0 the gain is worth 1 and nothing is worth 0, so the expectancy
+    # is A after the first play and A * (1 - A) after the second
+    A = 0.5
+    params = np.array([[A], [0.0], [1.0], [1.0]])  # theta = 3^1 - 1 = 2
+    expected = np.logaddexp(0, 0) + np.logaddexp(0, -2 * A) + np.logaddexp(0, 2 * A * (1 - A))
+    assert np.allclose(negative_log_likelihood('pvl_delta', params, *session), expected)
+
+
+@pytest.mark.parametrize('model', list(models))
+def test_a_population_matches_its_members(model):
+    rng = np.random.default_rng(0)
+    names, bounds = models[model]
+    low, high = np.array(bounds).T
+    params = rng.uniform(low[:, None], high[:, None], (len(names), 5))
+    together = negative_log_likelihood(model, params, *session)
+    one_by_one = [negative_log_likelihood(model, params[:, [i]], *session)[0] for i in range(5)]
+    assert np.allclose(together, one_by_one)
@@ -0,0 +1,89 @@
+import random
+
+import pytest
+
+from config import build_config, ConfigError
+from decks import deck_sequences
+from engine import run_headless
+from presentation import plan_presentation, equal_counts, longest_run, PlanError
+
+
+def uneven_definition(extra_deck, total_trials=121):
+    definition = {'task': {'outcome_model': 'sequence', 'exhaustion_policy': 'stop', 'arrow_policy': 'balanced',
+                           'total_trials': total_trials, 'practice_trials': 0},
+                  'decks': {}}
+    for name in ('deck_a', 'deck_b', 'deck_c', 'deck_d'):
+        sequence = list(deck_sequences[name][:30])
+        if name == extra_deck:
+            sequence.append(sequence[0])
+        definition['decks'][name] = {'sequence': sequence}
+    return definition
+
+
+@pytest.mark.parametrize('seed', range(40))
+def test_equal_counts_respect_supply(seed):
+    counts = equal_counts(random.Random(seed), 121, 4, [30, 30, 30, 31])
+    assert counts == [30, 30, 30, 31]
+
+
+def test_equal_counts_without_spare_cards():
+    with pytest.raises(PlanError):
+        equal_counts(random.Random(0), 122, 4, [30, 30, 30, 31])
+
+
+@pytest.mark.parametrize('extra_deck', ['deck_a', 'deck_b', 'deck_c', 'deck_d'])
+def test_uneven_supply_loads_and_runs_for_every_seed(extra_deck):
+    config = build_config(uneven_definition(extra_deck))
+    for seed in range(40):
+        engine = run_headless(lambda state: 'play', config=config, seed=seed)
+        assert sum(1 for row in engine.trial_data if row['Trial Type'] == 'main') == 121
+
+
+def test_uneven_supply_too_many_trials():
+    with pytest.raises(ConfigError):
+        build_config(uneven_definition('deck_d', total_trials=122))
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_plan_is_balanced_within_run_limit(seed):
+    plan, _ = plan_presentation(random.Random(seed), 120, 4, block_size=20, max_run=2)
+    assert sorted(plan.count(deck) for deck in range(4)) == [30, 30, 30, 30]
+    assert longest_run(plan) <= 2
+    for start in range(0, 120, 20):
+        block = plan[start:start + 20]
+        assert max(block.count(d) for d in range(4)) - min(block.count(d) for d in range(4)) <= 1
+
+
+def test_plan_is_reproducible():
+    first = plan_presentation(random.Random(5), 120, 4, block_size=20, max_run=3)
+    assert plan_presentation(random.Random(5), 120, 4, block_size=20, max_run=3) == first
+
+
+def test_plan_counts_and_supply():
+    plan, _ = plan_presentation(random.Random(1), 10, 4, counts=[4, 3, 2, 1])
+    assert [plan.count(deck) for deck in range(4)] == [4, 3, 2, 1]
+    with pytest.raises(PlanError):
+        plan_presentation(random.Random(1), 10, 4, counts=[4, 3, 2, 1], supply=[3, 30, 30, 30])
+    with pytest.raises(PlanError):
+        plan_presentation(random.Random(1), 10, 4, max_run=1, counts=[7, 1, 1, 1])
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_backtracking_orders_a_tight_block(seed):
+    from presentation import _order_backtracking
+    quota = [4, 2, 1, 1]  # With max_run=1, deck 0 must take every other slot
+    order = _order_backtracking(random.Random(seed), quota, None, 0, 1)
+    assert sorted(order) == sorted(d for d, count in enumerate(quota) for _ in range(count))
+    assert longest_run(order) == 1
+    assert _order_backtracking(random.Random(seed), [5, 1, 1, 0], None, 0, 1) is None
+
+
+@pytest.mark.parametrize('seed', range(10))
+def test_engine_plans_follow_the_config(seed):
+    config = build_config({'task': {'arrow_policy': 'balanced', 'block_size': 20, 'max_run': 2}})
+    engine = run_headless(config=config, seed=seed)
+    for phase, n_trials in (('practice', config.practice_trials), ('main', config.total_trials)):
+        plan = engine.plans[phase]['decks']
+        assert len(plan) == n_trials and longest_run(plan) <= 2
+    main = [row['Presented Deck'] for row in engine.trial_data if row['Trial Type'] == 'main']
+    assert main == engine.plans['main']['decks']
@@ -0,0 +1,29 @@
+import pytest
+
+from config import build_config
+from engine import run_headless
+from replay import replay_session
+from trial_log import read_log
+
+# Three cards per deck: ten practice plays exhaust and reshuffle some of them
+short_decks = {name: {'sequence': [100, -250, 0]} for name in ('deck_a', 'deck_b', 'deck_c', 'deck_d')}
+
+
+def recorded(engine):
+    return [dict(row) for row in engine.trial_data]
+
+
+@pytest.mark.parametrize('seed', range(10))
+def test_replay_after_practice_exhausts_the_decks(seed):
+    config = build_config({'task': {'outcome_model': 'sequence', 'total_trials': 30, 'practice_trials': 10},
+                           'decks': short_decks})
+    engine = run_headless(lambda state: 'play', config=config, seed=seed)
+    _, mismatches = replay_session(recorded(engine), config)
+    assert mismatches == []
+
+
+def test_replay_of_a_logged_session(tmp_path):
+    engine = run_headless(total_trials=40, practice_trials=10, output_dir=str(tmp_path), seed=11)
+    rows = read_log(str(tmp_path / 'Participant_headless.csv'))
+    _, mismatches = replay_session(rows)
+    assert mismatches == [] and len(rows) == 41
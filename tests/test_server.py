@@ -0,0 +1,100 @@
+import asyncio
+import os
+import struct
+
+import pytest
+
+from server import SessionServer, ProtocolError, read_request, read_frame, encode_frame
+from trial_log import read_log
+
+
+def play(session):
+    session.handle({'action': 'start'})
+    engine = session.engine
+    while engine.state.phase != 'ended':
+        awaiting = engine.state.awaiting
+        if awaiting == 'response':
+            session.handle({'action': 'respond', 'choice': 'play'})
+        elif awaiting == 'continue':
+            session.handle({'action': 'continue'})
+        elif awaiting == 'transition':
+            session.handle({'action': 'start_main'})
+
+
+async def run_sessions(output_dir, participant_ids):
+    server = SessionServer(total_trials=10, practice_trials=2, output_dir=str(output_dir))
+    server.loop = asyncio.get_running_loop()
+    for participant_id in participant_ids:
+        play(server.create_session(participant_id, 'name'))
+    await asyncio.sleep(0.2)  # Files are written on the executor
+
+
+@pytest.mark.parametrize('participant_id, participant_name', [
+    ('../escape', 'name'), ('a/b', 'name'), ('a.b', 'name'), ('x' * 65, 'name'),
+    (123, 'name'), (['p1'], 'name'), ('p1', 123), ('p1', {'first': 'a'}),
+])
+def test_unsafe_participant_ids_are_refused(participant_id, participant_name):
+    server = SessionServer()
+    with pytest.raises(ProtocolError) as e:
+        server.create_session(participant_id, participant_name)
+    assert e.value.status == 400
+
+
+async def exchange(request, frame=None):
+    server = SessionServer(total_trials=10, practice_trials=2)
+    host, port = await server.start('127.0.0.1', 0)
+    try:
+        reader, writer = await asyncio.open_connection(host, port)
+        writer.write(request)
+        head = await reader.readuntil(b'\r\n\r\n')
+        if frame is None:
+            return head, await reader.read()
+        writer.write(frame)
+        await read_frame(reader, masked=False)  # The session snapshot
+        return head, await read_frame(reader, masked=False)
+    finally:
+        await server.stop()
+
+
+def test_non_string_participant_id_gets_400_over_http():
+    body = b'{"participant_id": 123}'
+    head, _ = asyncio.run(exchange(b"POST /sessions HTTP/1.1\r\nConnection: close\r\nContent-Length: "
+                                   + str(len(body)).encode() + b"\r\n\r\n" + body))
+    assert head.startswith(b"HTTP/1.1 400")
+
+
+def test_invalid_utf8_closes_the_websocket_with_1007():
+    request = (b"GET /ws?participant_id=p1 HTTP/1.1\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+               b"Sec-WebSocket-Key: dGhlIHNhbXBsZSBub25jZQ==\r\n\r\n")
+    head, (opcode, payload) = asyncio.run(exchange(request, encode_frame(0x1, b'\xff\xfe', mask=True)))
+    assert head.startswith(b"HTTP/1.1 101")
+    assert opcode == 0x8 and struct.unpack('!H', payload) == (1007,)
+
+
+def test_sessions_of_one_participant_get_separate_files(tmp_path):
+    asyncio.run(run_sessions(tmp_path, ['p1', 'p1', 'شرکت-کننده_1']))
+    names = sorted(os.listdir(tmp_path))
+    assert len(names) == 3
+    for name in names:
+        assert len(read_log(str(tmp_path / name))) == 11
+
+
+def read(data):
+    async def run():
+        reader = asyncio.StreamReader()
+        reader.feed_data(data)
+        reader.feed_eof()
+        return await read_request(reader)
+    return asyncio.run(run())
+
+
+def test_read_request_body():
+    method, path, query, headers, body = read(b"POST /sessions?x=1 HTTP/1.1\r\nContent-Length: 2\r\n\r\n{}")
+    assert (method, path, query, body) == ('POST', '/sessions', {'x': '1'}, b'{}')
+
+
+@pytest.mark.parametrize('length, status', [(b'abc', 400), (b'-5', 400), (b'100000', 413)])
+def test_read_request_bad_content_length(length, status):
+    with pytest.raises(ProtocolError) as e:
+        read(b"POST /sessions HTTP/1.1\r\nContent-Length: " + length + b"\r\n\r\n")
+    assert e.value.status == status
@@ -0,0 +1,46 @@
+import csv
+
+import pytest
+
+from trial_log import TrialWriter, write_log, read_log
+
+fields = ['Trial Number', 'Choice']
+
+
+def write_session(path, n):
+    writer = TrialWriter(str(path), fields, block_size=4)
+    for i in range(n):
+        writer.write({'Trial Number': i + 1, 'Choice': 'play'})
+    writer.close()
+    return writer
+
+
+def test_writer_writes_every_row(tmp_path):
+    path = tmp_path / 'Participant_1.csv'
+    writer = write_session(path, 10)
+    assert writer.error is None
+    with open(path, newline='', encoding='utf-8') as f:
+        rows = list(csv.DictReader(f))
+    assert [row['Trial Number'] for row in rows] == [str(i) for i in range(1, 11)]
+
+
+def test_writer_never_appends_to_an_existing_log(tmp_path):
+    path = tmp_path / 'Participant_1.csv'
+    write_session(path, 10)
+    with pytest.raises(FileExistsError):
+        TrialWriter(str(path), fields)
+    with open(path, newline='', encoding='utf-8') as f:
+        assert len(list(csv.DictReader(f))) == 10
+
+
+def test_writer_jsonl(tmp_path):
+    path = tmp_path / 'Participant_1.jsonl'
+    write_session(path, 3)
+    assert [row['Trial Number'] for row in read_log(str(path))] == [1, 2, 3]
+
+
+def test_write_log_replaces_the_file(tmp_path):
+    path = str(tmp_path / 'Participant_1.csv')
+    write_log(path, [{'Trial Number': 1, 'Choice': 'play'}] * 5, fields)
+    write_log(path, [{'Trial Number': 1, 'Choice': 'pass'}] * 2, fields)
+    assert len(read_log(path)) == 2